@@ -0,0 +1,325 @@
+#!/usr/bin/python
+"""Benchmark pushing Pre-Roll listings to Plex servers, against local stand-ins
+
+Starts N local Plex stand-ins (See: plex_standin.py) with the given latency
+and error rate, then pushes a new listing to all of them for a number of
+rounds through push_listings (plexapi, connect + prefs get/set), with its
+timeouts, retries (jittered backoff) and circuit breaker. --down stand-ins
+answer every request with an error, --hang stand-ins answer after the read
+timeout.
+
+Reports per server count:
+* throughput: servers pushed per second
+* push latency percentiles (p50/p95/p99/max), and of every attempt
+* retries made, pushes still failed after the retries, pushes skipped by the
+  circuit breaker
+* requests served by the stand-ins, and listings verified on the stand-ins
+
+Usage:
+    > python benchmarks/bench_push.py
+    > python benchmarks/bench_push.py --servers 1 10 50 --latency 0.05 --jitter 0.05
+    > python benchmarks/bench_push.py --error-rate 0.1 --retries 3 --output bench_push.json
+    > python benchmarks/bench_push.py --servers 10 --down 1 --hang 1 --timeout 1,0.5
+"""
+import json
+import logging
+import math
+import os
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+from typing import Any, Dict, List
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, repo_dir)
+
+# plexapi sets up its logger on import, before the levels below
+import plexapi  # type: ignore # noqa: E402, F401
+from plex_standin import PlexStandin, start_standins, stop_standins  # noqa: E402
+
+# import local modules
+import schedule_preroll as sp  # noqa: E402
+from util import plexutil, pushretry  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark Pre-Roll pushes to local Plex stand-ins")
+    parser.add_argument(
+        "--servers",
+        dest="servers",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+        help="Number of stand-in servers [Default: 1 10 50]",
+    )
+    parser.add_argument(
+        "--rounds",
+        dest="rounds",
+        type=int,
+        default=5,
+        help="Pushes of a new listing to every server [Default: 5]",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=8,
+        help="Max concurrent pushes (See: -w/--max-workers) [Default: 8]",
+    )
+    parser.add_argument(
+        "--retries",
+        dest="retries",
+        type=int,
+        default=2,
+        help="Retries of a failed push (See: --retries) [Default: 2]",
+    )
+    parser.add_argument(
+        "--backoff",
+        dest="backoff",
+        type=float,
+        default=0.1,
+        help="Retry backoff base seconds, jittered and doubling [Default: 0.1]",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        type=pushretry.parse_timeouts,
+        default=pushretry.Timeouts(),
+        metavar="[CONNECT,]READ",
+        help="Request timeouts in seconds (See: --timeout) [Default: 5,30]",
+    )
+    parser.add_argument(
+        "--breaker-threshold",
+        dest="breaker_threshold",
+        type=int,
+        default=3,
+        help="Failed pushes in a row skipping a server [Default: 3]",
+    )
+    parser.add_argument(
+        "--latency",
+        dest="latency",
+        type=float,
+        default=0.01,
+        help="Stand-in seconds added to every response [Default: 0.01]",
+    )
+    parser.add_argument(
+        "--jitter",
+        dest="jitter",
+        type=float,
+        default=0.01,
+        help="Stand-in random 0 to N seconds added to the latency [Default: 0.01]",
+    )
+    parser.add_argument(
+        "--error-rate",
+        dest="error_rate",
+        type=float,
+        default=0.0,
+        help="Fraction of stand-in requests answered with an error [Default: 0]",
+    )
+    parser.add_argument(
+        "--down",
+        dest="down",
+        type=int,
+        default=0,
+        help="Stand-ins answering every request with an error [Default: 0]",
+    )
+    parser.add_argument(
+        "--hang",
+        dest="hang",
+        type=int,
+        default=0,
+        help="Stand-ins answering after the read timeout [Default: 0]",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        default="bench_push.json",
+        help="JSON results file [Default: bench_push.json]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="Random seed")
+
+    return parser.parse_args()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest rank percentile of values
+
+    Args:
+        values (List[float]):   values
+        pct (float):            percentile, 0-100
+
+    Returns:
+        float: percentile, 0 without values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def request_totals(standins: List[PlexStandin]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for standin in standins:
+        for key, count in standin.stats().items():
+            totals[key] = totals.get(key, 0) + count
+
+    return totals
+
+
+def bench_servers(count: int, args: Namespace) -> Dict[str, Any]:
+    """Push rounds of listings to stand-in servers
+
+    Args:
+        count (int):        number of stand-in servers
+        args (Namespace):   command line arguments
+
+    Returns:
+        Dict[str, Any]: throughput, latency percentiles, retries and stand-in request counts
+    """
+    standins = start_standins(
+        count,
+        seed=args.seed,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    # the last stand-ins are down or hanging
+    unhealthy = standins[max(0, count - args.down - args.hang) :]
+    for standin in unhealthy[: args.down]:
+        standin.error_rate = 1.0
+    for standin in unhealthy[args.down :]:
+        standin.latency = args.timeout.read + 0.5
+    unhealthy_names = {s.name for s in unhealthy}
+
+    try:
+        servers = [plexutil.PlexServerConfig(s.name, s.url, s.token) for s in standins]
+        connections = sp.PlexConnections(args.timeout)
+        retry = pushretry.RetryPolicy(attempts=args.retries + 1, backoff=args.backoff)
+        breaker = pushretry.CircuitBreaker(threshold=args.breaker_threshold)
+
+        latencies: List[float] = []
+        attempt_latencies: List[float] = []
+        failed_latencies: List[float] = []
+        retries = 0
+        failed = 0
+        circuit_open = 0
+        mismatched = 0
+        push_seconds = 0.0
+
+        for round_num in range(args.rounds):
+            listing = f"/prerolls/round{round_num}_a.mp4;/prerolls/round{round_num}_b.mp4"
+            started = time.perf_counter()
+            results = sp.push_listings(
+                [(server, listing) for server in servers],
+                connections,
+                args.workers,
+                retry=retry,
+                breaker=breaker,
+            )
+            push_seconds += time.perf_counter() - started
+
+            for r in results:
+                (latencies if r.success else failed_latencies).append(r.seconds)
+                attempt_latencies.extend(r.attempt_seconds)
+                retries += max(0, len(r.attempt_seconds) - 1)
+                failed += not r.success
+                circuit_open += not r.success and not r.attempt_seconds
+
+            failed_names = {r.server for r in results if not r.success}
+            mismatched += len(
+                [
+                    s
+                    for s in standins
+                    if s.name not in failed_names | unhealthy_names and s.preroll != listing
+                ]
+            )
+
+        pushes = count * args.rounds
+        return {
+            "servers": count,
+            "down": len(unhealthy[: args.down]),
+            "hang": len(unhealthy[args.down :]),
+            "pushes": pushes,
+            "push_seconds": round(push_seconds, 4),
+            "throughput_per_second": round(pushes / max(push_seconds, 1e-9), 1),
+            "latency_seconds": {
+                "p50": round(percentile(latencies, 50), 4),
+                "p95": round(percentile(latencies, 95), 4),
+                "p99": round(percentile(latencies, 99), 4),
+                "max": round(max(latencies, default=0.0), 4),
+            },
+            "attempt_latency_seconds": {
+                "attempts": len(attempt_latencies),
+                "p50": round(percentile(attempt_latencies, 50), 4),
+                "p95": round(percentile(attempt_latencies, 95), 4),
+                "p99": round(percentile(attempt_latencies, 99), 4),
+                "max": round(max(attempt_latencies, default=0.0), 4),
+            },
+            "failed_push_seconds_p50": round(percentile(failed_latencies, 50), 4),
+            "retries": retries,
+            "failed": failed,
+            "circuit_open": circuit_open,
+            "mismatched": mismatched,
+            "standin_requests": request_totals(standins),
+        }
+    finally:
+        stop_standins(standins)
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # failed pushes log tracebacks, only keep the results
+    for name in (sp.__name__, "plexapi"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    results: Dict[str, Any] = {
+        "version": sp.__version__,
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "rounds": args.rounds,
+        "workers": args.workers,
+        "retries": args.retries,
+        "backoff": args.backoff,
+        "timeout": list(args.timeout),
+        "down": args.down,
+        "hang": args.hang,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "cases": [],
+    }
+
+    for count in args.servers:
+        case = bench_servers(count, args)
+        results["cases"].append(case)
+        logger.info(
+            "servers=%-4s %7.1f pushes/s  p50 %.4fs  p95 %.4fs  p99 %.4fs  "
+            + "attempt p99 %.4fs  retries %s  failed %s  circuit open %s  mismatched %s",
+            count,
+            case["throughput_per_second"],
+            case["latency_seconds"]["p50"],
+            case["latency_seconds"]["p95"],
+            case["latency_seconds"]["p99"],
+            case["attempt_latency_seconds"]["p99"],
+            case["retries"],
+            case["failed"],
+            case["circuit_open"],
+            case["mismatched"],
+        )
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf8") as file:
+        json.dump(results, file, indent=2)
+
+    logger.info('Results written to "%s"', args.output)
+
+    sys.exit(1 if any(c["mismatched"] for c in results["cases"]) else 0)
@@ -0,0 +1,264 @@
+#!/usr/bin/python
+"""Benchmark the HTTP query service (util/queryservice.py) on a synthetic schedule
+
+Serves a generated schedule from a separate process (one core, as --serve
+does), then sends requests over keep-alive connections for a few seconds per
+workload:
+* now: listings at the current time, as dashboards poll (cache hits)
+* dates: listings at random datetimes over 10 years (mostly cache misses)
+* timeline: one month of hourly listing changes at random start days
+* reload: "now" listings while the schedule file is edited every second
+
+Reports requests per second, latency percentiles (p50/p95/p99/max) and the
+service cache hits/misses, written as JSON.
+
+Usage:
+    > python benchmarks/bench_query.py
+    > python benchmarks/bench_query.py --ranges 10000 --seconds 10 --clients 8
+"""
+import http.client
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, repo_dir)
+
+# random schedules, shared with the other benchmarks
+from bench_schedule import make_schedule  # noqa: E402
+
+# import local modules
+import schedule_preroll as sp  # noqa: E402
+from util import queryservice  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark the HTTP query service")
+    parser.add_argument(
+        "--ranges",
+        dest="ranges",
+        type=int,
+        default=1000,
+        help="Number of date_range ranges in the schedule [Default: 1000]",
+    )
+    parser.add_argument(
+        "--seconds",
+        dest="seconds",
+        type=float,
+        default=5.0,
+        help="Seconds per workload [Default: 5]",
+    )
+    parser.add_argument(
+        "--clients",
+        dest="clients",
+        type=int,
+        default=4,
+        help="Concurrent keep-alive connections [Default: 4]",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        default="bench_query.json",
+        help="JSON results file [Default: bench_query.json]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="Random seed")
+
+    return parser.parse_args()
+
+
+def serve(schedule_file: str, ready: Any) -> None:
+    # service process, answers until terminated
+    logging.getLogger().setLevel(logging.CRITICAL)
+    service = queryservice.QueryService(sp.ScheduleQueries({"bench": schedule_file}))
+    ready.send(service.server_address[:2])
+    service.serve_forever()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def run_clients(
+    address: Tuple[str, int], paths: Callable[[random.Random], str], args: Namespace
+) -> Dict[str, Any]:
+    """Send requests from concurrent keep-alive connections for args.seconds
+
+    Args:
+        address (Tuple[str, int]):              service host and port
+        paths (Callable[[Random], str]):        returns the next request path
+        args (Namespace):                       command line arguments
+
+    Returns:
+        Dict[str, Any]: requests per second, latency percentiles and errors
+    """
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection(*address)
+        own: List[float] = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            connection.request("GET", paths(rng))
+            response = connection.getresponse()
+            response.read()
+            own.append(time.perf_counter() - started)
+            failed += response.status != 200
+        connection.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(args.seed + i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 5),
+            "p95": round(percentile(latencies, 95), 5),
+            "p99": round(percentile(latencies, 99), 5),
+            "max": round(max(latencies, default=0.0), 5),
+        },
+        "errors": errors[0],
+    }
+
+
+def cache_stats(address: Tuple[str, int]) -> Dict[str, int]:
+    connection = http.client.HTTPConnection(*address)
+    connection.request("GET", "/")
+    stats = json.loads(connection.getresponse().read())["cache"]
+    connection.close()
+    return stats
+
+
+def random_datetime(rng: random.Random) -> str:
+    start = datetime.combine(date.today().replace(month=1, day=1), datetime.min.time())
+    return (start + timedelta(minutes=rng.randrange(10 * 366 * 24 * 60))).isoformat()
+
+
+def random_timeline(rng: random.Random) -> str:
+    start = date.today() + timedelta(days=rng.randrange(366))
+    return f"/timeline?server=bench&from={start}&to={start + timedelta(days=30)}&step=1h"
+
+
+def edit_schedule(schedule_file: str, stop: threading.Event) -> None:
+    # rewrite the misc section every second, as an editor saving would
+    with open(schedule_file, "r", encoding="utf8") as file:
+        contents = file.read()
+    edit = 0
+    while not stop.wait(1.0):
+        edit += 1
+        with open(schedule_file, "w", encoding="utf8") as file:
+            file.write(contents.replace("/prerolls/always_0.mp4", f"/prerolls/always_{edit}.mp4"))
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    workloads: Dict[str, Callable[[random.Random], str]] = {
+        "now": lambda rng: "/listing?server=bench",
+        "dates": lambda rng: f"/listing?server=bench&at={random_datetime(rng)}",
+        "timeline": random_timeline,
+        "reload": lambda rng: "/listing?server=bench",
+    }
+
+    results: Dict[str, Any] = {
+        "version": sp.__version__,
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "ranges": args.ranges,
+        "clients": args.clients,
+        "seconds": args.seconds,
+        "cases": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        schedule_file = os.path.join(tmp, "preroll_schedules.yaml")
+        with open(schedule_file, "w", encoding="utf8") as file:
+            file.write(make_schedule(args.ranges, 0.5, 1, random.Random(args.seed)))
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=serve, args=(schedule_file, sender), daemon=True)
+        process.start()
+        address = receiver.recv()
+        try:
+            # first load of the schedule
+            started = time.perf_counter()
+            connection = http.client.HTTPConnection(*address)
+            connection.request("GET", "/listing?server=bench")
+            connection.getresponse().read()
+            connection.close()
+            logger.info("First listing (schedule load): %.3fs", time.perf_counter() - started)
+
+            for name, paths in workloads.items():
+                stop = threading.Event()
+                editor = None
+                if name == "reload":
+                    editor = threading.Thread(target=edit_schedule, args=(schedule_file, stop))
+                    editor.start()
+
+                before = cache_stats(address)
+                case = {"workload": name, **run_clients(address, paths, args)}
+                stop.set()
+                if editor is not None:
+                    editor.join()
+                after = cache_stats(address)
+                case["cache_hits"] = after["hits"] - before["hits"]
+                case["cache_misses"] = after["misses"] - before["misses"]
+                results["cases"].append(case)
+
+                logger.info(
+                    "%-8s %8.1f req/s  p50 %.5fs  p95 %.5fs  p99 %.5fs  hits %s  misses %s  "
+                    + "errors %s",
+                    name,
+                    case["requests_per_second"],
+                    case["latency_seconds"]["p50"],
+                    case["latency_seconds"]["p95"],
+                    case["latency_seconds"]["p99"],
+                    case["cache_hits"],
+                    case["cache_misses"],
+                    case["errors"],
+                )
+        finally:
+            process.terminate()
+            process.join()
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf8") as file:
+        json.dump(results, file, indent=2)
+
+    logger.info('Results written to "%s"', args.output)
+
+    sys.exit(1 if any(c["errors"] for c in results["cases"]) else 0)
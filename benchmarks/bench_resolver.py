@@ -0,0 +1,313 @@
+#!/usr/bin/python
+"""Benchmark the priority layer resolver against the previous hard-coded merge
+
+Times merge_entries (util/resolver.py) against the previous merge on 10 to 10k
+active entries, and runs randomized property checks on the default layers:
+* the listing does not depend on the order of the active entries
+* the listing matches the previous merge wherever its result did not depend on
+  the order of entries: one entry per section, or the entries of each section
+  narrowest first (distinct durations) with forced entries last
+* sections capped with max_paths push at most max_paths paths per period and
+  their whole pool within ceil(pool / max_paths) consecutive periods
+
+Usage:
+    > python benchmarks/bench_resolver.py
+    > python benchmarks/bench_resolver.py --sizes 100 1000 --cases 500
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, repo_dir)
+
+# import local util modules
+import schedule_preroll  # noqa: E402
+from schedule_preroll import ScheduleEntry  # noqa: E402
+from util import resolver  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ["misc", "date_range", "weekly", "monthly", "default"]
+NOW = datetime(2024, 10, 31, 12, 0, 0)
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark the priority layer resolver vs legacy merge")
+    parser.add_argument(
+        "--sizes",
+        dest="sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="Number of active entries per listing [Default: 10 100 1000 10000]",
+    )
+    parser.add_argument(
+        "--cases",
+        dest="cases",
+        type=int,
+        default=2000,
+        help="Number of random entry sets per property check [Default: 2000]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="Random seed")
+
+    return parser.parse_args()
+
+
+def legacy_merge_entries(active: List[ScheduleEntry]) -> str:
+    """Previous merge of active entries, order dependent (kept for comparison)
+
+    Args:
+        active (List[ScheduleEntry]): active entries, in schedule order
+
+    Returns:
+        string: listing of preroll video paths
+    """
+    entries: Dict[str, List[ScheduleEntry]] = {name: [] for name in SECTIONS}
+    durations: Dict[int, float] = {}
+
+    for entry in active:
+        if entry.path:
+            found = False
+            duration_new = schedule_preroll.duration_seconds(entry.startdate, entry.enddate)
+            durations[id(entry)] = duration_new
+            for e in entries[entry.type]:
+                duration_curr = durations[id(e)]
+
+                # only the narrowest timeframe should stay
+                # disregard if a force entry is there
+                if duration_new < duration_curr and e.force != True:
+                    entries[entry.type].remove(e)
+
+                found = True
+
+            if not found or entry.force == True:
+                entries[entry.type].append(entry)
+
+    merged_list = []
+    if entries["misc"]:
+        merged_list.extend([p.path for p in entries["misc"]])
+    if entries["date_range"]:
+        merged_list.extend([p.path for p in entries["date_range"]])
+    if entries["weekly"] and not entries["date_range"]:
+        merged_list.extend([p.path for p in entries["weekly"]])
+    if entries["monthly"] and not entries["weekly"] and not entries["date_range"]:
+        merged_list.extend([p.path for p in entries["monthly"]])
+    if (
+        entries["default"]
+        and not entries["monthly"]
+        and not entries["weekly"]
+        and not entries["date_range"]
+    ):
+        merged_list.extend([p.path for p in entries["default"]])
+
+    return schedule_preroll.build_listing_string(merged_list)
+
+
+def make_entry(section: str, hours: int, force: bool, rng: random.Random) -> ScheduleEntry:
+    """Return an entry active at NOW, lasting the given number of hours
+
+    Args:
+        section (str):          schedule section (entry type)
+        hours (int):            duration in hours
+        force (bool):           forced entry
+        rng (random.Random):    random source
+
+    Returns:
+        ScheduleEntry: schedule entry
+    """
+    start = NOW - timedelta(hours=rng.randint(0, hours))
+    return ScheduleEntry(
+        type=section,
+        startdate=start,
+        enddate=start + timedelta(hours=hours),
+        force=force,
+        path=f"/prerolls/{section}_{hours}_{rng.randrange(10**6)}.mp4",
+    )
+
+
+def make_active(count: int, rng: random.Random) -> List[ScheduleEntry]:
+    """Return random active entries, spread over the sections
+
+    Args:
+        count (int):            number of entries
+        rng (random.Random):    random source
+
+    Returns:
+        List[ScheduleEntry]: active entries
+    """
+    return [
+        make_entry(rng.choice(SECTIONS), rng.randint(1, 24 * 365), rng.random() < 0.1, rng)
+        for _ in range(count)
+    ]
+
+
+def make_ordered_active(rng: random.Random) -> List[ScheduleEntry]:
+    """Return random active entries the previous merge resolves independent of order:
+    per section narrowest first with distinct durations, forced entries last,
+    the sections randomly interleaved
+
+    Args:
+        rng (random.Random): random source
+
+    Returns:
+        List[ScheduleEntry]: active entries
+    """
+    per_section: List[List[ScheduleEntry]] = []
+    for section in rng.sample(SECTIONS, rng.randint(0, len(SECTIONS))):
+        if rng.random() < 0.5:
+            per_section.append([make_entry(section, rng.randint(1, 1000), rng.random() < 0.2, rng)])
+            continue
+        # distinct durations, forced ones included: ties depend on order in the previous merge
+        hours = rng.sample(range(1, 1000), rng.randint(1, 6))
+        forced_hours = hours[: rng.randint(0, min(2, len(hours) - 1))]
+        forced = [make_entry(section, h, True, rng) for h in forced_hours]
+        per_section.append(
+            [make_entry(section, h, False, rng) for h in sorted(hours[len(forced_hours) :])]
+            + forced
+        )
+
+    # interleave the sections, keeping the order within each section
+    active: List[ScheduleEntry] = []
+    while per_section:
+        entries = rng.choice(per_section)
+        active.append(entries.pop(0))
+        if not entries:
+            per_section.remove(entries)
+
+    return active
+
+
+def listing_paths(listing: str) -> List[str]:
+    return sorted(p for p in listing.split(";") if p)
+
+
+def property_checks(cases: int, rng: random.Random) -> Dict[str, int]:
+    """Run the property checks on random entry sets
+
+    Args:
+        cases (int):            number of entry sets per check
+        rng (random.Random):    random source
+
+    Returns:
+        Dict[str, int]: check name -> number of failing entry sets
+    """
+    failures = {"order_independent": 0, "matches_legacy": 0, "rotation_coverage": 0}
+
+    for case in range(cases):
+        active = make_active(rng.randint(0, 20), rng)
+        shuffled = rng.sample(active, len(active))
+        if schedule_preroll.merge_entries(active) != schedule_preroll.merge_entries(shuffled):
+            failures["order_independent"] += 1
+            logger.error("Case %s depends on order: %s", case, active)
+
+        active = make_ordered_active(rng)
+        listing = schedule_preroll.merge_entries(active)
+        legacy = legacy_merge_entries(active)
+        # forced entries may be listed in another order, the Plex choice is random (;)
+        if listing_paths(listing) != listing_paths(legacy):
+            failures["matches_legacy"] += 1
+            logger.error("Case %s\n  Resolver: %s\n  Legacy:   %s", case, listing, legacy)
+
+        if not rotation_covers(rng):
+            failures["rotation_coverage"] += 1
+            logger.error("Case %s: rotation does not cover its pool", case)
+
+    return failures
+
+
+def rotation_covers(rng: random.Random) -> bool:
+    """Return whether a random capped section covers its pool in the fewest periods
+
+    Args:
+        rng (random.Random): random source
+
+    Returns:
+        bool: every listing within max_paths, whole pool pushed in ceil(pool / max_paths) periods
+    """
+    pool = [f"/prerolls/pool/{rng.getrandbits(32):08x}.mp4" for _ in range(rng.randint(1, 200))]
+    max_paths = rng.randint(1, len(pool) + 5)
+    rotate = rng.choice(resolver.ROTATIONS)
+    layers = [
+        layer._replace(max_paths=max_paths, rotate=rotate) for layer in resolver.DEFAULT_LAYERS
+    ]
+    entry = ScheduleEntry(
+        type="default",
+        startdate=datetime(2000, 1, 1),
+        enddate=datetime(2100, 1, 1),
+        force=False,
+        path=";".join(pool),
+    )
+
+    periods = -(-len(pool) // max_paths)
+    # never skips a period, months have 28 days or more
+    days = timedelta(days={resolver.DAILY: 1, resolver.WEEKLY: 7, resolver.MONTHLY: 28}[rotate])
+    seen: Set[str] = set()
+    counted: Set[int] = set()
+    day = NOW + timedelta(days=rng.randrange(3660))
+    while len(counted) < periods:
+        counted.add(resolver.rotation_period(day, rotate))
+        listing = schedule_preroll.merge_entries([entry], layers, day, expand=lambda p: [p])
+        paths = listing.split(";")
+        if len(paths) > max_paths:
+            return False
+        seen.update(paths)
+        day += days
+
+    return seen == set(pool)
+
+
+def timed(func: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    rng = random.Random(args.seed)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        active = make_active(size, rng)
+        repeat = max(1, 10000 // size)
+        resolver_seconds, _ = timed(lambda: schedule_preroll.merge_entries(active), repeat)
+        legacy_seconds, _ = timed(lambda: legacy_merge_entries(active), repeat)
+
+        results.append(
+            {
+                "entries": size,
+                "resolver_seconds": round(resolver_seconds, 6),
+                "legacy_seconds": round(legacy_seconds, 6),
+                "speedup": round(legacy_seconds / max(resolver_seconds, 1e-9), 1),
+            }
+        )
+        logger.info(
+            "%7s entries: resolver %8.5fs  legacy %8.5fs  (%sx)",
+            size,
+            resolver_seconds,
+            legacy_seconds,
+            results[-1]["speedup"],
+        )
+
+    failures = property_checks(args.cases, rng)
+    for name, count in failures.items():
+        logger.info("Property %s: %s/%s entry sets fail", name, count, args.cases)
+
+    print(json.dumps({"merge": results, "property_failures": failures}, indent=2))
+
+    sys.exit(1 if any(failures.values()) else 0)
@@ -0,0 +1,389 @@
+#!/usr/bin/python
+"""Benchmark schedule loading, expansion and listing computation
+
+Generates synthetic schedule files varying the number of date ranges, the
+density of "xxxx"/"xx" wildcard ranges and the length of the path lists,
+then times each stage separately:
+* load: YAML parsing
+* validate: schedule schema validation
+* expand: schedule plan and per day expansion (preroll_schedule)
+* compile: interval index build
+* lookup: a single preroll_listing
+* simulate: a full year of hourly listings
+* reload: a listing after editing the monthly section, full reload vs only
+  recompiling the changed section (ScheduleReloader, --watch)
+* push: push_listings to stub Plex servers (no network)
+plus the make_datetime / week_range / month_range helpers.
+
+Results are written as JSON, to track trends across releases.
+
+Usage:
+    > python benchmarks/bench_schedule.py
+    > python benchmarks/bench_schedule.py --ranges 100 1000 --wildcards 0 0.5 --paths 1 5
+    > python benchmarks/bench_schedule.py --output results/0.12.4.json
+"""
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, repo_dir)
+
+# import local modules
+import schedule_preroll as sp  # noqa: E402
+from util import plexutil, yamlstream  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark schedule load, expansion and listings")
+    parser.add_argument(
+        "--ranges",
+        dest="ranges",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="Number of date_range ranges per schedule [Default: 100 1000 10000]",
+    )
+    parser.add_argument(
+        "--wildcards",
+        dest="wildcards",
+        type=float,
+        nargs="+",
+        default=[0.0, 0.5],
+        help="Fraction of ranges using xxxx/xx wildcards [Default: 0 0.5]",
+    )
+    parser.add_argument(
+        "--paths",
+        dest="paths",
+        type=int,
+        nargs="+",
+        default=[1, 5],
+        help="Number of paths per entry (; separated) [Default: 1 5]",
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=3,
+        help="Runs per timing, the fastest is kept [Default: 3]",
+    )
+    parser.add_argument(
+        "--servers",
+        dest="servers",
+        type=int,
+        default=10,
+        help="Number of stub Plex servers to push to [Default: 10]",
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        default="bench_schedule.json",
+        help="JSON results file [Default: bench_schedule.json]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="Random seed")
+
+    return parser.parse_args()
+
+
+def path_list(name: str, count: int) -> str:
+    return ";".join(f"/prerolls/{name}_{i}.mp4" for i in range(count))
+
+
+def make_schedule(ranges: int, wildcards: float, paths: int, rng: random.Random) -> str:
+    """Return a synthetic schedule file (YAML)
+
+    Args:
+        ranges (int):           number of date_range ranges
+        wildcards (float):      fraction of ranges using xxxx/xx wildcards
+        paths (int):            number of paths per entry
+        rng (random.Random):    random source
+
+    Returns:
+        str: schedule file contents
+    """
+    year = date.today().year
+    lines = ["---", "monthly:", "  enabled: Yes"]
+    for month in MONTHS:
+        lines.append(f"  {month}: {path_list(month, paths)}")
+
+    lines += ["weekly:", "  enabled: Yes"]
+    for week in range(1, 53, 4):
+        lines.append(f'  "{week}": {path_list(f"week{week}", paths)}')
+
+    lines += ["date_range:", "  enabled: Yes", "  ranges:"]
+    for i in range(ranges):
+        month, day = rng.randint(1, 12), rng.randint(1, 25)
+        length = rng.randint(0, 3)
+        if rng.random() < wildcards:
+            # every year, or every month, on these days
+            prefix = "xxxx-xx" if rng.random() < 0.5 else f"xxxx-{month:02d}"
+            start = f"{prefix}-{day:02d}"
+            end = f"{prefix}-{day + length:02d}"
+        elif rng.random() < 0.5:
+            start = f"{year}-{month:02d}-{day:02d}"
+            end = f"{year}-{month:02d}-{day + length:02d}"
+        else:
+            start = f"{year}-{month:02d}-{day:02d} 08:00:00"
+            end = f"{year}-{month:02d}-{day + length:02d} 20:00:00"
+
+        lines += [
+            f"    - start_date: {start}",
+            f"      end_date: {end}",
+            f"      path: {path_list(f'range{i}', paths)}",
+        ]
+        if rng.random() < 0.1:
+            lines.append("      force: Yes")
+
+    lines += [
+        "misc:",
+        "  enabled: Yes",
+        f"  always_use: {path_list('always', paths)}",
+        "default:",
+        "  enabled: Yes",
+        f"  path: {path_list('default', paths)}",
+        "",
+    ]
+
+    return "\n".join(lines)
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    """Return the fastest run time of a function, in seconds
+
+    Args:
+        func (Callable):    function to time
+        repeat (int):       number of runs
+
+    Returns:
+        float: fastest run, in seconds
+    """
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+
+    return round(best, 6)
+
+
+def entries_size(schedule: List[sp.ScheduleEntry]) -> int:
+    """Return the approximate memory of a list of schedule entries, in bytes
+    Counts the list, the entry tuples and every distinct object they hold
+
+    Args:
+        schedule (List[ScheduleEntry]): schedule entries
+
+    Returns:
+        int: size in bytes
+    """
+    seen = set()
+    size = sys.getsizeof(schedule)
+    for entry in schedule:
+        for value in (entry,) + tuple(entry):
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+
+    return size
+
+
+class StubSetting:
+    def __init__(self):
+        self.value = ""
+
+    def set(self, value: str) -> None:
+        self.value = value
+
+
+class StubSettings:
+    def __init__(self):
+        self.setting = StubSetting()
+        self.saves = 0
+
+    def get(self, name: str) -> StubSetting:
+        return self.setting
+
+    def save(self) -> None:
+        self.saves += 1
+
+
+class StubPlex:
+    """Stands in for a PlexServer, only the preroll setting is supported"""
+
+    def __init__(self, name: str):
+        self.friendlyName = name
+        self.settings = StubSettings()
+
+
+class StubConnections(sp.PlexConnections):
+    """PlexConnections handing out StubPlex servers, never touching the network"""
+
+    def get(self, server: plexutil.PlexServerConfig) -> Any:
+        with self._lock:
+            return self._servers.setdefault(server.name, StubPlex(server.name))
+
+
+def bench_helpers(repeat: int) -> Dict[str, float]:
+    year = date.today().year
+    loops = 1000
+
+    def datetimes() -> None:
+        for _ in range(loops):
+            sp.make_datetime(f"{year}-10-31 08:00:00")
+            sp.make_datetime("xxxx-12-xx", lowtime=False)
+            sp.make_datetime(date(year, 1, 1))
+
+    def ranges() -> None:
+        for _ in range(loops // 50):
+            for week in range(1, 53):
+                sp.week_range(year, week)
+            for month in range(1, 13):
+                sp.month_range(year, month)
+
+    return {
+        "make_datetime_x3000": timed(datetimes, repeat),
+        "week_month_range_x1280": timed(ranges, repeat),
+    }
+
+
+def bench_case(
+    schedule_file: str, repeat: int, servers: int, year_start: datetime
+) -> Dict[str, Any]:
+    """Time each stage for a schedule file
+
+    Args:
+        schedule_file (str):    path/to/schedule file
+        repeat (int):           runs per timing
+        servers (int):          number of stub Plex servers to push to
+        year_start (datetime):  start of the simulated year
+
+    Returns:
+        Dict[str, Any]: stage timings (seconds) and result sizes
+    """
+    with open(schedule_file, "rb") as file:
+        raw = file.read()
+
+    contents = yamlstream.load(raw)
+    validator = sp.schedulefile_validator()
+    schedule = sp.preroll_schedule(schedule_file)
+    compiled = sp.compile_schedule(schedule)
+    columns = sp.compile_columnar(schedule)
+    calendar = sp.preroll_calendar(schedule_file)
+    lookup_at = year_start + timedelta(days=300, hours=12)
+    listing = sp.preroll_listing(compiled, lookup_at)
+    changes = sp.simulate_listings(
+        compiled, year_start, year_start + timedelta(days=365), timedelta(hours=1)
+    )
+
+    pushes = [
+        (plexutil.PlexServerConfig(f"stub{i}", f"http://stub{i}", "token"), listing)
+        for i in range(servers)
+    ]
+
+    def push() -> None:
+        results = sp.push_listings(pushes, StubConnections(), force=True)
+        assert all(r.success for r in results)
+
+    # alternate between two versions of the file, differing in the monthly section
+    edit_file = f"{schedule_file}.edit.yaml"
+    edits = itertools.cycle([raw.replace(b"/prerolls/jan_0.mp4", b"/prerolls/jan_edit.mp4"), raw])
+    reloader = sp.ScheduleReloader()
+
+    def reload(load: Callable[[str], Any]) -> None:
+        with open(edit_file, "wb") as file:
+            file.write(next(edits))
+        sp.preroll_listing(load(edit_file), lookup_at)
+
+    reload(reloader)
+
+    return {
+        "timings": {
+            "load": timed(lambda: yamlstream.load(raw), repeat),
+            "validate": timed(lambda: validator.validate(contents), repeat),
+            "expand": timed(lambda: sp.preroll_schedule(schedule_file), repeat),
+            "compile": timed(lambda: sp.compile_schedule(schedule), repeat),
+            "lookup": timed(lambda: sp.preroll_listing(compiled, lookup_at), repeat),
+            "lookup_uncompiled": timed(lambda: sp.preroll_listing(schedule, lookup_at), repeat),
+            "lookup_calendar": timed(lambda: sp.preroll_listing(calendar, lookup_at), repeat),
+            "compile_columnar": timed(lambda: sp.compile_columnar(schedule), repeat),
+            "lookup_columnar": timed(lambda: sp.preroll_listing(columns, lookup_at), repeat),
+            "simulate_year_hourly": timed(
+                lambda: sp.simulate_listings(
+                    compiled, year_start, year_start + timedelta(days=365), timedelta(hours=1)
+                ),
+                repeat,
+            ),
+            "push_stub": timed(push, repeat),
+            "reload_edit_full": timed(lambda: reload(sp.preroll_calendar), repeat),
+            "reload_edit_incremental": timed(lambda: reload(reloader), repeat),
+        },
+        "entries": len(schedule),
+        "entries_bytes": entries_size(schedule),
+        "columnar_bytes": columns.nbytes,
+        "columnar_numpy": columns.numpy,
+        "listing_length": len(listing),
+        "simulated_changes": len(changes),
+    }
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # the stages log heavily at INFO, only keep the results
+    logging.getLogger(sp.__name__).setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    year_start = datetime(date.today().year, 1, 1)
+
+    results: Dict[str, Any] = {
+        "version": sp.__version__,
+        "python": platform.python_version(),
+        "libyaml": yamlstream.WITH_LIBYAML,
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "repeat": args.repeat,
+        "helpers": bench_helpers(args.repeat),
+        "cases": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for ranges, wildcards, paths in itertools.product(args.ranges, args.wildcards, args.paths):
+            schedule_file = os.path.join(tmp, f"schedule_{ranges}_{wildcards}_{paths}.yaml")
+            with open(schedule_file, "w", encoding="utf8") as file:
+                file.write(make_schedule(ranges, wildcards, paths, rng))
+
+            case = {"ranges": ranges, "wildcards": wildcards, "paths": paths}
+            case.update(bench_case(schedule_file, args.repeat, args.servers, year_start))
+            results["cases"].append(case)
+
+            logger.info(
+                "ranges=%-6s wildcards=%-4s paths=%-2s %s",
+                ranges,
+                wildcards,
+                paths,
+                " ".join(f"{k}={v:.4f}" for k, v in case["timings"].items()),
+            )
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf8") as file:
+        json.dump(results, file, indent=2)
+
+    logger.info('Results written to "%s"', args.output)
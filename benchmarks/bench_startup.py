@@ -0,0 +1,208 @@
+#!/usr/bin/python
+"""Benchmark schedule_preroll.py startup time
+
+Runs the script in fresh interpreters with "-X importtime" for the common
+short lived entry points and reports the wall clock time, the total import
+time, the peak memory (RSS, where the OS reports it), the slowest imports
+and which heavy modules (yaml, cerberus, requests, plexapi) were loaded at all:
+* --version
+* --help
+* --test-run against a cached schedule (no Plex config needed)
+* --test-run with --no-cache (schedule parsed and validated)
+* --test-run with --apply of a compiled timeline file (schedule not read)
+
+Usage:
+    > python benchmarks/bench_startup.py
+    > python benchmarks/bench_startup.py --runs 10 --output bench_startup.json
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+repo_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+script = os.path.join(repo_dir, "schedule_preroll.py")
+
+HEAVY_MODULES = ["yaml", "cerberus", "requests", "urllib3", "plexapi", "plexapi.server"]
+
+SCHEDULE = """---
+monthly:
+  enabled: Yes
+  jan: /prerolls/jan.mp4
+date_range:
+  enabled: Yes
+  ranges:
+    - start_date: xxxx-12-25
+      end_date: xxxx-12-25
+      path: /prerolls/xmas.mp4
+misc:
+  enabled: Yes
+  always_use: /prerolls/always.mp4
+default:
+  enabled: Yes
+  path: /prerolls/default.mp4
+"""
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark schedule_preroll.py startup time")
+    parser.add_argument(
+        "--runs",
+        dest="runs",
+        type=int,
+        default=5,
+        help="Runs per entry point, the fastest is kept [Default: 5]",
+    )
+    parser.add_argument(
+        "--top", dest="top", type=int, default=10, help="Slowest imports to report [Default: 10]"
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        default="bench_startup.json",
+        help="JSON results file [Default: bench_startup.json]",
+    )
+
+    return parser.parse_args()
+
+
+def parse_importtime(stderr: str) -> List[ImportTime]:
+    """Return the imports reported by "-X importtime"
+
+    Args:
+        stderr (str): stderr of the interpreter run
+
+    Returns:
+        List[ImportTime]: one entry per imported module
+    """
+    imports: List[ImportTime] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        # nested imports keep their indentation
+        imports.append(ImportTime(module[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    return imports
+
+
+def run(args: List[str], runs: int, top: int, cwd: str) -> Dict[str, Any]:
+    """Run the script and return its startup timings
+
+    Args:
+        args (List[str]):   script arguments
+        runs (int):         number of runs, the fastest is kept
+        top (int):          number of slowest imports to report
+        cwd (str):          working folder for the runs
+
+    Returns:
+        Dict[str, Any]: wall time, import time, peak RSS, slowest and heavy imports
+    """
+    best: Dict[str, Any] = {}
+    for _ in range(max(1, runs)):
+        with tempfile.TemporaryFile("w+") as stderr:
+            started = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "-X", "importtime", script] + args,
+                cwd=cwd,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr,
+                text=True,
+            )
+            max_rss_kb = None
+            if hasattr(os, "wait4"):
+                # resource usage of this run only
+                _, status, usage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                max_rss_kb = usage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+            else:
+                proc.wait()
+            wall = time.perf_counter() - started
+            stderr.seek(0)
+            errors = stderr.read()
+
+        if proc.returncode != 0:
+            logger.error("Run failed (%s): %s", proc.returncode, errors[-2000:])
+            raise RuntimeError(f"schedule_preroll.py {' '.join(args)} failed")
+
+        if best and wall >= best["wall_seconds"]:
+            continue
+
+        imports = parse_importtime(errors)
+        # top level imports only, to not count nested modules twice
+        total_us = sum(i.cumulative_us for i in imports if not i.module.startswith(" "))
+        loaded = {i.module.strip() for i in imports}
+        best = {
+            "wall_seconds": round(wall, 4),
+            "import_seconds": round(total_us / 1e6, 4),
+            "max_rss_kb": max_rss_kb,
+            "heavy_modules": [m for m in HEAVY_MODULES if m in loaded],
+            "slowest_imports": [
+                {"module": i.module.strip(), "cumulative_seconds": round(i.cumulative_us / 1e6, 4)}
+                for i in sorted(imports, key=lambda i: i.cumulative_us, reverse=True)[:top]
+            ],
+        }
+
+    return best
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        schedule_file = os.path.join(tmp, "preroll_schedules.yaml")
+        with open(schedule_file, "w", encoding="utf8") as file:
+            file.write(SCHEDULE)
+
+        cache = ["--cache-dir", os.path.join(tmp, "cache")]
+        test_run = ["--test-run", "-s", schedule_file, "-c", os.path.join(tmp, "missing.ini")]
+
+        # warm the schedule cache for the cached test run, compile the timeline to apply
+        run(test_run + cache, 1, 0, tmp)
+        timeline_file = os.path.join(tmp, "prerolls.timeline")
+        run(test_run + ["--compile", timeline_file], 1, 0, tmp)
+
+        entry_points = {
+            "version": ["--version"],
+            "help": ["--help"],
+            "test_run_cached": test_run + cache,
+            "test_run_no_cache": test_run + cache + ["--no-cache"],
+            "test_run_apply": test_run + cache + ["--apply", timeline_file],
+        }
+
+        results: Dict[str, Any] = {"python": sys.version.split()[0], "entry_points": {}}
+        for name, entry_args in entry_points.items():
+            result = run(entry_args, args.runs, args.top, tmp)
+            results["entry_points"][name] = result
+            logger.info(
+                "%-18s wall %.3fs  imports %.3fs  max RSS %s KB  heavy: %s",
+                name,
+                result["wall_seconds"],
+                result["import_seconds"],
+                result["max_rss_kb"],
+                ", ".join(result["heavy_modules"]) or "-",
+            )
+
+    with open(args.output, "w", encoding="utf8") as file:
+        json.dump(results, file, indent=2)
+
+    logger.info('Results written to "%s"', args.output)
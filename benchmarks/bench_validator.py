@@ -0,0 +1,230 @@
+#!/usr/bin/python
+"""Benchmark the compiled schedule validator against Cerberus
+
+Generates schedule documents with 1k/10k/100k date_range ranges, times both
+validators on each, and runs a differential check: randomly broken documents
+must be accepted/rejected the same way by both validators, with errors
+reported for the same top level sections.
+
+Requirements:
+- cerberus (See Requirements.txt)
+
+Usage:
+    > python benchmarks/bench_validator.py
+    > python benchmarks/bench_validator.py --sizes 1000 10000 --cases 500
+"""
+import copy
+import json
+import logging
+import os
+import random
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import date
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from cerberus import Validator  # type: ignore
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, repo_dir)
+
+# import local util modules
+from util.schedulevalidator import ScheduleValidator  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+schema_filename = os.path.join(repo_dir, "util/schedulefile_schema.json")
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Benchmark compiled schedule validation vs Cerberus")
+    parser.add_argument(
+        "--sizes",
+        dest="sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Number of date_range ranges per document [Default: 1000 10000 100000]",
+    )
+    parser.add_argument(
+        "--cases",
+        dest="cases",
+        type=int,
+        default=2000,
+        help="Number of random documents for the differential check [Default: 2000]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=1, help="Random seed")
+
+    return parser.parse_args()
+
+
+def make_document(ranges: int, rng: random.Random) -> Dict[str, Any]:
+    """Return a valid schedule document with the given number of date ranges
+
+    Args:
+        ranges (int):           number of date_range ranges
+        rng (random.Random):    random source
+
+    Returns:
+        Dict[str, Any]: schedule document
+    """
+    items: List[Dict[str, Any]] = []
+    for i in range(ranges):
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        if rng.random() < 0.5:
+            start: Any = date(2024, month, day)
+            end: Any = start
+        else:
+            start = f"xxxx-{month:02d}-{day:02d} 08:00:00"
+            end = f"xxxx-{month:02d}-{day:02d} 20:00:00"
+        item = {"start_date": start, "end_date": end, "path": f"/prerolls/event_{i}.mp4"}
+        if rng.random() < 0.1:
+            item["force"] = True
+        items.append(item)
+
+    return {
+        "monthly": {"enabled": True, "jan": "/prerolls/jan.mp4", "feb": None},
+        "weekly": {"enabled": False, "2": "/prerolls/week2.mp4"},
+        "date_range": {"enabled": True, "ranges": items},
+        "misc": {"enabled": True, "always_use": "/prerolls/always.mp4"},
+        "default": {"enabled": True, "path": "/prerolls/a.mp4;/prerolls/b.mp4"},
+    }
+
+
+BAD_VALUES: List[Any] = [None, 1, 1.5, True, "text", [], ["a"], {}, {"a": 1}, date(2024, 1, 1)]
+
+
+def mutate(document: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Return a copy of a document with random values replaced, added or removed
+
+    Args:
+        document (Dict[str, Any]):  document to mutate
+        rng (random.Random):        random source
+
+    Returns:
+        Dict[str, Any]: mutated document
+    """
+    doc = copy.deepcopy(document)
+
+    for _ in range(rng.randint(1, 3)):
+        # pick a random container within the document
+        container: Any = doc
+        for _ in range(rng.randint(0, 4)):
+            if isinstance(container, dict) and container:
+                child = container[rng.choice(list(container))]
+            elif isinstance(container, list) and container:
+                child = rng.choice(container)
+            else:
+                break
+            if not isinstance(child, (dict, list)):
+                break
+            container = child
+
+        action = rng.random()
+        if isinstance(container, dict):
+            if action < 0.4 and container:
+                container[rng.choice(list(container))] = rng.choice(BAD_VALUES)
+            elif action < 0.7 and container:
+                del container[rng.choice(list(container))]
+            else:
+                key = rng.choice(["extra", "enabled", "path", "force", "3"])
+                container[key] = rng.choice(BAD_VALUES)
+        elif isinstance(container, list):
+            if container and action < 0.5:
+                container[rng.randrange(len(container))] = rng.choice(BAD_VALUES)
+            else:
+                container.append(rng.choice(BAD_VALUES))
+
+    return doc
+
+
+def timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def differential_check(
+    cerberus: Validator, compiled: ScheduleValidator, cases: int, rng: random.Random
+) -> int:
+    """Compare acceptance of random (mostly invalid) documents by both validators
+
+    Args:
+        cerberus (Validator):           Cerberus validator
+        compiled (ScheduleValidator):   compiled validator
+        cases (int):                    number of documents to compare
+        rng (random.Random):            random source
+
+    Returns:
+        int: number of documents where both validators disagree
+    """
+    mismatches = 0
+    for case in range(cases):
+        doc = mutate(make_document(rng.randint(0, 5), rng), rng)
+
+        cerberus_valid = cerberus.validate(doc)
+        errors = compiled.validate(doc)
+
+        cerberus_sections: Set[Any] = set(cerberus.errors) if not cerberus_valid else set()
+        compiled_sections = {e.path[0] for e in errors if e.path}
+
+        if cerberus_valid != (not errors) or cerberus_sections != compiled_sections:
+            mismatches += 1
+            logger.error(
+                "Case %s mismatch\n  Cerberus: %s\n  Compiled: %s\n  Document: %s",
+                case,
+                cerberus.errors,
+                [str(e) for e in errors],
+                doc,
+            )
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with open(schema_filename, "r", encoding="utf8") as schema_file:
+        schema = json.loads(schema_file.read())
+
+    rng = random.Random(args.seed)
+    cerberus = Validator(schema)
+    compiled = ScheduleValidator(schema)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        doc = make_document(size, rng)
+        cerberus_seconds, cerberus_valid = timed(lambda: cerberus.validate(doc))
+        compiled_seconds, errors = timed(lambda: compiled.validate(doc))
+
+        assert cerberus_valid and not errors, "generated document must be valid"
+
+        results.append(
+            {
+                "ranges": size,
+                "cerberus_seconds": round(cerberus_seconds, 6),
+                "compiled_seconds": round(compiled_seconds, 6),
+                "speedup": round(cerberus_seconds / max(compiled_seconds, 1e-9), 1),
+            }
+        )
+        logger.info(
+            "%7s ranges: cerberus %8.3fs  compiled %8.4fs  (%sx)",
+            size,
+            cerberus_seconds,
+            compiled_seconds,
+            results[-1]["speedup"],
+        )
+
+    mismatches = differential_check(cerberus, compiled, args.cases, rng)
+    logger.info("Differential check: %s/%s documents disagree", mismatches, args.cases)
+
+    print(json.dumps({"validation": results, "differential_mismatches": mismatches}, indent=2))
+
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,405 @@
+#!/usr/bin/python
+"""Local Plex server stand-in for integration and push load testing
+
+Serves the endpoints plexapi uses to connect and to get/set preferences:
+* GET / : server identity (PlexServer connection)
+* GET /:/prefs : server settings, with the Pre-Roll setting (cinemaTrailersPrerollID)
+* PUT /:/prefs?name=value : save settings (PlexServer.settings.save)
+
+Each stand-in runs on its own local port, with configurable latency (fixed
+plus random jitter) and error rate (requests answered with an HTTP error),
+and counts the requests it served. Anything else answers 404.
+
+Stand-ins can be started from scripts (See: start_standins), or run
+directly, printing a config.ini with a [server:...] section per stand-in.
+
+Usage:
+    > python benchmarks/plex_standin.py
+    > python benchmarks/plex_standin.py --servers 5 --latency 0.05 --error-rate 0.1
+    > python benchmarks/plex_standin.py --servers 3 --port 32400 --token secret
+"""
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from argparse import ArgumentParser, Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import quoteattr
+
+logger = logging.getLogger(__name__)
+
+PREROLL_SETTING = "cinemaTrailersPrerollID"
+PLEX_VERSION = "1.40.0.7998-c29d4c0c8"
+
+
+def arguments() -> Namespace:
+    """Setup and Return command line arguments
+
+    Returns:
+        argparse.Namespace: Namespace object
+    """
+    parser = ArgumentParser(description="Run local Plex server stand-ins")
+    parser.add_argument(
+        "--servers", dest="servers", type=int, default=1, help="Number of stand-ins [Default: 1]"
+    )
+    parser.add_argument(
+        "--host", dest="host", default="127.0.0.1", help="Address to listen on [Default: 127.0.0.1]"
+    )
+    parser.add_argument(
+        "--port",
+        dest="port",
+        type=int,
+        default=0,
+        help="Port of the first stand-in, the next ones counting up, 0 for any free port "
+        + "[Default: 0]",
+    )
+    parser.add_argument(
+        "--token", dest="token", default="standin", help="Plex token to expect [Default: standin]"
+    )
+    parser.add_argument(
+        "--latency",
+        dest="latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every response [Default: 0]",
+    )
+    parser.add_argument(
+        "--jitter",
+        dest="jitter",
+        type=float,
+        default=0.0,
+        help="Random 0 to N seconds added on top of the latency [Default: 0]",
+    )
+    parser.add_argument(
+        "--error-rate",
+        dest="error_rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with an error [Default: 0]",
+    )
+    parser.add_argument(
+        "--error-status",
+        dest="error_status",
+        type=int,
+        default=503,
+        help="HTTP status of the error responses [Default: 503]",
+    )
+    parser.add_argument("--seed", dest="seed", type=int, default=None, help="Random seed")
+
+    return parser.parse_args()
+
+
+class PlexStandinHandler(BaseHTTPRequestHandler):
+    server: "PlexStandin"
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, dont wait for the ACK of the headers
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s: %s", self.server.name, format % args)
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_PUT(self) -> None:
+        self.handle_request("PUT")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+    def do_DELETE(self) -> None:
+        self.handle_request("DELETE")
+
+    def handle_request(self, method: str) -> None:
+        """Answer a request, after the configured latency, possibly with an error
+
+        Args:
+            method (str): HTTP method
+        """
+        # drain any body so the connection can be kept alive
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        path = url.path.rstrip("/") or "/"
+
+        standin = self.server
+        delay, fail = standin.draw()
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            status, body = standin.error_status, "Stand-in error"
+        elif standin.token and standin.token not in (
+            self.headers.get("X-Plex-Token"),
+            params.get("X-Plex-Token"),
+        ):
+            status, body = 401, "Unauthorized"
+        elif method == "GET" and path == "/":
+            status, body = 200, standin.identity_xml()
+        elif method == "GET" and path == "/:/prefs":
+            status, body = 200, standin.prefs_xml()
+        elif method == "PUT" and path == "/:/prefs":
+            params.pop("X-Plex-Token", None)
+            status, body = standin.save_prefs(params)
+        else:
+            status, body = 404, "Not Found"
+
+        standin.count(method, path, status)
+
+        data = body.encode("utf8")
+        self.send_response(status)
+        self.send_header(
+            "Content-Type", "text/xml;charset=utf-8" if status == 200 else "text/plain"
+        )
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class PlexStandin(ThreadingHTTPServer):
+    """A local HTTP server answering like a Plex server for connect and prefs get/set"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        name: str,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        token: str = "standin",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None,
+    ):
+        """Create the stand-in, listening but not serving yet (See: start)
+
+        Args:
+            name (str):                     server friendlyName
+            host (str, optional):           address to listen on [Default: 127.0.0.1]
+            port (int, optional):           port to listen on, 0 for any free port [Default: 0]
+            token (str, optional):          expected Plex token, empty for none [Default: standin]
+            latency (float, optional):      seconds added to every response [Default: 0]
+            jitter (float, optional):       random 0 to N seconds added to the latency [Default: 0]
+            error_rate (float, optional):   fraction of requests answered with an error [Default: 0]
+            error_status (int, optional):   HTTP status of error responses [Default: 503]
+            seed (int, optional):           random seed of latency jitter and errors [Default: None]
+
+        Raises:
+            OSError: Unable to listen on the address
+        """
+        super().__init__((host, port), PlexStandinHandler)
+        self.name = name
+        self.token = token
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.machine_identifier = uuid.uuid5(uuid.NAMESPACE_URL, f"plex-standin/{name}").hex
+
+        self.prefs: Dict[str, str] = {PREROLL_SETTING: ""}
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.saves = 0
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> Tuple[float, bool]:
+        """Return the delay and if to fail the next request
+
+        Returns:
+            Tuple[float, bool]: (seconds to wait, answer with an error)
+        """
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+
+        return delay, fail
+
+    def count(self, method: str, path: str, status: int) -> None:
+        with self._lock:
+            key = (method, path, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of requests served, by "METHOD path status"
+
+        Returns:
+            Dict[str, int]: request counts
+        """
+        with self._lock:
+            return {f"{m} {p} {s}": n for (m, p, s), n in sorted(self.requests.items())}
+
+    def identity_xml(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            + f'<MediaContainer size="0" friendlyName={quoteattr(self.name)} '
+            + f'machineIdentifier="{self.machine_identifier}" version="{PLEX_VERSION}" '
+            + 'platform="Linux" platformVersion="standin" myPlex="0" multiuser="0" '
+            + 'transcoderActiveVideoSessions="0" updatedAt="0"/>\n'
+        )
+
+    def prefs_xml(self) -> str:
+        with self._lock:
+            value = self.prefs[PREROLL_SETTING]
+
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            + '<MediaContainer size="1">\n'
+            + f'<Setting id="{PREROLL_SETTING}" label="Cinema trailers pre-roll video" '
+            + 'summary="Semicolon (random) or comma (sequential) separated list of videos" '
+            + f'type="text" default="" value={quoteattr(value)} hidden="0" advanced="1" '
+            + 'group="extras"/>\n'
+            + "</MediaContainer>\n"
+        )
+
+    def save_prefs(self, params: Dict[str, str]) -> Tuple[int, str]:
+        """Save settings, only known settings are accepted
+
+        Args:
+            params (Dict[str, str]): setting id -> value
+
+        Returns:
+            Tuple[int, str]: HTTP status and body
+        """
+        unknown = [k for k in params if k not in self.prefs]
+        if not params or unknown:
+            return 400, f"Unknown settings: {', '.join(unknown)}"
+
+        with self._lock:
+            self.prefs.update(params)
+            self.saves += 1
+
+        return 200, ""
+
+    @property
+    def preroll(self) -> str:
+        """The saved Pre-Roll listing"""
+        with self._lock:
+            return self.prefs[PREROLL_SETTING]
+
+    def start(self) -> "PlexStandin":
+        """Serve requests from a background thread
+
+        Returns:
+            PlexStandin: self
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name=f"standin-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket"""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+
+def start_standins(
+    count: int, port: int = 0, seed: Optional[int] = None, **options: Any
+) -> List[PlexStandin]:
+    """Start stand-ins serving from background threads
+
+    Args:
+        count (int):            number of stand-ins, named standin0, standin1, ...
+        port (int, optional):   port of the first stand-in, counting up, 0 for free ports
+                                [Default: 0]
+        seed (int, optional):   random seed, each stand-in using seed + its number [Default: None]
+        **options:              PlexStandin options (host, token, latency, jitter, error_rate,
+                                error_status)
+
+    Raises:
+        OSError: Unable to listen on an address
+
+    Returns:
+        List[PlexStandin]: running stand-ins (See: stop_standins)
+    """
+    standins: List[PlexStandin] = []
+    try:
+        for i in range(count):
+            standin = PlexStandin(
+                f"standin{i}",
+                port=port + i if port else 0,
+                seed=None if seed is None else seed + i,
+                **options,
+            )
+            standins.append(standin.start())
+    except OSError:
+        stop_standins(standins)
+        raise
+
+    return standins
+
+
+def stop_standins(standins: List[PlexStandin]) -> None:
+    """Stop stand-ins started with start_standins
+
+    Args:
+        standins (List[PlexStandin]): running stand-ins
+    """
+    for standin in standins:
+        standin.stop()
+
+
+def config_ini(standins: List[PlexStandin]) -> str:
+    """Return a config.ini with a [server:...] section per stand-in
+
+    Args:
+        standins (List[PlexStandin]): stand-ins
+
+    Returns:
+        str: config.ini contents
+    """
+    sections = [
+        f"[server:{s.name}]\nserver_baseurl = {s.url}\nserver_token = {s.token}\n" for s in standins
+    ]
+    return "\n".join(sections)
+
+
+if __name__ == "__main__":
+    args = arguments()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    running = start_standins(
+        args.servers,
+        port=args.port,
+        seed=args.seed,
+        host=args.host,
+        token=args.token,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    logger.info("Serving %s Plex stand-ins, Ctrl-C to stop. config.ini:\n", len(running))
+    print(config_ini(running), flush=True)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for s in running:
+            logger.info("%s: %s saves, requests: %s", s.name, s.saves, s.stats())
+        stop_standins(running)
+
+    sys.exit(0)
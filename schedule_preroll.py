@@ -17,6 +17,47 @@ Optional Arguments:
   -s SCHEDULE_FILE, --schedule-path SCHEDULE_FILE
                         Path to pre-roll schedule file (YAML) to be use.
                         [Default: ./preroll_schedules.yaml]
+  --simulate FROM TO    Simulate listings between two dates/datetimes, display
+                        only the points where the listing changes
+  --simulate-step STEP  Step between simulated listings (ex: 30m, 1h, 1d)
+                        [Default: 1h]
+  --compile TIMELINE_FILE
+                        Compile the listings of the coming days into a
+                        timeline file, for --apply
+  --compile-days DAYS   Days compiled into the timeline file, from today
+                        [Default: 366]
+  --apply TIMELINE_FILE Save the current listing from a compiled timeline file,
+                        without reading the schedule file
+  -d, --daemon          Keep running, update Plex each time the listing changes
+  --watch               Keep running as with --daemon, reloading the schedule and
+                        config files as soon as they change
+  --serve [HOST:]PORT   Answer listing, timeline and validation queries over
+                        HTTP (JSON), alone or alongside --daemon/--watch
+                        [Default host: 127.0.0.1]
+  -f, --force-push      Save to Plex even if the listing is unchanged
+  --cache-dir CACHE_DIR Folder for local cache files (last pushed state, ...)
+                        [Default: ~/.cache/plex-schedule-prerolls]
+  --stream              Stream date_range ranges while loading the schedule file,
+                        lowers peak memory of very large schedule files
+  --no-cache            Always parse and validate the schedule file, dont use
+                        or update the cached schedule
+  -w MAX_WORKERS, --max-workers MAX_WORKERS
+                        Max Plex servers to connect/save to concurrently
+                        [Default: 8]
+  --timeout [CONNECT,]READ
+                        Plex request timeouts in seconds [Default: 5,30]
+  --retries RETRIES     Retries of a failed Plex push, with jittered
+                        exponential backoff [Default: 2]
+  --breaker-cooldown BREAKER_COOLDOWN
+                        Skip a Plex server for N seconds after 3 failed pushes
+                        in a row, 0 to never skip [Default: 300]
+  --missing-files {ignore,warn,drop,abort}
+                        Check the pre-roll files exist before saving
+                        [Default: ignore]
+  --profile             Print a breakdown of the time spent per phase
+  --metrics-file METRICS_FILE
+                        Write run metrics to a file, Prometheus textfile
+                        format if it ends in .prom, JSON otherwise
 
 Requirements:
 - See Requirements.txt for Python modules
@@ -26,30 +67,67 @@ Scheduling:
     > crontab -e
     > 0 0 * * * python path/to/schedule_preroll.py >/dev/null 2>&1
 
+    Or keep running as a service, waking only when the listing changes:
+    > python path/to/schedule_preroll.py --daemon
+
 Raises:
     FileNotFoundError: [description]
     KeyError: [description]
     ConfigError: [description]
     FileNotFoundError: [description]
 """
-
+import atexit
+import hashlib
 import json
 import logging
 import os
+import pickle
 import sys
+import threading
+import time
 from argparse import ArgumentParser, Namespace
+from calendar import isleap
 from datetime import date, datetime, timedelta
-from typing import Dict, List, NamedTuple, Optional, Tuple, Union
-
-import requests
-import urllib3
-import yaml
-from cerberus import Validator  # type: ignore
-from cerberus.schema import SchemaError
-from plexapi.server import PlexServer
+from functools import lru_cache, partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 # import local util modules
-from util import plexutil
+from util import (
+    cacheutil,
+    columnar,
+    dirindex,
+    fileverify,
+    filewatch,
+    mediaprobe,
+    metrics,
+    plexutil,
+    pushretry,
+    recurrence,
+    resolver,
+)
+from util.scheduleindex import IntervalIndex, sweep_active
+
+# heavy modules (yaml, requests, plexapi) are imported where used,
+# --help/--version/cached test runs start without loading them
+if TYPE_CHECKING:
+    import requests
+    from plexapi.server import PlexServer
+
+    from util.schedulevalidator import ScheduleValidator, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +135,12 @@ script_filename = os.path.basename(sys.argv[0])
 script_name = os.path.splitext(script_filename)[0]
 script_dir = os.path.dirname(__file__)
 
+__version__ = "0.12.4"
+
+# pickled SchedulePlan/ScheduleEntry layout, bump on any change to either
+# (See: schedule_cache_key) so plans cached by older versions are not reused
+PLAN_CACHE_FORMAT = 1
+
 
 class ScheduleEntry(NamedTuple):
     type: str
@@ -64,11 +148,51 @@ class ScheduleEntry(NamedTuple):
     enddate: datetime
     force: bool
     path: str
+    # higher wins within the schedule section (See: resolver)
+    priority: int = 0
 
 
 ScheduleType = Dict[str, List[ScheduleEntry]]
 
 
+class SchedulePlan(NamedTuple):
+    # section contents, without date_range ranges
+    sections: Dict[str, Any]
+    # date_range entries, calculated unless recurring ("xx" raw entries)
+    ranges: List[Union[ScheduleEntry, Dict[str, Any]]]
+
+
+class CompiledSchedule(NamedTuple):
+    entries: List[ScheduleEntry]
+    interval_index: IntervalIndex
+
+
+ScheduleSource = Union[
+    List[ScheduleEntry], CompiledSchedule, columnar.ColumnarSchedule, "ScheduleCalendar"
+]
+
+
+class PlaybackOptions(NamedTuple):
+    play_all: bool = False
+    max_total_seconds: Optional[float] = None
+
+
+class ListingChange(NamedTuple):
+    at: datetime
+    listing: str
+
+
+class PushResult(NamedTuple):
+    server: str
+    listing: str
+    success: bool
+    seconds: float
+    error: Optional[str] = None
+    skipped: bool = False
+    # duration of every connect + save attempt, retries included
+    attempt_seconds: Tuple[float, ...] = ()
+
+
 def arguments() -> Namespace:
     """Setup and Return command line arguments
     See https://docs.python.org/3/howto/argparse.html
@@ -77,11 +201,17 @@ def arguments() -> Namespace:
         argparse.Namespace: Namespace object
     """
     description = "Automate scheduling of pre-roll intros for Plex"
-    version = "0.12.4"
+    version = __version__
 
     config_default = "./config.ini"
     log_config_default = "./logging.conf"
     schedule_default = "./preroll_schedules.yaml"
+    simulate_step_default = "1h"
+    compile_days_default = 366
+    max_workers_default = 8
+    retries_default = 2
+    breaker_cooldown_default = 300.0
+    missing_files_default = "ignore"
     parser = ArgumentParser(description=f"{description}")
     parser.add_argument(
         "-v",
@@ -120,8 +250,165 @@ def arguments() -> Namespace:
         action="store",
         help=f"Path to pre-roll schedule file (YAML) to be use. [Default: {schedule_default}]",
     )
+    parser.add_argument(
+        "-d",
+        "--daemon",
+        dest="do_daemon",
+        action="store_true",
+        default=False,
+        help="Keep running, update Plex each time the listing changes",
+    )
+    parser.add_argument(
+        "--watch",
+        dest="do_watch",
+        action="store_true",
+        default=False,
+        help="Keep running as with --daemon, reloading the schedule and config files as soon as "
+        + "they change, only the changed schedule sections are recompiled",
+    )
+    parser.add_argument(
+        "--serve",
+        dest="serve",
+        action="store",
+        metavar="[HOST:]PORT",
+        help="Answer listing, timeline and validation queries over HTTP (JSON), alone or "
+        + "alongside --daemon/--watch [Default host: 127.0.0.1]",
+    )
+    parser.add_argument(
+        "-f",
+        "--force-push",
+        dest="do_force_push",
+        action="store_true",
+        default=False,
+        help="Save to Plex even if the listing is unchanged",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        action="store",
+        help="Folder for local cache files (last pushed state, ...) "
+        + "[Default: ~/.cache/plex-schedule-prerolls]",
+    )
+    parser.add_argument(
+        "--stream",
+        dest="do_stream",
+        action="store_true",
+        default=False,
+        help="Stream date_range ranges while loading the schedule file (very large schedules)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        default=True,
+        help="Always parse and validate the schedule file, dont use or update the cached schedule",
+    )
+    parser.add_argument(
+        "-w",
+        "--max-workers",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=max_workers_default,
+        help=f"Max Plex servers to connect/save to concurrently [Default: {max_workers_default}]",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        action="store",
+        type=pushretry.parse_timeouts,
+        default=pushretry.Timeouts(),
+        metavar="[CONNECT,]READ",
+        help="Plex request timeouts in seconds [Default: 5,30]",
+    )
+    parser.add_argument(
+        "--retries",
+        dest="retries",
+        action="store",
+        type=int,
+        default=retries_default,
+        help="Retries of a failed Plex push (connection errors, timeouts, HTTP 429/5xx), "
+        + f"with jittered exponential backoff [Default: {retries_default}]",
+    )
+    parser.add_argument(
+        "--breaker-cooldown",
+        dest="breaker_cooldown",
+        action="store",
+        type=float,
+        default=breaker_cooldown_default,
+        help="Skip a Plex server for N seconds after 3 failed pushes in a row, doubling while "
+        + f"it keeps failing, 0 to never skip [Default: {breaker_cooldown_default:.0f}]",
+    )
+    parser.add_argument(
+        "--simulate",
+        dest="simulate",
+        action="store",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        help="Simulate listings between two dates/datetimes, display only the changes",
+    )
+    parser.add_argument(
+        "--simulate-step",
+        dest="simulate_step",
+        action="store",
+        default=simulate_step_default,
+        help=f"Step between simulated listings (ex: 30m, 1h, 1d) [Default: {simulate_step_default}]",
+    )
+    parser.add_argument(
+        "--compile",
+        dest="compile_file",
+        action="store",
+        metavar="TIMELINE_FILE",
+        help="Compile the listings of the coming days into a timeline file for --apply, "
+        + "one timeline per server with its own schedule file (no Plex connection needed)",
+    )
+    parser.add_argument(
+        "--compile-days",
+        dest="compile_days",
+        action="store",
+        type=int,
+        default=compile_days_default,
+        help=f"Days compiled into the timeline file, from today [Default: {compile_days_default}]",
+    )
+    parser.add_argument(
+        "--apply",
+        dest="apply_file",
+        action="store",
+        metavar="TIMELINE_FILE",
+        help="Save the current listing from a compiled timeline file (See: --compile), "
+        + "the schedule file is not read",
+    )
+    parser.add_argument(
+        "--missing-files",
+        dest="missing_files",
+        action="store",
+        choices=fileverify.POLICIES,
+        default=missing_files_default,
+        help="Check the pre-roll files exist before saving: ignore (dont check), warn, "
+        + f"drop them from the listing or abort [Default: {missing_files_default}]",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="do_profile",
+        action="store_true",
+        default=False,
+        help="Print a breakdown of the time spent per phase",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        action="store",
+        help="Write run metrics to a file, Prometheus textfile format if it ends in .prom, "
+        + "JSON otherwise",
+    )
     args = parser.parse_args()
 
+    if args.apply_file and (args.do_daemon or args.do_watch or args.serve or args.compile_file):
+        parser.error(
+            "--apply runs once, it cant be combined with --daemon, --watch, --serve "
+            + "or --compile"
+        )
+
     return args
 
 
@@ -141,18 +428,44 @@ def schedule_types() -> ScheduleType:
     return schema
 
 
+# month keys of the monthly section, locale independent (strftime("%b") is not)
+MONTH_ABBREVIATIONS = [
+    "jan",
+    "feb",
+    "mar",
+    "apr",
+    "may",
+    "jun",
+    "jul",
+    "aug",
+    "sep",
+    "oct",
+    "nov",
+    "dec",
+]
+
+
+@lru_cache(maxsize=None)
 def week_range(year: int, weeknum: int) -> Tuple[datetime, datetime]:
     """Return the starting/ending date range of a given year/week
+    Weeks start on Sunday, week 1 being the week of the first Monday of the year ("%W" + 1)
 
     Args:
         year (int):     Year to calc range for
-        weeknum (int):  Month of the year (1-12)
+        weeknum (int):  Week of the year (1-53)
 
     Returns:
-        DateTime: Start date of the Year/Month
-        DateTime: End date of the Year/Month
+        DateTime: Start date of the Year/Week
+        DateTime: End date of the Year/Week
     """
-    start = datetime.strptime(f"{year}-W{int(weeknum) - 1}-0", "%Y-W%W-%w").date()
+    # same arithmetic as strptime("%Y-W%W-%w") for the Sunday of week "weeknum - 1"
+    week = int(weeknum) - 1
+    first_weekday = date(year, 1, 1).weekday()
+    if week == 0:
+        day_of_year = 7 - first_weekday
+    else:
+        day_of_year = (7 - first_weekday) % 7 + 7 * week
+    start = date(year, 1, 1) + timedelta(days=day_of_year - 1)
     end = start + timedelta(days=6)
 
     start = datetime.combine(start, datetime.min.time())
@@ -161,6 +474,7 @@ def week_range(year: int, weeknum: int) -> Tuple[datetime, datetime]:
     return (start, end)
 
 
+@lru_cache(maxsize=None)
 def month_range(year: int, monthnum: int) -> Tuple[datetime, datetime]:
     """Return the starting/ending date range of a given year/month
 
@@ -205,7 +519,41 @@ def duration_seconds(start: Union[date, datetime], end: Union[date, datetime]) -
     return delta.total_seconds()
 
 
-def make_datetime(value: Union[str, date, datetime], lowtime: bool = True) -> datetime:
+def parse_timedelta(value: str) -> timedelta:
+    """Return a timedelta from a short duration string
+    Supported units: s (seconds), m (minutes), h (hours), d (days), w (weeks)
+
+    Args:
+        value (str): duration string (ex: 90s, 30m, 1h, 1d)
+
+    Raises:
+        ValueError: Unable to parse the duration string
+
+    Returns:
+        timedelta: parsed, positive duration
+    """
+    units = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+    try:
+        amount = float(value[:-1])
+        unit = units[value[-1].lower()]
+    except (KeyError, IndexError, ValueError) as e:
+        msg = f'Unable to parse duration "{value}" (ex: 30m, 1h, 1d)'
+        logger.error(msg)
+        raise ValueError(msg) from e
+
+    delta = timedelta(**{unit: amount})
+    if delta <= timedelta(0):
+        msg = f'Duration must be positive: "{value}"'
+        logger.error(msg)
+        raise ValueError(msg)
+
+    return delta
+
+
+def make_datetime(
+    value: Union[str, date, datetime], lowtime: bool = True, relative_to: Optional[datetime] = None
+) -> datetime:
     """Returns a DateTime object with a calculated Time component if none provided
       converts:
       * Date to DateTime, with a Time of Midnight 00:00 or 11:59 pm
@@ -215,6 +563,8 @@ def make_datetime(value: Union[str, date, datetime], lowtime: bool = True) -> da
         value (Union[str, date, datetime]): Input value to convert to a DateTime object
         lowtime (bool, optional): Calculate time to be midnight (True) or 11:59 PM (False).
                                     Defaults to True.
+        relative_to (datetime, optional): datetime "xx" wildcards are filled in from.
+                                    Defaults to now.
 
     Raises:
         TypeError: Unknown type to calculate
@@ -222,8 +572,8 @@ def make_datetime(value: Union[str, date, datetime], lowtime: bool = True) -> da
     Returns:
         datetime: DateTime object with time component set if none provided
     """
-    today = date.today()
-    now = datetime.now()
+    now = relative_to or datetime.now()
+    today = now.date()
     dt_val = datetime(today.year, today.month, today.day, 0, 0, 0)
 
     # append the low or high time of the day
@@ -278,17 +628,17 @@ def make_datetime(value: Union[str, date, datetime], lowtime: bool = True) -> da
     return dt_val
 
 
-def schedulefile_contents(schedule_filename: Optional[str]) -> dict[str, any]:  # type: ignore
-    """Returns a contents of the provided YAML file and validates
+def schedulefile_path(schedule_filename: Optional[str]) -> str:
+    """Returns the path of the schedule file to use
 
     Args:
         schedule_filename (string, optional]): schedule file to load, will use defaults if not specified
 
     Raises:
-        Validation Errors
+        FileNotFoundError: If no schedule file exists
 
     Returns:
-        YAML Contents: YAML structure of Dict[str, Any]
+        str: path/to/schedule file
     """
     default_files = ["preroll_schedules.yaml", "preroll_schedules.yml"]
 
@@ -316,6 +666,18 @@ def schedulefile_contents(schedule_filename: Optional[str]) -> dict[str, any]:
         logger.error('Missing schedule file: "%s"', filestr)
         raise FileNotFoundError(filestr)
 
+    return str(filename)
+
+
+def schemafile_path() -> str:
+    """Returns the path of the schedule file validation schema
+
+    Raises:
+        FileNotFoundError: If the schema file does not exist
+
+    Returns:
+        str: path/to/schema file
+    """
     schema_filename = os.path.join(script_dir, "util/schedulefile_schema.json")
 
     logger.debug('using schema validation file "%s"', schema_filename)
@@ -326,379 +688,2067 @@ def schedulefile_contents(schedule_filename: Optional[str]) -> dict[str, any]:
         logger.error(msg)
         raise FileNotFoundError(msg)
 
-    # Open Schedule file
-    try:
-        with open(filename, "r", encoding="utf8") as file:
-            contents = yaml.load(file, Loader=yaml.SafeLoader)  # type: ignore
-    except yaml.YAMLError as ye:
-        logger.error("YAML Error: %s", filename, exc_info=ye)
-        raise
-    except Exception as e:
-        logger.error(e, exc_info=e)
-        raise
+    return schema_filename
+
+
+def schedulefile_schema() -> Dict[str, Any]:
+    """Returns the schedule file validation schema (Cerberus syntax)
+
+    Raises:
+        FileNotFoundError: If the schema file does not exist
+        JSONDecodeError: Invalid schema file
+
+    Returns:
+        Dict[str, Any]: validation schema
+    """
+    schema_filename = schemafile_path()
 
-    # Validate the loaded YAML data against the required schema
     try:
         with open(schema_filename, "r", encoding="utf8") as schema_file:
             schema = json.loads(schema_file.read())
-
-        v = Validator(schema)  # type: ignore
     except json.JSONDecodeError as je:
         logger.error("JSON Error: %s", schema_filename, exc_info=je)
         raise
-    except SchemaError as se:
-        logger.error("Schema Error %s", schema_filename, exc_info=se)
-        raise
     except Exception as e:
         logger.error(e, exc_info=e)
         raise
 
-    if not v.validate(contents):  # type: ignore
-        logger.error("Preroll-Schedule YAML Validation Error: %s", v.errors)  # type: ignore
-        raise yaml.YAMLError(f"Preroll-Schedule YAML Validation Error: {v.errors}")  # type: ignore
+    return schema
 
-    return contents
 
+_validators: Dict[str, "ScheduleValidator"] = {}
 
-def preroll_schedule(schedule_file: Optional[str] = None) -> List[ScheduleEntry]:
-    """Return a listing of defined preroll schedules for searching/use
 
-    Args:
-        schedule_file (str): path/to/schedule_preroll.yaml style config file (YAML Format)
+def schedulefile_validator() -> "ScheduleValidator":
+    """Returns the compiled validator of the schedule file schema
+    Compiled once, then reused while the schema file is unchanged
 
     Raises:
-        FileNotFoundError: If no schedule config file exists
+        ValueError: Unsupported rules in the validation schema
 
     Returns:
-        list: list of ScheduleEntries
+        ScheduleValidator: compiled validator
     """
+    from util.schedulevalidator import ScheduleValidator
 
-    contents = schedulefile_contents(schedule_file)  # type: ignore
+    schema = schedulefile_schema()
+    key = json.dumps(schema, sort_keys=True)
 
-    today = date.today()
-    schedule: List[ScheduleEntry] = []
-    for schedule_section in schedule_types():
-        # test if section exists
+    v = _validators.get(key)
+    if v is None:
         try:
-            section_contents = contents[schedule_section]  # type: ignore
-        except KeyError:
-            logger.info('"%s" section not included in schedule file; skipping', schedule_section)
-            # continue to other sections
-            continue
+            v = ScheduleValidator(schema)
+        except Exception as e:
+            logger.error("Schema Error %s", schemafile_path(), exc_info=e)
+            raise
+        _validators[key] = v
 
-        if schedule_section == "weekly":
-            try:
-                if section_contents["enabled"]:
-                    for i in range(1, 53):
-                        try:
-                            path = str(section_contents[i])  # type: ignore
-
-                            if path:
-                                start, end = week_range(today.year, i)
-
-                                entry = ScheduleEntry(
-                                    type=schedule_section,
-                                    force=False,
-                                    startdate=start,
-                                    enddate=end,
-                                    path=path,
-                                )
-
-                                schedule.append(entry)
-                        except KeyError:
-                            # skip KeyError for missing Weeks
-                            logger.debug(
-                                'Key Value not found: "%s"->"%s", skipping week',
-                                schedule_section,
-                                i,
-                            )
-            except KeyError as ke:
-                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
-                raise
-        elif schedule_section == "monthly":
-            try:
-                if section_contents["enabled"]:
-                    for i in range(1, 13):
-                        month_abrev = date(today.year, i, 1).strftime("%b").lower()
-                        try:
-                            path = str(section_contents[month_abrev])  # type: ignore
-                            logger.debug('Month: "%s" Path: "%s"', month_abrev, path)
-
-                            if path and path != "None":
-                                start, end = month_range(today.year, i)
-
-                                logger.debug('Month "%s" Start:%s End:%s', month_abrev, start, end)
-
-                                entry = ScheduleEntry(
-                                    type=schedule_section,
-                                    force=False,
-                                    startdate=start,
-                                    enddate=end,
-                                    path=path,
-                                )
-
-                                schedule.append(entry)
-                        except KeyError:
-                            # skip KeyError for missing Months
-                            logger.warning(
-                                'Key Value not found: "%s"->"%s", skipping month',
-                                schedule_section,
-                                month_abrev,
-                            )
-            except KeyError as ke:
-                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
-                raise
-        elif schedule_section == "date_range":
-            try:
-                if section_contents["enabled"]:
-                    for r in section_contents["ranges"]:  # type: ignore
-                        try:
-                            path = str(r["path"])  # type: ignore
-
-                            if path:
-                                try:
-                                    force = r["force"]  # type: ignore
-                                except KeyError as ke:
-                                    # special case Optional, ignore
-                                    force = False
-
-                                start = make_datetime(r["start_date"], lowtime=True)  # type: ignore
-                                end = make_datetime(r["end_date"], lowtime=False)  # type: ignore
-
-                                entry = ScheduleEntry(
-                                    type=schedule_section,
-                                    force=force,  # type: ignore
-                                    startdate=start,
-                                    enddate=end,
-                                    path=path,
-                                )
-
-                                schedule.append(entry)
-                        except KeyError as ke:
-                            logger.error('Key Value not found for entry: "%s"', entry, exc_info=ke)  # type: ignore
-                            raise
-                        except TypeError as te:
-                            logger.error('Type Error "%s" Entry: "%s"', te, entry, exc_info=te)  # type: ignore
-                            raise
-                        except Exception as e:
-                            logger.error('Exception: %s %s Entry: "%s"', type(e), e, entry, exc_info=e)  # type: ignore
-                            raise
-            except KeyError as ke:
-                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
-                raise
-        elif schedule_section == "misc":
-            try:
-                if section_contents["enabled"]:
-                    try:
-                        path = str(section_contents["always_use"])  # type: ignore
-
-                        if path:
-                            entry = ScheduleEntry(
-                                type=schedule_section,
-                                force=False,
-                                startdate=datetime(today.year, today.month, today.day, 0, 0, 0),
-                                enddate=datetime(today.year, today.month, today.day, 23, 59, 59),
-                                path=path,
-                            )
-
-                            schedule.append(entry)
-                    except KeyError as ke:
-                        msg = f'Key Value not found for entry: "{entry}"'  # type: ignore
-                        logger.error(msg, exc_info=ke)
-                        raise
-            except KeyError as ke:
-                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
-                raise
-        elif schedule_section == "default":
-            try:
-                logger.debug("Checking Default Path Options")
-                if section_contents["enabled"]:
-                    try:
-                        path = str(section_contents["path"])  # type: ignore
-                        logger.debug('Enabling Default Selections: "%s"', path)
-
-                        if path:
-                            entry = ScheduleEntry(
-                                type=schedule_section,
-                                force=False,
-                                startdate=datetime(today.year, today.month, today.day, 0, 0, 0),
-                                enddate=datetime(today.year, today.month, today.day, 23, 59, 59),
-                                path=path,
-                            )
-
-                            schedule.append(entry)
-                    except KeyError as ke:
-                        logger.error('Key Value not found for entry: "%s"', entry, exc_info=ke)  # type: ignore
-                        raise
-            except KeyError as ke:
-                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
-                raise
-        else:
-            msg = f'Unknown schedule_section "{schedule_section}" detected'
-            logger.error(msg)
-            raise ValueError(msg)
+    return v
 
-    # Sort list so most recent Ranges appear first
-    schedule.sort(reverse=True, key=lambda x: x.startdate)
 
-    logger.debug("***START Schedule Set to be used***")
-    logger.debug(schedule)
-    logger.debug("***END Schedule Set to be used***")
+def raise_validation_errors(errors: List["ValidationError"], filename: str) -> None:
+    """Log and raise validation errors, with their line numbers in the schedule file
 
-    return schedule
+    Args:
+        errors (List[ValidationError]): validation errors (See: ScheduleValidator)
+        filename (str):                 path/to/schedule file the errors were found in
 
+    Raises:
+        yaml.YAMLError: Preroll-Schedule YAML Validation Error
+    """
+    import yaml
+
+    from util.schedulevalidator import locate_errors
+
+    with open(filename, "rb") as file:
+        errors = locate_errors(errors, file)
+
+    for error in errors:
+        logger.error("Preroll-Schedule YAML Validation Error: %s", error)
+
+    details = "; ".join(str(e) for e in errors)
+    raise yaml.YAMLError(f"Preroll-Schedule YAML Validation Error: {details}")
 
-def build_listing_string(items: List[str], play_all: bool = False) -> str:
-    """Build the Plex formatted string of preroll paths
+
+def schedulefile_contents(schedule_filename: Optional[str]) -> dict[str, any]:  # type: ignore
+    """Returns a contents of the provided YAML file and validates
 
     Args:
-        items (list):               List of preroll video paths to place into a string listing
-        play_all (bool, optional):  Play all videos. [Default: False (Random choice)]
+        schedule_filename (string, optional]): schedule file to load, will use defaults if not specified
+
+    Raises:
+        Validation Errors
 
     Returns:
-        string: CSV Listing (, or ;) based on play_all param of preroll video paths
+        YAML Contents: YAML structure of Dict[str, Any]
     """
+    import yaml
 
-    if len(items) == 0:
-        return ";"
+    from util import yamlstream
 
-    if play_all:
-        # use , to play all entries
-        listing = ",".join(items)
-    else:
-        # use ; to play random selection
-        listing = ";".join(items)
+    filename = schedulefile_path(schedule_filename)
 
-    return listing
+    # Open Schedule file
+    try:
+        with metrics.span("yaml_load"), open(filename, "rb") as file:
+            contents = yamlstream.load(file)
+    except yaml.YAMLError as ye:
+        logger.error("YAML Error: %s", filename, exc_info=ye)
+        raise
+    except Exception as e:
+        logger.error(e, exc_info=e)
+        raise
 
+    # Validate the loaded YAML data against the required schema
+    with metrics.span("validate"):
+        errors = schedulefile_validator().validate(contents)
+    if errors:
+        raise_validation_errors(errors, filename)
+
+    return contents
 
-def preroll_listing(schedule: List[ScheduleEntry], for_datetime: Optional[datetime] = None) -> str:
-    """Return listing of preroll videos to be used by Plex
+
+def is_recurring(value: Union[str, date, datetime]) -> bool:
+    """Return if a date/datetime value uses "xx" wildcards (See: make_datetime)
 
     Args:
-        schedule (List[ScheduleEntry]):     List of schedule entries (See: getPrerollSchedule)
-        for_datetime (datetime, optional):  Date to process pre-roll string for [Default: Today]
-                                            Useful for simulating what different dates produce
+        value (Union[str, date, datetime]): start/end value of a date range
 
     Returns:
-        string: listing of preroll video paths to be used for Extras. CSV style: (;|,)
+        bool: True if the value depends on the date it is calculated for
     """
-    listing = ""
-    entries = schedule_types()
-
-    # determine which date to build the listing for
-    if for_datetime:
-        if isinstance(for_datetime, datetime):  # type: ignore
-            check_datetime = for_datetime
-        else:
-            check_datetime = datetime.combine(for_datetime, datetime.now().time())
-    else:
-        check_datetime = datetime.now()
+    return isinstance(value, str) and "xx" in value.lower()
 
-    # process the schedule for the given date
-    for entry in schedule:
-        try:
-            entry_start = entry.startdate
-            entry_end = entry.enddate
-            if not isinstance(entry_start, datetime):  # type: ignore
-                entry_start = datetime.combine(entry_start, datetime.min.time())
-            if not isinstance(entry_end, datetime):  # type: ignore
-                entry_end = datetime.combine(entry_end, datetime.max.time())
 
-            logger.debug(
-                'checking "%s" against: "%s" - "%s"', check_datetime, entry_start, entry_end
-            )
+def schedule_plan(
+    contents: Dict[str, Any],
+    ranges: Optional[List[Union[ScheduleEntry, Dict[str, Any]]]] = None,
+) -> SchedulePlan:
+    """Return a SchedulePlan for validated schedule file contents
+    Date ranges without "xx" wildcards are calculated once here, everything
+    depending on the current day is left for expand_schedule
 
-            if entry_start <= check_datetime <= entry_end:
-                entry_type = entry.type
-                entry_path = entry.path
-                entry_force = False
-                try:
-                    entry_force = entry.force
-                except KeyError:
-                    # special case Optional, ignore
-                    pass
+    Args:
+        contents (Dict[str, Any]):  validated schedule file contents (See: schedulefile_contents)
+        ranges (List, optional):    date ranges already calculated for the same date_range
+                                    section, ex: of a previous plan (See: changed_sections)
+                                    [Default: calculated]
 
-                logger.info(
-                    'Check PASS: Using "%s" - "%s" - "%s"', entry_start, entry_end, entry_path
-                )
+    Raises:
+        KeyError: Key Value not found in a section
 
-                if entry_path:
-                    found = False
-                    # check new schedule item against exist list
-                    for e in entries[entry_type]:
-                        duration_new = duration_seconds(entry_start, entry_end)
-                        duration_curr = duration_seconds(e.startdate, e.enddate)
+    Returns:
+        SchedulePlan: sections and date ranges ready for expand_schedule
+    """
+    sections: Dict[str, Any] = {}
+    plan_ranges: List[Union[ScheduleEntry, Dict[str, Any]]] = []
 
-                        # only the narrowest timeframe should stay
-                        # disregard if a force entry is there
-                        if duration_new < duration_curr and e.force != True:
-                            entries[entry_type].remove(e)
+    for schedule_section in schedule_types():
+        # test if section exists
+        try:
+            section_contents = contents[schedule_section]  # type: ignore
+        except KeyError:
+            logger.info('"%s" section not included in schedule file; skipping', schedule_section)
+            # continue to other sections
+            continue
 
-                        found = True
+        if schedule_section != "date_range":
+            sections[schedule_section] = section_contents
+            continue
 
-                    # prep for use if New, or is a force Usage
-                    if not found or entry_force == True:
-                        entries[entry_type].append(entry)
+        sections[schedule_section] = {k: v for k, v in section_contents.items() if k != "ranges"}
+        if ranges is not None:
+            plan_ranges = ranges
+            continue
+        try:
+            if section_contents["enabled"]:
+                for r in section_contents.get("ranges") or []:  # type: ignore
+                    if is_recurring(r["start_date"]) or is_recurring(r["end_date"]):  # type: ignore
+                        plan_ranges.append(r)  # type: ignore
+                    else:
+                        entry = date_range_entry(r)  # type: ignore
+                        if entry:
+                            plan_ranges.append(entry)
         except KeyError as ke:
-            logger.error('KeyError with entry "%s"', entry, exc_info=ke)
+            logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
             raise
 
-    # Build the merged output based or order of Priority
-    merged_list = []
-    if entries["misc"]:
-        merged_list.extend([p.path for p in entries["misc"]])  # type: ignore
-    if entries["date_range"]:
-        merged_list.extend([p.path for p in entries["date_range"]])  # type: ignore
-    if entries["weekly"] and not entries["date_range"]:
-        merged_list.extend([p.path for p in entries["weekly"]])  # type: ignore
-    if entries["monthly"] and not entries["weekly"] and not entries["date_range"]:
-        merged_list.extend([p.path for p in entries["monthly"]])  # type: ignore
-    if (
-        entries["default"]
-        and not entries["monthly"]
-        and not entries["weekly"]
-        and not entries["date_range"]
-    ):
-        merged_list.extend([p.path for p in entries["default"]])  # type: ignore
-
-    listing = build_listing_string(merged_list)
+    if "playback" in contents:
+        sections["playback"] = contents["playback"]
 
-    return listing
+    return SchedulePlan(sections=sections, ranges=plan_ranges)
 
 
-def save_preroll_listing(plex: PlexServer, preroll_listing: Union[str, List[str]]) -> None:
-    """Save Plex Preroll info to PlexServer settings
+def changed_sections(previous: Dict[str, Any], contents: Dict[str, Any]) -> Set[str]:
+    """Return the sections of a schedule file that differ between two versions of it
 
     Args:
-        plex (PlexServer): Plex server to update
-        preroll_listing (str, list[str]): csv listing or List of preroll paths to save
+        previous (Dict[str, Any]):  previous schedule file contents (See: schedulefile_contents)
+        contents (Dict[str, Any]):  current schedule file contents
+
+    Returns:
+        Set[str]: changed (added, removed or edited) sections, schedule sections and playback
     """
-    # if happend to send in an Iterable List, merge to a string
-    if isinstance(preroll_listing, list):
-        preroll_listing = build_listing_string(list(preroll_listing))
+    return {
+        section
+        for section in list(schedule_types()) + ["playback"]
+        if previous.get(section) != contents.get(section)
+    }
 
-    logger.debug('Attempting save of pre-rolls: "%s"', preroll_listing)
 
-    plex.settings.get("cinemaTrailersPrerollID").set(preroll_listing)  # type: ignore
-    try:
-        plex.settings.save()  # type: ignore
-    except Exception as e:
-        logger.error('Unable to save Pre-Rolls to Server: "%s"', plex.friendlyName, exc_info=e)  # type: ignore
-        raise e
+def date_range_entry(
+    r: Dict[str, Any], relative_to: Optional[datetime] = None
+) -> Optional[ScheduleEntry]:
+    """Return the ScheduleEntry of a date_range entry, None if it has no path
+
+    Args:
+        r (Dict[str, Any]):                 date_range entry {start_date, end_date, path, force,
+                                            priority}
+        relative_to (datetime, optional):   datetime "xx" wildcards are filled in from
+                                            [Default: now]
+
+    Raises:
+        KeyError: Key Value not found for entry
+        TypeError: Unknown start/end value types
+
+    Returns:
+        ScheduleEntry: calculated schedule entry
+    """
+    schedule_section = "date_range"
+    entry = None
+    try:
+        path = str(r["path"])  # type: ignore
+
+        if path:
+            try:
+                force = r["force"]  # type: ignore
+            except KeyError as ke:
+                # special case Optional, ignore
+                force = False
+
+            start = make_datetime(r["start_date"], True, relative_to)  # type: ignore
+            end = make_datetime(r["end_date"], False, relative_to)  # type: ignore
+
+            entry = ScheduleEntry(
+                type=schedule_section,
+                force=force,  # type: ignore
+                startdate=start,
+                enddate=end,
+                path=path,
+                priority=r.get("priority") or 0,  # type: ignore
+            )
+    except KeyError as ke:
+        logger.error('Key Value not found for entry: "%s"', r, exc_info=ke)  # type: ignore
+        raise
+    except TypeError as te:
+        logger.error('Type Error "%s" Entry: "%s"', te, r, exc_info=te)  # type: ignore
+        raise
+    except Exception as e:
+        logger.error('Exception: %s %s Entry: "%s"', type(e), e, r, exc_info=e)  # type: ignore
+        raise
+
+    return entry
+
+
+def streamed_schedule_plan(schedule_filename: Optional[str]) -> SchedulePlan:
+    """Return the SchedulePlan of a schedule file, streaming the date_range ranges
+    Each range is validated and calculated as it is read, instead of first
+    loading the whole YAML document and validating it at once
+
+    Args:
+        schedule_filename (str, optional): schedule file to load, will use defaults if not specified
+
+    Raises:
+        Validation Errors
+
+    Returns:
+        SchedulePlan: sections and date ranges ready for expand_schedule
+    """
+    import yaml
+
+    from util import yamlstream
+
+    filename = schedulefile_path(schedule_filename)
+    v = schedulefile_validator()
+
+    ranges: List[Union[ScheduleEntry, Dict[str, Any]]] = []
+    errors: List["ValidationError"] = []
+    try:
+        with open(filename, "rb") as file:
+            streamed = yamlstream.StreamedDocument(file, ("date_range", "ranges"))
+
+            for i, r in enumerate(streamed.items()):
+                range_errors = v.validate_field(r, ("date_range", "ranges", i))
+                if range_errors:
+                    errors.extend(range_errors)
+                elif is_recurring(r["start_date"]) or is_recurring(r["end_date"]):
+                    ranges.append(r)
+                else:
+                    entry = date_range_entry(r)
+                    if entry:
+                        ranges.append(entry)
+    except yaml.YAMLError as ye:
+        logger.error("YAML Error: %s", filename, exc_info=ye)
+        raise
+    except Exception as e:
+        logger.error(e, exc_info=e)
+        raise
+
+    contents = streamed.document
+    errors.extend(v.validate(contents))
+    if errors:
+        raise_validation_errors(errors, filename)
+
+    plan = schedule_plan(contents)
+
+    if not plan.sections.get("date_range", {}).get("enabled"):
+        ranges = []
+
+    return SchedulePlan(sections=plan.sections, ranges=ranges)
+
+
+def load_schedule_plan(schedule_filename: Optional[str], stream: bool = False) -> SchedulePlan:
+    """Return the SchedulePlan of a schedule file
+
+    Args:
+        schedule_filename (str, optional):  schedule file to load, will use defaults if not specified
+        stream (bool, optional):            stream the date_range ranges (See: streamed_schedule_plan)
+                                            [Default: False]
+
+    Returns:
+        SchedulePlan: sections and date ranges ready for expand_schedule
+    """
+    if stream:
+        return streamed_schedule_plan(schedule_filename)
+
+    return schedule_plan(schedulefile_contents(schedule_filename))  # type: ignore
+
+
+def schedule_cache_key(filename: str, schema_filename: str) -> str:
+    """Return the cache key of a schedule file
+    Changes with the schedule file contents, the schema contents, the tool version
+    and the cached plan format (See: PLAN_CACHE_FORMAT)
+
+    Args:
+        filename (str):         path/to/schedule file
+        schema_filename (str):  path/to/schema file
+
+    Returns:
+        str: cache key (hex digest)
+    """
+    digest = hashlib.sha256()
+    for f in (filename, schema_filename):
+        with open(f, "rb") as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    digest.update(__version__.encode("utf8"))
+    digest.update(f"plan-format:{PLAN_CACHE_FORMAT}".encode("utf8"))
+
+    return digest.hexdigest()
+
+
+def cached_schedule_plan(
+    schedule_filename: Optional[str], cache_dir: Optional[str] = None, stream: bool = False
+) -> SchedulePlan:
+    """Return the SchedulePlan of a schedule file, from the local cache when unchanged
+    Unchanged schedule files skip YAML parsing and validation completely,
+    edits (or schema/tool version changes) invalidate the cached plan
+
+    Args:
+        schedule_filename (str, optional):  schedule file to load, will use defaults if not specified
+        cache_dir (str, optional):          path/to/cache folder [Default: per-user cache folder]
+        stream (bool, optional):            stream the date_range ranges when not cached
+                                            (See: streamed_schedule_plan) [Default: False]
+
+    Returns:
+        SchedulePlan: sections and date ranges ready for expand_schedule
+    """
+    filename = schedulefile_path(schedule_filename)
+    key = schedule_cache_key(filename, schemafile_path())
+
+    path_hash = cacheutil.text_hash(os.path.abspath(filename))[:16]
+    cache_file = os.path.join(cacheutil.cache_dir(cache_dir), f"schedule-{path_hash}.pickle")
+
+    try:
+        with open(cache_file, "rb") as file:
+            cached = pickle.load(file)
+        if cached["key"] == key:
+            logger.debug('Using cached schedule for "%s"', filename)
+            metrics.count("schedule_cache_hits")
+            return SchedulePlan(
+                sections=cached["sections"],
+                ranges=[ScheduleEntry(*r) if isinstance(r, tuple) else r for r in cached["ranges"]],
+            )
+        logger.debug('Cached schedule for "%s" is out of date', filename)
+    except FileNotFoundError:
+        logger.debug('No cached schedule for "%s"', filename)
+    except Exception as e:
+        logger.warning('Unable to read cached schedule "%s", ignoring: %s', cache_file, e)
+
+    metrics.count("schedule_cache_misses")
+    plan = load_schedule_plan(filename, stream)
+
+    # store plain tuples, not bound to the module ScheduleEntry was defined in
+    cached = {
+        "key": key,
+        "sections": plan.sections,
+        "ranges": [tuple(r) if isinstance(r, ScheduleEntry) else r for r in plan.ranges],
+    }
+    try:
+        cacheutil.atomic_write(cache_file, pickle.dumps(cached, protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError as e:
+        logger.warning('Unable to write cached schedule "%s": %s', cache_file, e)
+
+    return plan
+
+
+def is_yearly(value: Union[str, date, datetime]) -> bool:
+    """Return if a date range value repeats every year: "xx" wildcards in its year only
+    (ex: "xxxx-12-25"), fixed values count as yearly too
+
+    Args:
+        value (Union[str, date, datetime]): start/end value of a date range
+
+    Returns:
+        bool: True if the value only depends on the year it is calculated for
+    """
+    if not is_recurring(value):
+        return True
+
+    dateparts = str(value).lower().split("-", 1)
+    return dateparts[0] == "xxxx" and len(dateparts) > 1 and "xx" not in dateparts[1]
+
+
+def is_leap_day(value: Union[str, date, datetime]) -> bool:
+    """Return if a "xxxx" yearly date range value falls on February 29th
+
+    Args:
+        value (Union[str, date, datetime]): start/end value of a date range
+
+    Returns:
+        bool: True for "xxxx-02-29" values, which only exist in leap years
+    """
+    dateparts = str(value).lower().split("-")
+    return (
+        len(dateparts) > 2
+        and dateparts[0] == "xxxx"
+        and dateparts[1] == "02"
+        and dateparts[2].split(" ")[0] == "29"
+    )
+
+
+Rank = Tuple[int, int, int]
+
+
+class CalendarYear(NamedTuple):
+    # schedule entries of a section for a year, in schedule order (section, item, year)
+    entries: List[ScheduleEntry]
+    ranks: List[Rank]
+    # entry positions in the index (entries ending before they start never match)
+    positions: List[int]
+    interval_index: IntervalIndex
+
+
+class ScheduleCalendar:
+    """Schedule entries of a SchedulePlan for any date, across years
+
+    Recurring sections (weekly, monthly and "xxxx" yearly date ranges) are
+    expanded the first time a year is looked up, and kept with an interval
+    index per section and year. Entries depending on the day itself (default,
+    misc, date ranges with "xx" month/day/time wildcards and recurrence rules)
+    are calculated per lookup, rules with a bit test of their year bitmap.
+
+    Calendars of an edited schedule reuse the expanded years of the sections
+    left unchanged (See: updated).
+
+    Yearly date ranges ending before they start span the new year,
+    ex: "xxxx-12-20" - "xxxx-01-05" runs from December 20th to January 5th.
+    """
+
+    # schedule order of the sections (See: schedule_types)
+    SECTIONS = list(schedule_types())
+    # sections expanded per year, the others are calculated per day
+    YEAR_SECTIONS = ["monthly", "weekly", "date_range"]
+
+    def __init__(self, plan: SchedulePlan):
+        """
+        Args:
+            plan (SchedulePlan): sections and date ranges (See: schedule_plan)
+
+        Raises:
+            KeyError: Key Value not found in a section
+            ValueError: Invalid section mode or date_range rule
+        """
+        self.plan = plan
+        self.layers = schedule_layers(plan)
+        self._years: Dict[Tuple[str, int], CalendarYear] = {}
+
+        self._enabled: Dict[str, bool] = {}
+        for schedule_section in self.SECTIONS:
+            if schedule_section not in plan.sections:
+                continue
+            try:
+                self._enabled[schedule_section] = bool(plan.sections[schedule_section]["enabled"])
+            except KeyError as ke:
+                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
+                raise
+
+        # date ranges by how they repeat: fixed, every year or every day
+        self._ranges: List[Tuple[int, Union[ScheduleEntry, Dict[str, Any]], str]] = []
+        self._rules: List[Tuple[int, recurrence.RecurrenceRule]] = []
+        if self._enabled.get("date_range"):
+            for i, r in enumerate(plan.ranges):
+                if isinstance(r, ScheduleEntry):
+                    kind = "fixed"
+                elif is_yearly(r["start_date"]) and is_yearly(r["end_date"]):
+                    kind = "yearly"
+                else:
+                    kind = "daily"
+                self._ranges.append((i, r, kind))
+
+            # recurrence rules follow the ranges in schedule order
+            try:
+                self._rules = [
+                    (len(plan.ranges) + j, recurrence.parse_rule(rule))
+                    for j, rule in enumerate(plan.sections["date_range"].get("rules") or [])
+                ]
+            except (KeyError, ValueError) as e:
+                logger.error('Invalid rule in "date_range" section', exc_info=e)
+                raise
+
+        # day entries only change with the date, unless a range has "xx" time wildcards
+        self._time_wildcards = any(
+            "xx" in str(r[k]).lower().partition(" ")[2]  # type: ignore
+            for _, r, kind in self._ranges
+            if kind == "daily"
+            for k in ("start_date", "end_date")
+        )
+        self._day: Optional[Tuple[date, List[Tuple[Rank, ScheduleEntry]]]] = None
+
+    def _rank(self, schedule_section: str, item: int = 0, year: int = 0) -> Rank:
+        return (self.SECTIONS.index(schedule_section), item, year)
+
+    def _weekly(self, year: int) -> List[Tuple[Rank, ScheduleEntry]]:
+        schedule_section = "weekly"
+        section_contents = self.plan.sections[schedule_section]
+        entries = []
+        for i in range(1, 53):
+            # week numbers are quoted ("1") in schedule files
+            path = section_contents.get(str(i), section_contents.get(i))
+            if path is None or str(path) in ("", "None"):
+                logger.debug('Key Value not found: "%s"->"%s", skipping week', schedule_section, i)
+                continue
+
+            start, end = week_range(year, i)
+            entry = ScheduleEntry(
+                type=schedule_section, force=False, startdate=start, enddate=end, path=str(path)
+            )
+            entries.append((self._rank(schedule_section, i, year), entry))
+
+        return entries
+
+    def _monthly(self, year: int) -> List[Tuple[Rank, ScheduleEntry]]:
+        schedule_section = "monthly"
+        section_contents = self.plan.sections[schedule_section]
+        entries = []
+        for i, month_abrev in enumerate(MONTH_ABBREVIATIONS, 1):
+            try:
+                path = str(section_contents[month_abrev])  # type: ignore
+            except KeyError:
+                # skip KeyError for missing Months
+                logger.debug(
+                    'Key Value not found: "%s"->"%s", skipping month', schedule_section, month_abrev
+                )
+                continue
+
+            if path and path != "None":
+                start, end = month_range(year, i)
+                entry = ScheduleEntry(
+                    type=schedule_section, force=False, startdate=start, enddate=end, path=path
+                )
+                entries.append((self._rank(schedule_section, i), entry))
+
+        return entries
+
+    def _yearly(self, i: int, r: Dict[str, Any], year: int) -> Optional[Tuple[Rank, ScheduleEntry]]:
+        # the date range instance starting in a given year, None if there is none
+        if not isleap(year) and (is_leap_day(r["start_date"]) or is_leap_day(r["end_date"])):
+            return None
+
+        entry = date_range_entry(r, datetime(year, 1, 1))
+        if entry is None:
+            return None
+
+        if is_recurring(r["start_date"]) and is_recurring(r["end_date"]):
+            if entry.enddate < entry.startdate:
+                # ends in the next year, ex: "xxxx-12-20" - "xxxx-01-05"
+                if is_leap_day(r["end_date"]) and not isleap(year + 1):
+                    return None
+                entry = entry._replace(enddate=entry.enddate.replace(year=year + 1))
+
+        return self._rank("date_range", i, year), entry
+
+    def section_year(self, schedule_section: str, year: int) -> CalendarYear:
+        """Return the entries of a section for a year, not depending on the day (memoized)
+        Includes entries starting in the previous year and running into this one
+
+        Args:
+            schedule_section (str): section to expand (See: YEAR_SECTIONS)
+            year (int):             year to expand
+
+        Returns:
+            CalendarYear: entries and their interval index
+        """
+        key = (schedule_section, year)
+        if key in self._years:
+            return self._years[key]
+
+        with metrics.span("expand"):
+            ranked: List[Tuple[Rank, ScheduleEntry]] = []
+            enabled = self._enabled.get(schedule_section)
+            if schedule_section == "monthly" and enabled:
+                ranked.extend(self._monthly(year))
+            elif schedule_section == "weekly" and enabled:
+                ranked.extend(self._weekly(year))
+                # week 52 may run into the next year, week 1 start in the previous year
+                ranked.extend(e for e in self._weekly(year - 1) if e[1].enddate.year == year)
+                ranked.extend(e for e in self._weekly(year + 1) if e[1].startdate.year == year)
+            elif schedule_section == "date_range":
+                # no ranges when disabled
+                for i, r, kind in self._ranges:
+                    if kind == "fixed":
+                        ranked.append((self._rank("date_range", i), r))  # type: ignore
+                    elif kind == "yearly":
+                        # previous year instances only when running into this year
+                        previous = self._yearly(i, r, year - 1)  # type: ignore
+                        if previous is not None and previous[1].enddate.year == year:
+                            ranked.append(previous)
+                        current = self._yearly(i, r, year)  # type: ignore
+                        if current is not None:
+                            ranked.append(current)
+            ranked.sort(key=lambda e: e[0])
+
+            entries = [e for _, e in ranked]
+            ranks = [r for r, _ in ranked]
+            positions = [p for p, e in enumerate(entries) if e.startdate <= e.enddate]
+            index = IntervalIndex([(entries[p].startdate, entries[p].enddate) for p in positions])
+        metrics.count("entries_expanded", len(entries))
+
+        logger.debug("Expanded %s %s schedule entries for %s", len(entries), schedule_section, year)
+        self._years[key] = CalendarYear(
+            entries=entries, ranks=ranks, positions=positions, interval_index=index
+        )
+
+        return self._years[key]
+
+    def year(self, year: int) -> List[CalendarYear]:
+        """Return the entries of every year expanded section for a year (See: section_year)
+
+        Args:
+            year (int): year to expand
+
+        Returns:
+            List[CalendarYear]: entries and their interval index, per section
+        """
+        return [self.section_year(s, year) for s in self.YEAR_SECTIONS]
+
+    def updated(self, plan: SchedulePlan, changed: Iterable[str]) -> "ScheduleCalendar":
+        """Return the calendar of an edited schedule, reusing the expanded years of
+        the sections left unchanged
+
+        Args:
+            plan (SchedulePlan):    sections and date ranges of the edited schedule
+            changed (Iterable[str]): sections that changed (See: changed_sections)
+
+        Raises:
+            KeyError: Key Value not found in a section
+            ValueError: Invalid section mode or date_range rule
+
+        Returns:
+            ScheduleCalendar: calendar of the edited schedule
+        """
+        calendar = ScheduleCalendar(plan)
+        changed = set(changed)
+        calendar._years = {k: v for k, v in self._years.items() if k[0] not in changed}
+        logger.debug(
+            "Recompiling sections %s, reusing %s expanded section years",
+            sorted(changed),
+            len(calendar._years),
+        )
+
+        return calendar
+
+    def day_entries(self, at: datetime) -> List[Tuple[Rank, ScheduleEntry]]:
+        """Return the ranked schedule entries calculated for a given day
+
+        Args:
+            at (datetime): datetime "xx" wildcards are filled in from
+
+        Returns:
+            List[Tuple[Rank, ScheduleEntry]]: (schedule order, entry) pairs
+        """
+        # one read of the shared cache, request threads (See: queryservice) replace it
+        cached = self._day
+        if not self._time_wildcards and cached is not None and cached[0] == at.date():
+            return cached[1]
+
+        day_start = datetime(at.year, at.month, at.day, 0, 0, 0)
+        day_end = datetime(at.year, at.month, at.day, 23, 59, 59)
+
+        ranked: List[Tuple[Rank, ScheduleEntry]] = []
+        for schedule_section, key in (("default", "path"), ("misc", "always_use")):
+            if not self._enabled.get(schedule_section):
+                continue
+            try:
+                path = str(self.plan.sections[schedule_section][key])  # type: ignore
+            except KeyError as ke:
+                logger.error('Key Value not found in "%s" section', schedule_section, exc_info=ke)
+                raise
+            if path:
+                entry = ScheduleEntry(
+                    type=schedule_section,
+                    force=False,
+                    startdate=day_start,
+                    enddate=day_end,
+                    path=path,
+                )
+                ranked.append((self._rank(schedule_section), entry))
+
+        for i, r, kind in self._ranges:
+            if kind == "daily":
+                # recurring (xx) ranges are calculated for the day
+                entry = date_range_entry(r, at)  # type: ignore
+                if entry:
+                    ranked.append((self._rank("date_range", i), entry))
+
+        day = at.date()
+        for i, rule in self._rules:
+            if recurrence.matches(rule, day):
+                entry = ScheduleEntry(
+                    type="date_range",
+                    force=rule.force,
+                    startdate=day_start,
+                    enddate=datetime.combine(day, datetime.max.time()),
+                    path=rule.path,
+                    priority=rule.priority,
+                )
+                ranked.append((self._rank("date_range", i), entry))
+
+        self._day = (at.date(), ranked)
+        return ranked
+
+    @staticmethod
+    def _ordered(ranked: List[Tuple[Rank, ScheduleEntry]]) -> List[ScheduleEntry]:
+        # schedule order, then most recent ranges first
+        entries = [e for _, e in sorted(ranked, key=lambda e: e[0])]
+        entries.sort(reverse=True, key=lambda x: x.startdate)
+        return entries
+
+    def entries(self, day: Union[date, datetime]) -> List[ScheduleEntry]:
+        """Return all schedule entries of the year of a day, with day entries for that day
+
+        Args:
+            day (Union[date, datetime]): day to calculate day entries for
+
+        Returns:
+            List[ScheduleEntry]: schedule entries, most recent ranges first
+        """
+        at = listing_datetime(day)
+        ranked: List[Tuple[Rank, ScheduleEntry]] = []
+        for calendar_year in self.year(at.year):
+            ranked.extend(zip(calendar_year.ranks, calendar_year.entries))
+
+        return self._ordered(ranked + self.day_entries(at))
+
+    def active(self, at: datetime) -> List[ScheduleEntry]:
+        """Return the schedule entries active at a given datetime, in schedule order
+
+        Args:
+            at (datetime): datetime to check entries against
+
+        Returns:
+            List[ScheduleEntry]: active entries
+        """
+        ranked: List[Tuple[Rank, ScheduleEntry]] = []
+        for calendar_year in self.year(at.year):
+            positions = [calendar_year.positions[i] for i in calendar_year.interval_index.query(at)]
+            ranked.extend((calendar_year.ranks[p], calendar_year.entries[p]) for p in positions)
+        ranked.extend((r, e) for r, e in self.day_entries(at) if e.startdate <= at <= e.enddate)
+
+        return self._ordered(ranked)
+
+    def next_change(self, after: datetime) -> datetime:
+        """Return the next instant after a datetime at which the active entries may change
+
+        Args:
+            after (datetime): datetime to search from
+
+        Returns:
+            datetime: next change, at the latest the next midnight (day entries are recalculated)
+        """
+        candidates = [datetime.combine(after.date() + timedelta(days=1), datetime.min.time())]
+
+        for calendar_year in self.year(after.year):
+            next_start = calendar_year.interval_index.next_start(after)
+            if next_start is not None:
+                candidates.append(next_start)
+            # entries are inclusive of their end, the change happens just after
+            next_end = calendar_year.interval_index.next_end(after)
+            if next_end is not None:
+                candidates.append(next_end + timedelta(microseconds=1))
+
+        for _, e in self.day_entries(after):
+            if e.startdate > after:
+                candidates.append(e.startdate)
+            if e.enddate >= after:
+                candidates.append(e.enddate + timedelta(microseconds=1))
+
+        return min(candidates)
+
+
+def expand_schedule(plan: SchedulePlan) -> List[ScheduleEntry]:
+    """Return a listing of schedule entries of a SchedulePlan, for the current day
+
+    Args:
+        plan (SchedulePlan): sections and date ranges (See: schedule_plan)
+
+    Raises:
+        KeyError: Key Value not found in a section
+
+    Returns:
+        list: list of ScheduleEntries
+    """
+    schedule = ScheduleCalendar(plan).entries(date.today())
+
+    logger.debug("***START Schedule Set to be used***")
+    logger.debug(schedule)
+    logger.debug("***END Schedule Set to be used***")
+
+    return schedule
+
+
+def schedule_playback(plan: SchedulePlan) -> PlaybackOptions:
+    """Return the playback options of a SchedulePlan ("playback" section)
+
+    Args:
+        plan (SchedulePlan): sections and date ranges (See: schedule_plan)
+
+    Returns:
+        PlaybackOptions: play_all and max_total_seconds, defaults if not enabled
+    """
+    section = plan.sections.get("playback") or {}
+    if not section.get("enabled"):
+        return PlaybackOptions()
+
+    return PlaybackOptions(
+        play_all=bool(section.get("play_all", False)),
+        max_total_seconds=section.get("max_total_seconds"),
+    )
+
+
+def schedule_layers(plan: SchedulePlan) -> Tuple[resolver.Layer, ...]:
+    """Return the priority layers of a SchedulePlan, sections "priority"/"mode" applied
+
+    Args:
+        plan (SchedulePlan): sections and date ranges (See: schedule_plan)
+
+    Raises:
+        ValueError: Unknown section mode
+
+    Returns:
+        Tuple[resolver.Layer, ...]: layers, highest priority first
+    """
+    return resolver.layers_from_config(
+        {name: plan.sections[name] for name in schedule_types() if name in plan.sections}
+    )
+
+
+# playback options of the schedule files loaded by preroll_schedule
+_playback: Dict[str, PlaybackOptions] = {}
+
+
+def preroll_playback(schedule_file: Optional[str] = None) -> PlaybackOptions:
+    """Return the playback options of a schedule file loaded with preroll_schedule
+
+    Args:
+        schedule_file (str, optional): path/to/schedule file, will use defaults if not specified
+
+    Returns:
+        PlaybackOptions: playback options, defaults if the file was not loaded
+    """
+    return _playback.get(schedulefile_path(schedule_file), PlaybackOptions())
+
+
+def preroll_calendar(
+    schedule_file: Optional[str] = None,
+    use_cache: bool = False,
+    cache_dir: Optional[str] = None,
+    stream: bool = False,
+) -> "ScheduleCalendar":
+    """Return the schedule calendar of a schedule file, for listings of any date
+
+    Args:
+        schedule_file (str):            path/to/schedule_preroll.yaml style config file (YAML Format)
+        use_cache (bool, optional):     reuse the validated schedule of unchanged files from
+                                        the local cache. [Default: False]
+        cache_dir (str, optional):      path/to/cache folder [Default: per-user cache folder]
+        stream (bool, optional):        stream the date_range ranges while loading, for very
+                                        large schedule files. [Default: False]
+
+    Raises:
+        FileNotFoundError: If no schedule config file exists
+
+    Returns:
+        ScheduleCalendar: schedule entries for any date
+    """
+    with metrics.span("schedule_load"):
+        if use_cache:
+            plan = cached_schedule_plan(schedule_file, cache_dir, stream)
+        else:
+            plan = load_schedule_plan(schedule_file, stream)
+
+    _playback[schedulefile_path(schedule_file)] = schedule_playback(plan)
+
+    return ScheduleCalendar(plan)
+
+
+class LoadedSchedule(NamedTuple):
+    signature: filewatch.Signature
+    # text of each top level section, None if the file could not be split
+    section_texts: Optional[Dict[str, bytes]]
+    contents: Dict[str, Any]
+    calendar: "ScheduleCalendar"
+
+
+class ScheduleReloader:
+    """Loads schedule calendars, only parsing, validating and recompiling the sections
+    of a schedule file changed since it was last loaded (See: changed_sections,
+    ScheduleCalendar.updated)
+
+    Files left untouched (same modification time, size and inode) are not read again,
+    so calling it on every daemon wake is cheap.
+    """
+
+    def __init__(self):
+        self._loaded: Dict[str, LoadedSchedule] = {}
+
+    def _contents(
+        self, filename: str, data: bytes, loaded: Optional[LoadedSchedule]
+    ) -> Tuple[Optional[Dict[str, bytes]], Dict[str, Any]]:
+        # sections of the file and validated contents, only the changed sections are parsed
+        from util import yamlstream
+
+        section_texts = yamlstream.split_sections(data)
+        try:
+            with metrics.span("yaml_load"):
+                if section_texts is None or loaded is None or loaded.section_texts is None:
+                    edited = contents = yamlstream.load(data)
+                else:
+                    contents = {k: v for k, v in loaded.contents.items() if k in section_texts}
+                    edited = {}
+                    for section, text in section_texts.items():
+                        if loaded.section_texts.get(section) != text:
+                            edited.update(yamlstream.load(text) or {})
+                    contents.update(edited)
+        except Exception as e:
+            logger.error("YAML Error: %s", filename, exc_info=e)
+            raise
+
+        # unchanged sections were validated before
+        with metrics.span("validate"):
+            errors = schedulefile_validator().validate(edited)
+        if errors:
+            raise_validation_errors(errors, filename)
+
+        return section_texts, contents
+
+    def __call__(self, schedule_file: Optional[str] = None) -> ScheduleCalendar:
+        """Return the schedule calendar of a schedule file, reloaded if it changed
+
+        Args:
+            schedule_file (str, optional): path/to/schedule file, will use defaults if not specified
+
+        Raises:
+            FileNotFoundError: If no schedule config file exists
+            Validation Errors
+
+        Returns:
+            ScheduleCalendar: schedule entries for any date
+        """
+        filename = schedulefile_path(schedule_file)
+        signature = filewatch.signature(filename)
+
+        loaded = self._loaded.get(filename)
+        if loaded is not None and signature is not None and loaded.signature == signature:
+            return loaded.calendar
+
+        with metrics.span("schedule_load"):
+            with open(filename, "rb") as file:
+                data = file.read()
+            section_texts, contents = self._contents(filename, data, loaded)
+
+            if loaded is None:
+                calendar = ScheduleCalendar(schedule_plan(contents))
+            else:
+                calendar = loaded.calendar
+                changed = changed_sections(loaded.contents, contents)
+                if changed:
+                    ranges = None if "date_range" in changed else calendar.plan.ranges
+                    calendar = calendar.updated(schedule_plan(contents, ranges), changed)
+                    logger.info(
+                        'Schedule "%s" changed, recompiled: %s',
+                        filename,
+                        ", ".join(sorted(changed)),
+                    )
+                else:
+                    logger.debug('Schedule "%s" contents unchanged', filename)
+
+        _playback[filename] = schedule_playback(calendar.plan)
+        self._loaded[filename] = LoadedSchedule(signature, section_texts, contents, calendar)
+
+        return calendar
+
+
+def schedule_errors(data: bytes) -> List[str]:
+    """Return what prevents a schedule file from loading: YAML, validation and section errors
+
+    Args:
+        data (bytes): schedule file contents (YAML)
+
+    Returns:
+        List[str]: errors, with their line numbers when found, empty if the schedule is valid
+    """
+    import yaml
+
+    from util import yamlstream
+    from util.schedulevalidator import locate_errors
+
+    try:
+        contents = yamlstream.load(data)
+    except yaml.YAMLError as ye:
+        return [f"YAML Error: {ye}"]
+
+    errors = schedulefile_validator().validate(contents)
+    if errors:
+        return [str(e) for e in locate_errors(errors, data)]
+
+    try:
+        ScheduleCalendar(schedule_plan(contents))
+    except (KeyError, ValueError) as e:
+        return [f"{type(e).__name__}: {e}"]
+
+    return []
+
+
+class QueryState(NamedTuple):
+    signature: filewatch.Signature
+    # last schedule loaded, kept while edits fail to load
+    calendar: Optional[ScheduleCalendar]
+    error: Optional[str]
+
+
+class ScheduleQueries:
+    """Answers query service requests (See: util/queryservice.py) from schedule calendars,
+    reloaded when their file changes (See: ScheduleReloader)
+
+    A schedule file failing to load keeps answering from its last loaded version,
+    with the error in the answers, and is not read again until it changes.
+    """
+
+    def __init__(
+        self, server_schedules: Dict[str, Optional[str]], schedule_file: Optional[str] = None
+    ):
+        """
+        Args:
+            server_schedules (Dict[str, str]):  server name -> schedule file (None for the default),
+                                                changes are followed (ex: on config reload)
+            schedule_file (str, optional):      schedule file of queries without a server
+                                                [Default: the default schedule file]
+        """
+        self.server_schedules = server_schedules
+        self.schedule_file = schedule_file
+        self._reloader = ScheduleReloader()
+        self._paths: Dict[Optional[str], str] = {}
+        self._states: Dict[str, QueryState] = {}
+        self._lock = threading.Lock()
+
+    def path(self, server: Optional[str]) -> str:
+        """Return the absolute path of the schedule file of a server
+
+        Args:
+            server (str): server name, None for the default schedule file
+
+        Raises:
+            KeyError: Unknown server
+            FileNotFoundError: If no schedule file exists
+
+        Returns:
+            str: path/to/schedule file
+        """
+        if server is None:
+            schedule_file = self.schedule_file
+        elif server in self.server_schedules:
+            schedule_file = self.server_schedules[server] or self.schedule_file
+        else:
+            raise KeyError(f'Unknown server "{server}"')
+
+        # resolved once, files are briefly missing while saved
+        if schedule_file not in self._paths:
+            self._paths[schedule_file] = os.path.abspath(schedulefile_path(schedule_file))
+
+        return self._paths[schedule_file]
+
+    def state(self, server: Optional[str]) -> QueryState:
+        """Return the loaded schedule of a server, reloaded if its file changed
+
+        Args:
+            server (str): server name, None for the default schedule file
+
+        Raises:
+            KeyError: Unknown server
+
+        Returns:
+            QueryState: file signature, schedule calendar and load error
+        """
+        filename = self.path(server)
+        signature = filewatch.signature(filename)
+
+        with self._lock:
+            state = self._states.get(filename)
+            if state is None or state.signature != signature:
+                previous = state.calendar if state is not None else None
+                try:
+                    state = QueryState(signature, self._reloader(filename), None)
+                except Exception as e:
+                    logger.error('Unable to load schedule "%s": %s', filename, e)
+                    state = QueryState(signature, previous, f"{type(e).__name__}: {e}")
+                self._states[filename] = state
+
+        return state
+
+    def calendar(self, server: Optional[str]) -> Tuple[ScheduleCalendar, Dict[str, Any]]:
+        # calendar of a server and the fields common to its answers
+        state = self.state(server)
+        if state.calendar is None:
+            raise RuntimeError(f'Schedule "{self.path(server)}" not loaded: {state.error}')
+
+        answer = {"server": server, "schedule_file": self.path(server)}
+        if state.error:
+            # answering from the last version that loaded
+            answer["error"] = f"Schedule file edits not loaded: {state.error}"
+
+        return state.calendar, answer
+
+    def version(self, server: Optional[str]) -> Any:
+        """Return the current version of the schedule of a server, for answer caching
+
+        Args:
+            server (str): server name, None for the default schedule file
+
+        Returns:
+            Any: schedule file path and signature
+        """
+        return (self.path(server), self.state(server).signature)
+
+    def servers(self) -> Dict[str, str]:
+        """Return the servers and their schedule file
+
+        Returns:
+            Dict[str, str]: server name -> path/to/schedule file
+        """
+        return {name: self.path(name) for name in list(self.server_schedules)}
+
+    def listing(self, server: Optional[str], at: datetime) -> Dict[str, Any]:
+        """Return the listing of a server at a point in time
+
+        Args:
+            server (str):   server name, None for the default schedule file
+            at (datetime):  point in time
+
+        Returns:
+            Dict[str, Any]: listing, its paths and when it next changes
+        """
+        calendar, answer = self.calendar(server)
+        listing = preroll_listing(calendar, at)
+        answer.update(
+            {
+                "at": at.isoformat(),
+                "listing": listing,
+                "paths": [p for p in listing.replace(",", ";").split(";") if p],
+                "next_change": calendar.next_change(at).isoformat(),
+            }
+        )
+
+        return answer
+
+    def timeline(
+        self, server: Optional[str], start: datetime, end: datetime, step: str
+    ) -> Dict[str, Any]:
+        """Return the listing changes of a server between two datetimes (See: simulate_listings)
+
+        Args:
+            server (str):       server name, None for the default schedule file
+            start (datetime):   first datetime
+            end (datetime):     last datetime (inclusive)
+            step (str):         step between listings (ex: 30m, 1h, 1d)
+
+        Raises:
+            ValueError: Invalid step, or end before start
+
+        Returns:
+            Dict[str, Any]: datetimes where the listing changes and the new listing
+        """
+        calendar, answer = self.calendar(server)
+        changes = simulate_listings(calendar, start, end, parse_timedelta(step))
+        answer.update(
+            {
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "step": step,
+                "changes": [{"at": c.at.isoformat(), "listing": c.listing} for c in changes],
+            }
+        )
+
+        return answer
+
+    def validate(self, server: Optional[str]) -> Dict[str, Any]:
+        """Return the validation errors of the schedule file of a server
+
+        Args:
+            server (str): server name, None for the default schedule file
+
+        Returns:
+            Dict[str, Any]: valid or not, and the errors
+        """
+        filename = self.path(server)
+        try:
+            with open(filename, "rb") as file:
+                errors = schedule_errors(file.read())
+        except OSError as e:
+            errors = [f"{type(e).__name__}: {e}"]
+
+        return {"server": server, "schedule_file": filename, "valid": not errors, "errors": errors}
+
+    def validate_document(self, data: bytes) -> Dict[str, Any]:
+        """Return the validation errors of a schedule file document
+
+        Args:
+            data (bytes): schedule file contents (YAML)
+
+        Returns:
+            Dict[str, Any]: valid or not, and the errors
+        """
+        errors = schedule_errors(data)
+
+        return {"valid": not errors, "errors": errors}
+
+
+def preroll_schedule(
+    schedule_file: Optional[str] = None,
+    use_cache: bool = False,
+    cache_dir: Optional[str] = None,
+    stream: bool = False,
+) -> List[ScheduleEntry]:
+    """Return a listing of defined preroll schedules for searching/use
+
+    Args:
+        schedule_file (str):            path/to/schedule_preroll.yaml style config file (YAML Format)
+        use_cache (bool, optional):     reuse the validated schedule of unchanged files from
+                                        the local cache. [Default: False]
+        cache_dir (str, optional):      path/to/cache folder [Default: per-user cache folder]
+        stream (bool, optional):        stream the date_range ranges while loading, for very
+                                        large schedule files. [Default: False]
+
+    Raises:
+        FileNotFoundError: If no schedule config file exists
+
+    Returns:
+        list: list of ScheduleEntries, for the current year and day
+    """
+    return preroll_calendar(schedule_file, use_cache, cache_dir, stream).entries(date.today())
+
+
+def build_listing_string(items: List[str], play_all: bool = False) -> str:
+    """Build the Plex formatted string of preroll paths
+
+    Args:
+        items (list):               List of preroll video paths to place into a string listing
+        play_all (bool, optional):  Play all videos. [Default: False (Random choice)]
+
+    Returns:
+        string: CSV Listing (, or ;) based on play_all param of preroll video paths
+    """
+
+    if len(items) == 0:
+        return ";"
+
+    if play_all:
+        # use , to play all entries
+        listing = ",".join(items)
+    else:
+        # use ; to play random selection
+        listing = ";".join(items)
+
+    return listing
+
+
+def compile_schedule(schedule: List[ScheduleEntry]) -> CompiledSchedule:
+    """Precompile a schedule into an interval index for repeated lookups
+    Build once (See: preroll_schedule) and reuse for many preroll_listing calls
+
+    Args:
+        schedule (List[ScheduleEntry]): List of schedule entries (See: preroll_schedule)
+
+    Returns:
+        CompiledSchedule: schedule entries and their interval index
+    """
+    entries = list(schedule)
+    index = IntervalIndex([(e.startdate, e.enddate) for e in entries])
+
+    logger.debug("Compiled schedule index of %s entries", len(entries))
+
+    return CompiledSchedule(entries=entries, interval_index=index)
+
+
+def compile_columnar(
+    schedule: List[ScheduleEntry], use_numpy: Optional[bool] = None
+) -> columnar.ColumnarSchedule:
+    """Precompile a schedule into compact typed arrays, for very large schedules
+    Uses a fraction of the memory of ScheduleEntry lists, entries are still
+    available as a sequence of ScheduleEntry (See: columnar.ColumnarSchedule)
+
+    Args:
+        schedule (List[ScheduleEntry]): List of schedule entries (See: preroll_schedule)
+        use_numpy (bool, optional):     vectorize lookups with numpy, None to use it when
+                                        installed [Default: None]
+
+    Raises:
+        ValueError: an entry ends before it starts
+
+    Returns:
+        columnar.ColumnarSchedule: schedule columns
+    """
+    return columnar.ColumnarSchedule(
+        schedule, list(schedule_types()), entry_factory=ScheduleEntry, use_numpy=use_numpy
+    )
+
+
+def listing_datetime(for_datetime: Optional[Union[date, datetime]] = None) -> datetime:
+    """Return the datetime a listing is built for
+
+    Args:
+        for_datetime (date/datetime, optional): Date to process pre-roll string for [Default: Now]
+
+    Returns:
+        datetime: datetime to check schedule entries against
+    """
+    if for_datetime:
+        if isinstance(for_datetime, datetime):  # type: ignore
+            return for_datetime
+
+        return datetime.combine(for_datetime, datetime.now().time())
+
+    return datetime.now()
 
-    logger.info('Saved Pre-Rolls: Server: "%s" Pre-Rolls: "%s"', plex.friendlyName, preroll_listing)  # type: ignore
 
+def active_entries(schedule: ScheduleSource, check_datetime: datetime) -> List[ScheduleEntry]:
+    """Return the schedule entries active at a given datetime, in schedule order
 
-if __name__ == "__main__":
-    args = arguments()
+    Args:
+        schedule (ScheduleSource):  List of schedule entries, a CompiledSchedule,
+                                    a ColumnarSchedule or a ScheduleCalendar
+        check_datetime (datetime):  datetime to check entries against
 
-    plexutil.init_logger(args.log_config_file)
+    Returns:
+        List[ScheduleEntry]: active entries
+    """
+    if isinstance(schedule, ScheduleCalendar):
+        return schedule.active(check_datetime)
+    if isinstance(schedule, CompiledSchedule):
+        return [schedule.entries[i] for i in schedule.interval_index.query(check_datetime)]
+    if isinstance(schedule, columnar.ColumnarSchedule):
+        return [schedule.entry(i) for i in schedule.query(check_datetime)]
+
+    active: List[ScheduleEntry] = []
+    for entry in schedule:
+        entry_start = entry.startdate
+        entry_end = entry.enddate
+        if not isinstance(entry_start, datetime):  # type: ignore
+            entry_start = datetime.combine(entry_start, datetime.min.time())
+        if not isinstance(entry_end, datetime):  # type: ignore
+            entry_end = datetime.combine(entry_end, datetime.max.time())
+
+        logger.debug('checking "%s" against: "%s" - "%s"', check_datetime, entry_start, entry_end)
+
+        if entry_start <= check_datetime <= entry_end:
+            active.append(entry)
+
+    return active
+
+
+def merge_entries(
+    active: List[ScheduleEntry],
+    layers: Optional[Sequence[resolver.Layer]] = None,
+    at: Optional[datetime] = None,
+    expand: Optional[Callable[[str], List[str]]] = None,
+) -> str:
+    """Merge active schedule entries into a Plex listing, based on order of Priority
+    By default misc entries are always added, date_range entries override weekly,
+    weekly override monthly and monthly override default entries. Within a section the
+    narrowest entry wins, forced entries are always kept (See: resolver.resolve)
+    Sections with "max_paths" contribute the rotation window of their paths for the
+    day/week/month of at (See: resolver.layer_paths)
+
+    Args:
+        active (List[ScheduleEntry]):               active entries, in any order
+                                                    (See: active_entries)
+        layers (Sequence[resolver.Layer], optional): section precedence
+                                                    [Default: resolver.DEFAULT_LAYERS]
+        at (datetime, optional):                    datetime of the listing, selects the
+                                                    rotation period [Default: now]
+        expand (Callable, optional):                path -> files, expands the folders of
+                                                    rotated sections
+                                                    [Default: a new dirindex.DirIndex]
+
+    Returns:
+        string: listing of preroll video paths to be used for Extras. CSV style: (;|,)
+    """
+    resolved = resolver.resolve((e for e in active if e.path), layers)
+    if any(layer.max_paths for layer in layers or ()):
+        if expand is None:
+            expand = dirindex.DirIndex().expand
+        merged_list = resolver.layer_paths(resolved, layers, at or datetime.now(), expand)
+    else:
+        merged_list = [e.path for e in resolved]
+
+    return build_listing_string(merged_list)
+
+
+def preroll_listing(
+    schedule: ScheduleSource,
+    for_datetime: Optional[datetime] = None,
+    layers: Optional[Sequence[resolver.Layer]] = None,
+) -> str:
+    """Return listing of preroll videos to be used by Plex
+
+    Args:
+        schedule (ScheduleSource):          List of schedule entries (See: preroll_schedule),
+                                            a CompiledSchedule (See: compile_schedule),
+                                            a ColumnarSchedule (See: compile_columnar)
+                                            or a ScheduleCalendar (See: preroll_calendar)
+        for_datetime (datetime, optional):  Date to process pre-roll string for [Default: Today]
+                                            Useful for simulating what different dates produce
+        layers (Sequence[Layer], optional): section precedence [Default: the layers of a
+                                            ScheduleCalendar, resolver.DEFAULT_LAYERS otherwise]
+
+    Returns:
+        string: listing of preroll video paths to be used for Extras. CSV style: (;|,)
+    """
+    check_datetime = listing_datetime(for_datetime)
+    if layers is None and isinstance(schedule, ScheduleCalendar):
+        layers = schedule.layers
+
+    with metrics.span("listing"):
+        active = active_entries(schedule, check_datetime)
+        for entry in active:
+            logger.info(
+                'Check PASS: Using "%s" - "%s" - "%s"', entry.startdate, entry.enddate, entry.path
+            )
+        listing = merge_entries(active, layers, check_datetime)
+    metrics.count("entries_matched", len(active))
+
+    return listing
+
+
+def next_change(
+    schedule: Union[CompiledSchedule, columnar.ColumnarSchedule, ScheduleCalendar], after: datetime
+) -> Optional[datetime]:
+    """Return the next instant after a datetime at which the active entries change
+
+    Args:
+        schedule (CompiledSchedule/ColumnarSchedule/ScheduleCalendar):  compiled schedule
+                    (See: compile_schedule, compile_columnar) or schedule calendar
+        after (datetime): datetime to search from
+
+    Returns:
+        datetime: next change, None if no further changes are scheduled
+    """
+    if isinstance(schedule, ScheduleCalendar):
+        return schedule.next_change(after)
+
+    index = schedule if isinstance(schedule, columnar.ColumnarSchedule) else schedule.interval_index
+    candidates: List[datetime] = []
+
+    next_start = index.next_start(after)
+    if next_start is not None:
+        candidates.append(next_start)
+
+    # entries are inclusive of their end, the change happens just after
+    next_end = index.next_end(after)
+    if next_end is not None:
+        candidates.append(next_end + timedelta(microseconds=1))
+
+    return min(candidates) if candidates else None
+
+
+def run_daemon(
+    schedule_files: Sequence[Optional[str]],
+    push: Callable[[Optional[str], str], None],
+    retry_seconds: float = 60,
+    max_sleep_seconds: float = 300,
+    load_schedule: Callable[[Optional[str]], ScheduleSource] = preroll_schedule,
+    watcher: Optional[filewatch.FileWatcher] = None,
+    reload_config: Optional[Callable[[], Sequence[Optional[str]]]] = None,
+) -> None:
+    """Keep running, pushing listings each time they change
+    Sleeps until the next schedule change (or midnight, when recurring entries
+    are recalculated), instead of polling on a fixed interval
+
+    With a watcher, schedule files are only reloaded when they change, and
+    the daemon wakes up as soon as a watched file changes. Changes of other
+    watched files (ex: config.ini) call reload_config, then push all listings.
+
+    Args:
+        schedule_files (Sequence[str]):     path/to/schedule_preroll.yaml style files to follow
+                                            (None for the default schedule file)
+        push (Callable[[str, str], None]):  called with schedule file and new listing on change
+        retry_seconds (float, optional):    wait before retrying a failed push. [Default: 60]
+        max_sleep_seconds (float, optional): longest single sleep, so wall clock changes
+                                            (DST, suspend) are noticed. [Default: 300]
+        load_schedule (Callable, optional): loads the schedule entries (or ScheduleCalendar)
+                                            of a schedule file [Default: preroll_schedule]
+        watcher (FileWatcher, optional):    watches the schedule files (added to it) and any
+                                            other files to follow [Default: None]
+        reload_config (Callable, optional): called when watched files other than schedule
+                                            files change, returns the schedule files to follow
+                                            [Default: None]
+    """
+    schedules: Dict[Optional[str], Union[CompiledSchedule, ScheduleCalendar]] = {}
+    pushed_listings: Dict[Optional[str], str] = {}
+    changed: Set[str] = set()
+    # schedule file -> absolute path, resolved once (files are briefly missing while saved)
+    watched = {f: os.path.abspath(schedulefile_path(f)) for f in schedule_files}
+
+    logger.info("Starting daemon with schedule files: %s", list(schedule_files))
+
+    while True:
+        if changed - set(watched.values()) and reload_config is not None:
+            try:
+                new_files = list(reload_config())
+                watched = {f: os.path.abspath(schedulefile_path(f)) for f in new_files}
+                schedule_files = new_files
+                # servers may have been added, let the push decide what is unchanged
+                pushed_listings.clear()
+                logger.info("Config reloaded, schedule files: %s", schedule_files)
+            except Exception as e:
+                logger.error("Unable to reload config, keeping previous", exc_info=e)
+        if watcher is not None:
+            watcher.watch(watched.values())
+
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        wake = midnight
+
+        for schedule_file in schedule_files:
+            # reload every wake, recurring (xx) entries are calculated for the current day,
+            # only on changes when watching files
+            reload = (
+                watcher is None
+                or schedule_file not in schedules
+                or watched[schedule_file] in changed
+            )
+            try:
+                if reload:
+                    loaded = load_schedule(schedule_file)
+                    if not isinstance(loaded, ScheduleCalendar):
+                        loaded = compile_schedule(loaded)  # type: ignore
+                    schedules[schedule_file] = loaded
+            except Exception as e:
+                if schedule_file not in schedules:
+                    raise
+                logger.error(
+                    'Unable to reload schedule "%s", keeping previous', schedule_file, exc_info=e
+                )
+
+            schedule = schedules[schedule_file]
+            listing = preroll_listing(schedule, now)
+            schedule_wake = next_change(schedule, now)
+
+            if listing != pushed_listings.get(schedule_file):
+                try:
+                    push(schedule_file, listing)
+                    pushed_listings[schedule_file] = listing
+                except Exception as e:
+                    logger.error(
+                        "Unable to push listing, retrying in %ss", retry_seconds, exc_info=e
+                    )
+                    schedule_wake = now + timedelta(seconds=retry_seconds)
+            else:
+                logger.debug('Listing unchanged: "%s"', listing)
+
+            if schedule_wake is not None and schedule_wake < wake:
+                wake = schedule_wake
+
+        logger.info('Next schedule check at "%s"', wake)
+
+        changed = set()
+        remaining = (wake - datetime.now()).total_seconds()
+        while remaining > 0:
+            if watcher is None:
+                time.sleep(min(remaining, max_sleep_seconds))
+            else:
+                changed = watcher.wait(min(remaining, max_sleep_seconds))
+                if changed:
+                    logger.info("Files changed: %s", ", ".join(sorted(changed)))
+                    break
+            remaining = (wake - datetime.now()).total_seconds()
+
+
+def simulate_listings(
+    schedule: ScheduleSource,
+    start: datetime,
+    end: datetime,
+    step: timedelta,
+    layers: Optional[Sequence[resolver.Layer]] = None,
+) -> List[ListingChange]:
+    """Return the preroll listings for every step between two datetimes, as a changelog
+    All steps are computed in a single sweep across the sorted schedule boundaries,
+    only the points where the listing changes are returned
+
+    Args:
+        schedule (ScheduleSource):          List of schedule entries, a CompiledSchedule,
+                                            a ColumnarSchedule or a ScheduleCalendar
+        start (datetime):                   first datetime to simulate
+        end (datetime):                     last datetime to simulate (inclusive)
+        step (timedelta):                   time between simulated listings
+        layers (Sequence[Layer], optional): section precedence [Default: the layers of a
+                                            ScheduleCalendar, resolver.DEFAULT_LAYERS otherwise]
+
+    Raises:
+        ValueError: end before start or non positive step
+
+    Returns:
+        List[ListingChange]: datetimes where the listing changes and the new listing
+    """
+    if end < start:
+        msg = f'Simulation end "{end}" is before start "{start}"'
+        logger.error(msg)
+        raise ValueError(msg)
+    if step <= timedelta(0):
+        msg = f'Simulation step must be positive: "{step}"'
+        logger.error(msg)
+        raise ValueError(msg)
+
+    if isinstance(schedule, ScheduleCalendar):
+        return simulate_calendar(schedule, start, end, step, layers)
+
+    def steps() -> Iterator[datetime]:
+        current = start
+        while current <= end:
+            yield current
+            current += step
+
+    if isinstance(schedule, columnar.ColumnarSchedule):
+        # sweep the integer columns, entries are only built where the listing may change
+        entry_at: Callable[[int], ScheduleEntry] = lru_cache(maxsize=None)(schedule.entry)
+        intervals = schedule.intervals()
+        points: Iterator[Any] = (columnar.to_micros(at) for at in steps())
+    else:
+        entries = schedule.entries if isinstance(schedule, CompiledSchedule) else list(schedule)
+        entry_at = entries.__getitem__
+        intervals = [(e.startdate, e.enddate) for e in entries]
+        points = steps()
+
+    changes: List[ListingChange] = []
+    listing = None
+    expand = dirindex.DirIndex().expand
+    rotated = any(layer.max_paths for layer in layers or ())
+    rotation = None
+    for at, positions, changed in sweep_active(intervals, points):
+        if not changed and not rotated:
+            continue
+        if isinstance(at, int):
+            at = columnar.from_micros(at)
+        if rotated:
+            # rotated sections change with their period as well
+            new_rotation = resolver.rotation_key(layers, at)
+            if not changed and new_rotation == rotation:
+                continue
+            rotation = new_rotation
+
+        new_listing = merge_entries([entry_at(i) for i in positions], layers, at, expand)
+        if new_listing != listing:
+            listing = new_listing
+            changes.append(ListingChange(at=at, listing=listing))
+
+    logger.debug("Simulated %s - %s every %s: %s changes", start, end, step, len(changes))
+
+    return changes
+
+
+def simulate_calendar(
+    calendar: ScheduleCalendar,
+    start: datetime,
+    end: datetime,
+    step: timedelta,
+    layers: Optional[Sequence[resolver.Layer]] = None,
+) -> List[ListingChange]:
+    """Return the preroll listings for every step between two datetimes, as a changelog
+    Steps jump straight to the next calendar change, any range of years is simulated
+    without expanding steps where nothing changes
+
+    Args:
+        calendar (ScheduleCalendar):    schedule calendar (See: preroll_calendar)
+        start (datetime):               first datetime to simulate
+        end (datetime):                 last datetime to simulate (inclusive)
+        step (timedelta):               time between simulated listings
+        layers (Sequence[Layer], optional): section precedence [Default: calendar layers]
+
+    Returns:
+        List[ListingChange]: datetimes where the listing changes and the new listing
+    """
+    layers = layers or calendar.layers
+    changes: List[ListingChange] = []
+    listing = None
+    expand = dirindex.DirIndex().expand
+    at = start
+    while at <= end:
+        new_listing = merge_entries(calendar.active(at), layers, at, expand)
+        if new_listing != listing:
+            listing = new_listing
+            changes.append(ListingChange(at=at, listing=listing))
+
+        # first step at or after the next change
+        skipped = -((at - calendar.next_change(at)) // step)
+        at += step * max(1, skipped)
+
+    logger.debug("Simulated %s - %s every %s: %s changes", start, end, step, len(changes))
+
+    return changes
+
+
+def compile_timeline(
+    timeline_file: str,
+    schedules: Dict[str, Optional[str]],
+    start: datetime,
+    end: datetime,
+    load_schedule: Callable[[Optional[str]], ScheduleCalendar] = preroll_calendar,
+) -> Dict[str, int]:
+    """Compile the listing changes of schedule files into a timeline file (See: apply_timeline)
+    Each distinct schedule file is simulated once, from change to change
+
+    Args:
+        timeline_file (str):                path/to/timeline file to write
+        schedules (Dict[str, str]):         timeline name -> schedule file (None for the default),
+                                            timelinefile.DEFAULT_TIMELINE for the default timeline
+        start (datetime):                   first instant compiled
+        end (datetime):                     last instant compiled (inclusive)
+        load_schedule (Callable, optional): loads the ScheduleCalendar of a schedule file
+                                            [Default: preroll_calendar]
+
+    Raises:
+        FileNotFoundError: If a schedule file does not exist
+        OSError: Unable to write the timeline file
+
+    Returns:
+        Dict[str, int]: timeline name -> number of listing changes
+    """
+    from util import timelinefile
+
+    compiled: Dict[Optional[str], timelinefile.Timeline] = {}
+    timelines: Dict[str, timelinefile.Timeline] = {}
+    for name, schedule_file in schedules.items():
+        if schedule_file not in compiled:
+            calendar = load_schedule(schedule_file)
+            with metrics.span("compile"):
+                changes = simulate_calendar(calendar, start, end, timedelta(microseconds=1))
+            playback = preroll_playback(schedule_file)
+            compiled[schedule_file] = timelinefile.Timeline(
+                changes=[(c.at, c.listing) for c in changes],
+                play_all=playback.play_all,
+                max_total_seconds=playback.max_total_seconds,
+            )
+        timelines[name] = compiled[schedule_file]
+
+    data = timelinefile.encode_timelines(timelines, start, end)
+    try:
+        cacheutil.atomic_write(timeline_file, data)
+    except OSError as e:
+        logger.error('Error writing timeline file "%s"', timeline_file, exc_info=e)
+        raise
+
+    logger.info(
+        'Compiled %s timelines (%s - %s) into "%s", %s bytes',
+        len(timelines),
+        start,
+        end,
+        timeline_file,
+        len(data),
+    )
+
+    return {name: len(timeline.changes) for name, timeline in timelines.items()}
+
+
+def apply_timeline(
+    timeline_file: str, names: Sequence[str], at: Optional[datetime] = None
+) -> Dict[str, Tuple[str, PlaybackOptions]]:
+    """Return the listings of a compiled timeline file at an instant (See: compile_timeline)
+    Nothing is loaded but the timeline file, no schedule file, YAML or resolution
+
+    Args:
+        timeline_file (str):        path/to/timeline file
+        names (Sequence[str]):      server names, the default timeline is used for servers
+                                    without their own
+        at (datetime, optional):    instant [Default: now]
+
+    Raises:
+        OSError: Unable to read the timeline file
+        ValueError: Not a timeline file, corrupted, or not covering the instant
+        KeyError: No timeline for a server and no default timeline
+
+    Returns:
+        Dict[str, Tuple[str, PlaybackOptions]]: server name -> listing and playback options
+    """
+    from util import timelinefile
+
+    at = at or datetime.now()
+    listings: Dict[str, Tuple[str, PlaybackOptions]] = {}
+    with metrics.span("timeline"), timelinefile.TimelineFile(timeline_file) as timeline:
+        for name in names:
+            found = timeline.listing(name, at)
+            logger.debug(
+                'Timeline "%s": "%s" since %s until %s',
+                name,
+                found.listing,
+                found.since,
+                found.until,
+            )
+            listings[name] = (
+                found.listing,
+                PlaybackOptions(found.play_all, found.max_total_seconds),
+            )
+
+    return listings
+
+
+def expand_listing(listing: str, cache: Optional[cacheutil.JsonCache] = None) -> str:
+    """Return a listing with folder and glob pattern paths expanded into their files
+    ex: /prerolls/halloween/ or /prerolls/halloween/*.mp4 (See: dirindex.DirIndex)
+
+    Args:
+        listing (str):                  Plex listing (See: preroll_listing)
+        cache (JsonCache, optional):    persistent folder index, folders are only listed
+                                        again when their mtime changes [Default: None]
+
+    Returns:
+        str: listing of concrete file paths
+    """
+    index = dirindex.DirIndex(cache)
+    with metrics.span("expand_paths"):
+        expanded = index.expand_listing(listing)
+    metrics.count("folders_scanned", index.scanned)
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning("Unable to save folder index cache: %s", e)
+
+    if expanded != listing:
+        logger.debug('Expanded listing "%s" to "%s"', listing, expanded)
+
+    return expanded
+
+
+def apply_playback(
+    listing: str, options: PlaybackOptions, cache: Optional[cacheutil.JsonCache] = None
+) -> str:
+    """Apply the playback options to a listing
+    * play_all: play every file, in listing order ("," separated)
+    * max_total_seconds: keep the largest set of files playing within the budget,
+      for each "," group Plex plays in full (the whole listing with play_all).
+      Durations are read from the file headers (See: mediaprobe.MediaProbe)
+
+    Args:
+        listing (str):                  Plex listing (See: preroll_listing)
+        options (PlaybackOptions):      playback options (See: preroll_playback)
+        cache (JsonCache, optional):    media durations cache [Default: None]
+
+    Returns:
+        str: listing to save
+    """
+    if not options.play_all and options.max_total_seconds is None:
+        return listing
+
+    if options.play_all:
+        chains = [fileverify.listing_paths(listing)]
+    else:
+        chains = [[p.strip() for p in g.split(",") if p.strip()] for g in listing.split(";")]
+        chains = [c for c in chains if c]
+
+    if options.max_total_seconds is not None:
+        probe = mediaprobe.MediaProbe(cache)
+        with metrics.span("probe_durations"):
+            durations = probe.durations(p for c in chains for p in c)
+        metrics.count("files_probed", probe.probed)
+
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError as e:
+                logger.warning("Unable to save media durations cache: %s", e)
+
+        fitted = [mediaprobe.fit_budget(c, durations, options.max_total_seconds) for c in chains]
+        for chain, kept in zip(chains, fitted):
+            for path in chain:
+                if path not in kept:
+                    logger.info(
+                        'Pre-Roll "%s" (%ss) dropped, over the %ss budget',
+                        path,
+                        durations.get(path),
+                        options.max_total_seconds,
+                    )
+        chains = [c for c in fitted if c]
+        if not chains:
+            logger.warning("No Pre-Rolls fit the %ss budget", options.max_total_seconds)
+
+    if options.play_all:
+        return build_listing_string(chains[0] if chains else [], play_all=True)
+
+    return ";".join(",".join(c) for c in chains) if chains else ";"
+
+
+def verify_listing(
+    listing: str,
+    policy: str = "warn",
+    cache: Optional[cacheutil.JsonCache] = None,
+    max_workers: int = 16,
+) -> str:
+    """Check the files of a listing exist and are readable, applying the missing files policy
+    Only meaningful when the files are reachable at the same paths as from the Plex server
+
+    Args:
+        listing (str):                  Plex listing (See: preroll_listing)
+        policy (str, optional):         ignore, warn, drop (from the listing) or abort [Default: warn]
+        cache (JsonCache, optional):    file status cache (See: fileverify.verify_files)
+        max_workers (int, optional):    max concurrent file checks [Default: 16]
+
+    Raises:
+        FileNotFoundError: missing files with the abort policy
+        ValueError: unknown policy
+
+    Returns:
+        str: listing to save
+    """
+    if policy not in fileverify.POLICIES:
+        msg = f'Unknown missing files policy "{policy}", expected one of {fileverify.POLICIES}'
+        logger.error(msg)
+        raise ValueError(msg)
+
+    if policy == "ignore":
+        return listing
+
+    paths = fileverify.listing_paths(listing)
+    with metrics.span("verify_files"):
+        status = fileverify.verify_files(paths, max_workers=max_workers, cache=cache)
+
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            logger.warning("Unable to save file status cache: %s", e)
+
+    missing = [s for s in status.values() if not s.ok]
+    metrics.count("files_checked", len(paths))
+    metrics.count("files_stat", len([s for s in status.values() if not s.cached]))
+    metrics.count("files_missing", len(missing))
+
+    for s in missing:
+        logger.warning('Pre-Roll file "%s": %s', s.path, s.error)
+
+    if not missing:
+        return listing
+
+    if policy == "abort":
+        msg = f"{len(missing)} of {len(paths)} Pre-Roll files missing or unreadable"
+        logger.error(msg)
+        raise FileNotFoundError(msg)
+
+    if policy == "drop":
+        listing = fileverify.drop_paths(listing, [s.path for s in missing])
+        logger.warning('Dropped %s missing Pre-Roll files, listing: "%s"', len(missing), listing)
+
+    return listing
+
+
+def save_preroll_listing(
+    plex: "PlexServer", preroll_listing: Union[str, List[str]], force: bool = True
+) -> bool:
+    """Save Plex Preroll info to PlexServer settings
+
+    Args:
+        plex (PlexServer): Plex server to update
+        preroll_listing (str, list[str]): csv listing or List of preroll paths to save
+        force (bool, optional): save even if the server already has the listing. [Default: True]
+
+    Returns:
+        bool: True if saved, False if skipped as the server already had the listing
+    """
+    # if happend to send in an Iterable List, merge to a string
+    if isinstance(preroll_listing, list):
+        preroll_listing = build_listing_string(list(preroll_listing))
+
+    setting = plex.settings.get("cinemaTrailersPrerollID")  # type: ignore
+    if not force and setting.value == preroll_listing:  # type: ignore
+        logger.info('Pre-Rolls unchanged: Server: "%s" skipping save', plex.friendlyName)  # type: ignore
+        return False
+
+    logger.debug('Attempting save of pre-rolls: "%s"', preroll_listing)
+
+    setting.set(preroll_listing)  # type: ignore
+    try:
+        plex.settings.save()  # type: ignore
+    except Exception as e:
+        logger.warning('Unable to save Pre-Rolls to Server: "%s": %s', plex.friendlyName, e)  # type: ignore
+        raise e
+
+    logger.info('Saved Pre-Rolls: Server: "%s" Pre-Rolls: "%s"', plex.friendlyName, preroll_listing)  # type: ignore
+
+    return True
+
+
+def push_state_key(server: plexutil.PlexServerConfig) -> str:
+    """Return the key identifying a server in the pushed state cache
+
+    Args:
+        server (PlexServerConfig): Plex server
+
+    Returns:
+        str: cache key
+    """
+    return f"{server.name}|{server.url}"
+
+
+def plex_session(
+    timeouts: pushretry.Timeouts = pushretry.Timeouts(), pool_connections: int = 64
+) -> "requests.Session":
+    """Return a requests Session setup for Plex server connections
+    Connections are kept alive and pooled per server, requests time out (See: pushretry)
 
-    cfg = plexutil.plex_config(args.config_file)
+    Args:
+        timeouts (Timeouts, optional):      connect/read timeouts [Default: 5s, 30s]
+        pool_connections (int, optional):   servers whose connections are kept [Default: 64]
+
+    Returns:
+        requests.Session: Session object
+    """
+    import requests
+    import urllib3
 
     # Initialize Session information
     sess = requests.Session()
+    adapter = pushretry.pooled_adapter(timeouts, pool_connections=pool_connections)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
     # Ignore verifying the SSL certificate
     sess.verify = False  # '/path/to/certfile'
     # If verify is set to a path of a directory (not a cert file),
@@ -706,22 +2756,444 @@ if __name__ == "__main__":
     # from OpenSSL.
     if sess.verify is False:
         # Disable the warning that the request is insecure, we know that...
-        # import urllib3
-
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)  # type: ignore
 
+    return sess
+
+
+class PlexConnections:
+    """Lazily opened Plex server connections, reused once opened
+
+    A server is only contacted the first time a push to it actually needs
+    a connection, runs with nothing to save never touch the network.
+    All servers share one pooled session (See: plex_session).
+    """
+
+    def __init__(self, timeouts: pushretry.Timeouts = pushretry.Timeouts()):
+        """
+        Args:
+            timeouts (Timeouts, optional): connect/read timeouts [Default: 5s, 30s]
+        """
+        self.timeouts = timeouts
+        self._session: Optional["requests.Session"] = None
+        self._servers: Dict[str, "PlexServer"] = {}
+        self._lock = threading.Lock()
+        self._server_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, server: plexutil.PlexServerConfig) -> "PlexServer":
+        """Return the connection to a server, connecting on first use
+
+        Args:
+            server (PlexServerConfig): Plex server to connect to
+
+        Raises:
+            Exception: Unable to connect to the server
+
+        Returns:
+            PlexServer: connected Plex server
+        """
+        with self._lock:
+            server_lock = self._server_locks.setdefault(server.name, threading.Lock())
+            if self._session is None:
+                self._session = plex_session(self.timeouts)
+            session = self._session
+
+        with server_lock:
+            plex = self._servers.get(server.name)
+            if plex is None:
+                logger.debug('Connecting to Plex "%s" (%s)', server.name, server.url)
+                from plexapi.server import PlexServer
+
+                try:
+                    with metrics.span("plex_connect", server=server.name):
+                        plex = PlexServer(
+                            server.url, server.token, session=session, timeout=self.timeouts.read
+                        )
+                except Exception as e:
+                    logger.warning('Error connecting to Plex "%s": %s', server.name, e)
+                    raise e
+                self._servers[server.name] = plex
+
+        return plex
+
+    def drop(self, name: str) -> None:
+        """Forget a connection, the next push reconnects
+
+        Args:
+            name (str): Plex server name
+        """
+        self._servers.pop(name, None)
+
+
+def push_listings(
+    pushes: List[Tuple[plexutil.PlexServerConfig, str]],
+    connections: PlexConnections,
+    max_workers: int = 8,
+    state: Optional[cacheutil.JsonCache] = None,
+    force: bool = False,
+    retry: pushretry.RetryPolicy = pushretry.RetryPolicy(),
+    breaker: Optional[pushretry.CircuitBreaker] = None,
+) -> List[PushResult]:
+    """Save preroll listings to many Plex servers concurrently
+    Servers already having the listing are skipped, checked against the locally
+    cached last pushed state first, then against the server's current setting.
+    Failed pushes are retried (See: pushretry.call_with_retry), servers failing push
+    after push are skipped while their circuit is open (See: pushretry.CircuitBreaker)
+
+    Args:
+        pushes (List[Tuple[PlexServerConfig, str]]):    server and the listing to save to it
+        connections (PlexConnections):                  Plex connections, opened when needed
+        max_workers (int, optional):                    Max concurrent saves. [Default: 8]
+        state (JsonCache, optional):                    last pushed state cache. [Default: None]
+        force (bool, optional):                         save even if unchanged. [Default: False]
+        retry (RetryPolicy, optional):                  attempts and backoff of a push
+                                                        [Default: 3 attempts]
+        breaker (CircuitBreaker, optional):             skips failing servers [Default: None]
+
+    Returns:
+        List[PushResult]: result per server, in the order of pushes
+    """
+
+    def push(item: Tuple[plexutil.PlexServerConfig, str]) -> PushResult:
+        server, listing = item
+        started = time.perf_counter()
+        key = push_state_key(server)
+        digest = cacheutil.text_hash(listing)
+
+        if not force and state is not None and state.get(key, {}).get("sha256") == digest:
+            logger.info('Pre-Rolls unchanged since last push: Server: "%s"', server.name)
+            return PushResult(
+                server.name, listing, True, time.perf_counter() - started, skipped=True
+            )
+
+        open_until = breaker.open_until(key) if breaker is not None else None
+        if open_until is not None:
+            msg = f"circuit open, skipped until {datetime.fromtimestamp(open_until):%H:%M:%S}"
+            return PushResult(server.name, listing, False, time.perf_counter() - started, msg)
+
+        def save() -> bool:
+            plex = connections.get(server)
+            with metrics.span("plex_save", server=server.name):
+                return save_preroll_listing(plex, listing, force=force)
+
+        try:
+            # a failed save leaves the connection's settings unknown, reconnect to retry
+            saved, attempts = pushretry.call_with_retry(
+                save, retry, before_retry=lambda e: connections.drop(server.name)
+            )
+        except pushretry.RetryError as e:
+            # unknown server state now, reconnect and check again on the next push
+            connections.drop(server.name)
+            if state is not None:
+                state.pop(key)
+            if breaker is not None:
+                breaker.failure(key)
+            return PushResult(
+                server.name,
+                listing,
+                False,
+                time.perf_counter() - started,
+                str(e),
+                attempt_seconds=tuple(a.seconds for a in e.attempts),
+            )
+
+        if breaker is not None:
+            breaker.success(key)
+        if state is not None:
+            state.set(key, {"sha256": digest, "pushed_at": datetime.now().isoformat()})
+        return PushResult(
+            server.name,
+            listing,
+            True,
+            time.perf_counter() - started,
+            skipped=not saved,
+            attempt_seconds=tuple(a.seconds for a in attempts),
+        )
+
+    if not pushes:
+        return []
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pushes)))) as executor:
+        results = list(executor.map(push, pushes))
+
+    for r in results:
+        metrics.METRICS.add_span("push", r.seconds, server=r.server)
+        # every attempt but the last of a successful push failed
+        for i, seconds in enumerate(r.attempt_seconds):
+            ok = r.success and i == len(r.attempt_seconds) - 1
+            metrics.METRICS.add_span(
+                "push_attempt", seconds, server=r.server, result="ok" if ok else "failed"
+            )
+        if len(r.attempt_seconds) > 1:
+            metrics.count("push_retries", len(r.attempt_seconds) - 1, server=r.server)
+        if not r.success and not r.attempt_seconds:
+            result = "circuit_open"
+        else:
+            result = "failed" if not r.success else "skipped" if r.skipped else "saved"
+        metrics.count("pushes", server=r.server, result=result)
+        if result == "saved":
+            metrics.count("bytes_pushed", len(r.listing.encode("utf8")), server=r.server)
+
+    if state is not None:
+        try:
+            state.save()
+        except OSError as e:
+            logger.warning("Unable to save pushed state cache: %s", e)
+
+    return results
+
+
+def write_metrics(metrics_file: str) -> None:
+    """Write the metrics collected so far to a file (See: util.metrics)
+
+    Args:
+        metrics_file (str): path/to/metrics file, .prom for Prometheus textfile format, else JSON
+    """
+    run_seconds = time.time() - metrics.METRICS.started
     try:
-        plex = PlexServer(cfg["PLEX_URL"], cfg["PLEX_TOKEN"], session=sess)
-    except Exception as e:
-        logger.error("Error connecting to Plex", exc_info=e)
-        raise e
+        cacheutil.atomic_write(metrics_file, metrics.METRICS.dumps(metrics_file, run_seconds))
+    except OSError as e:
+        logger.warning('Unable to write metrics file "%s": %s', metrics_file, e)
+
+
+def report_metrics(profile: bool = False, metrics_file: Optional[str] = None) -> None:
+    """Print the per phase breakdown and/or write the metrics file
+
+    Args:
+        profile (bool, optional):       print the per phase breakdown [Default: False]
+        metrics_file (str, optional):   path/to/metrics file (See: write_metrics) [Default: None]
+    """
+    if profile:
+        print(metrics.METRICS.profile(time.time() - metrics.METRICS.started))
+    if metrics_file:
+        write_metrics(metrics_file)
+
+
+def log_push_results(results: List[PushResult]) -> None:
+    """Log a per server summary of push results
+
+    Args:
+        results (List[PushResult]): results to summarize (See: push_listings)
+    """
+    for r in results:
+        if r.success and r.skipped:
+            logger.info('Server "%s": unchanged, skipped in %.2fs', r.server, r.seconds)
+        elif r.success:
+            logger.info(
+                'Server "%s": saved in %.2fs (%s attempts)',
+                r.server,
+                r.seconds,
+                len(r.attempt_seconds),
+            )
+        elif not r.attempt_seconds:
+            logger.error('Server "%s": FAILED, not contacted: %s', r.server, r.error)
+        else:
+            logger.error(
+                'Server "%s": FAILED in %.2fs after %s attempts: %s',
+                r.server,
+                r.seconds,
+                len(r.attempt_seconds),
+                r.error,
+            )
+
+    failed = len([r for r in results if not r.success])
+    skipped = len([r for r in results if r.skipped])
+    logger.info(
+        "Pushed Pre-Rolls to %s of %s servers (%s unchanged)",
+        len(results) - failed,
+        len(results),
+        skipped,
+    )
+
+
+if __name__ == "__main__":
+    args = arguments()
+
+    plexutil.init_logger(args.log_config_file)
+
+    if args.do_profile or args.metrics_file:
+        atexit.register(report_metrics, args.do_profile, args.metrics_file)
+
+    load_schedule = partial(
+        preroll_calendar, use_cache=args.use_cache, cache_dir=args.cache_dir, stream=args.do_stream
+    )
+
+    if args.simulate:
+        schedule = load_schedule(args.schedule_file)
+        sim_start = make_datetime(args.simulate[0], lowtime=True)
+        sim_end = make_datetime(args.simulate[1], lowtime=False)
+        sim_step = parse_timedelta(args.simulate_step)
 
-    schedule = preroll_schedule(args.schedule_file)
-    prerolls = preroll_listing(schedule)
+        print(f"Simulated Plex Pre-Rolls: {sim_start} - {sim_end} every {sim_step}")
+        for change in simulate_listings(schedule, sim_start, sim_end, sim_step):
+            print(f"{change.at:%Y-%m-%d %H:%M:%S} | {change.listing}")
+        sys.exit(0)
+
+    try:
+        with metrics.span("config"):
+            servers = plexutil.plex_servers(args.config_file)
+    except (FileNotFoundError, KeyError) as e:
+        offline = args.compile_file or (args.serve and not (args.do_daemon or args.do_watch))
+        if not (args.do_test_run or offline):
+            raise
+        # test runs, compiles and queries dont need to know how to reach Plex
+        logger.warning("No Plex config found, using the schedule file only: %s", e)
+        servers = [plexutil.PlexServerConfig(name="default", url="", token="")]
+
+    # compute listings once per distinct schedule file, before contacting any server
+    server_schedules = {s.name: s.schedule_file or args.schedule_file for s in servers}
+    schedule_files = list(dict.fromkeys(server_schedules.values()))
+
+    if args.compile_file:
+        from util import timelinefile
+
+        compile_start = datetime.combine(date.today(), datetime.min.time())
+        compile_end = compile_start + timedelta(days=args.compile_days) - timedelta(microseconds=1)
+        timeline_schedules: Dict[str, Optional[str]] = {
+            timelinefile.DEFAULT_TIMELINE: args.schedule_file
+        }
+        timeline_schedules.update({s.name: s.schedule_file for s in servers if s.schedule_file})
+        compiled = compile_timeline(
+            args.compile_file, timeline_schedules, compile_start, compile_end, load_schedule
+        )
+        for name, count in compiled.items():
+            print(f"Timeline {name or '(default)'}: {count} listing changes")
+        sys.exit(0)
+
+    if args.serve:
+        from util import queryservice
+
+        host, port = queryservice.parse_address(args.serve)
+        service = queryservice.QueryService(
+            ScheduleQueries(server_schedules, args.schedule_file), host, port
+        )
+        if not (args.do_daemon or args.do_watch):
+            logger.info("Query service listening on %s", service.url)
+            try:
+                service.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Query service stopped")
+            sys.exit(0)
+        # alongside the daemon, following its config reloads
+        service.start()
+
+    connections = PlexConnections(args.timeout)
+    dir_index = cacheutil.JsonCache(
+        os.path.join(cacheutil.cache_dir(args.cache_dir), "dir_index.json")
+    )
+    file_state = None
+    if args.missing_files != "ignore":
+        file_state = cacheutil.JsonCache(
+            os.path.join(cacheutil.cache_dir(args.cache_dir), "file_state.json")
+        )
+    media_durations = cacheutil.JsonCache(
+        os.path.join(cacheutil.cache_dir(args.cache_dir), "media_durations.json")
+    )
+    push_state = cacheutil.JsonCache(
+        os.path.join(cacheutil.cache_dir(args.cache_dir), "push_state.json")
+    )
+    retry = pushretry.RetryPolicy(attempts=max(0, args.retries) + 1)
+    breaker = pushretry.CircuitBreaker(push_state, cooldown=args.breaker_cooldown)
+
+    def final_listing(
+        schedule_file: Optional[str], listing: str, playback: Optional[PlaybackOptions] = None
+    ) -> str:
+        # concrete, existing files, with the schedule file (or timeline) playback options applied
+        listing = expand_listing(listing, dir_index)
+        listing = verify_listing(listing, args.missing_files, file_state)
+        if playback is None:
+            playback = preroll_playback(schedule_file)
+        return apply_playback(listing, playback, media_durations)
+
+    if args.do_daemon or args.do_watch:
+
+        def push(schedule_file: Optional[str], listing: str) -> None:
+            targets = [s for s in servers if server_schedules[s.name] == schedule_file]
+            listing = final_listing(schedule_file, listing)
+            if args.do_test_run:
+                names = ", ".join(s.name for s in targets)
+                print(f"Test Run of Plex Pre-Rolls ({names}): **Nothing being saved**\n{listing}\n")
+                return
+
+            results = push_listings(
+                [(s, listing) for s in targets],
+                connections,
+                args.max_workers,
+                state=push_state,
+                force=args.do_force_push,
+                retry=retry,
+                breaker=breaker,
+            )
+            log_push_results(results)
+            if args.metrics_file:
+                write_metrics(args.metrics_file)
+            if not all(r.success for r in results):
+                raise ConnectionError("Unable to save Pre-Rolls to all servers")
+
+        def reload_servers() -> List[Optional[str]]:
+            new_servers = plexutil.plex_servers(args.config_file)
+            for server in servers:
+                if server not in new_servers:
+                    # moved or new token, connect again
+                    connections.drop(server.name)
+            servers[:] = new_servers
+            server_schedules.clear()
+            server_schedules.update(
+                {s.name: s.schedule_file or args.schedule_file for s in servers}
+            )
+            return list(dict.fromkeys(server_schedules.values()))
+
+        watcher = None
+        if args.do_watch:
+            load_schedule = ScheduleReloader()  # type: ignore
+            watcher = filewatch.FileWatcher(
+                [args.config_file or "config.ini", plexutil.plexapi_config_path()]
+            )
+
+        try:
+            run_daemon(
+                schedule_files,
+                push,
+                load_schedule=load_schedule,
+                watcher=watcher,
+                reload_config=reload_servers if watcher is not None else None,
+            )
+        except KeyboardInterrupt:
+            logger.info("Daemon stopped")
+        sys.exit(0)
+
+    if args.apply_file:
+        # precompiled listings, the schedule files are not read
+        timeline_listings = apply_timeline(args.apply_file, [s.name for s in servers])
+        # once per distinct listing, servers usually share their timeline
+        finals = {found: final_listing(None, *found) for found in set(timeline_listings.values())}
+        server_listings = {name: finals[found] for name, found in timeline_listings.items()}
+    else:
+        listings = {f: final_listing(f, preroll_listing(load_schedule(f))) for f in schedule_files}
+        server_listings = {s.name: listings[server_schedules[s.name]] for s in servers}
 
     if args.do_test_run:
-        msg = f"Test Run of Plex Pre-Rolls: **Nothing being saved**\n{prerolls}\n"
-        logger.debug(msg)
-        print(msg)
+        for server in servers:
+            prerolls = server_listings[server.name]
+            msg = (
+                f"Test Run of Plex Pre-Rolls ({server.name}): **Nothing being saved**\n{prerolls}\n"
+            )
+            logger.debug(msg)
+            print(msg)
     else:
-        save_preroll_listing(plex, prerolls)
+        pushes = [(s, server_listings[s.name]) for s in servers]
+        results = push_listings(
+            pushes,
+            connections,
+            args.max_workers,
+            state=push_state,
+            force=args.do_force_push,
+            retry=retry,
+            breaker=breaker,
+        )
+        log_push_results(results)
+
+        if not all(r.success for r in results):
+            sys.exit(1)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# import local modules from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# benchmark helpers (random schedules, previous implementations) are shared with tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
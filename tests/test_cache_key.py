@@ -0,0 +1,30 @@
+"""Cached SchedulePlan keys (See: schedule_preroll.schedule_cache_key)"""
+import pytest
+
+import schedule_preroll as sp
+
+
+@pytest.fixture
+def files(tmp_path):
+    schedule = tmp_path / "schedule.yaml"
+    schedule.write_text("---\ndefault:\n  enabled: true\n  path: /default.mp4\n")
+    schema = tmp_path / "schema.yaml"
+    schema.write_text("---\n")
+    return str(schedule), str(schema)
+
+
+def test_same_files_same_key(files):
+    assert sp.schedule_cache_key(*files) == sp.schedule_cache_key(*files)
+
+
+def test_plan_format_changes_key(files, monkeypatch):
+    key = sp.schedule_cache_key(*files)
+    monkeypatch.setattr(sp, "PLAN_CACHE_FORMAT", sp.PLAN_CACHE_FORMAT + 1)
+    assert sp.schedule_cache_key(*files) != key
+
+
+def test_schedule_changes_key(files):
+    key = sp.schedule_cache_key(*files)
+    with open(files[0], "a") as file:
+        file.write("# edited\n")
+    assert sp.schedule_cache_key(*files) != key
@@ -0,0 +1,41 @@
+"""Atomic file writes (See: util/cacheutil.py)"""
+import os
+import stat
+
+import pytest
+
+from util import cacheutil
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_mode(tmp_path):
+    # ex: a .prom metrics file read by a node_exporter running as another user
+    path = str(tmp_path / "metrics.prom")
+    cacheutil.atomic_write(path, b"data\n")
+    umask = os.umask(0)
+    os.umask(umask)
+    assert file_mode(path) == 0o666 & ~umask
+    with open(path, "rb") as file:
+        assert file.read() == b"data\n"
+
+
+def test_replaced_file_mode(tmp_path):
+    path = str(tmp_path / "timeline.bin")
+    with open(path, "wb") as file:
+        file.write(b"old")
+    os.chmod(path, 0o640)
+    cacheutil.atomic_write(path, b"new")
+    assert file_mode(path) == 0o640
+    with open(path, "rb") as file:
+        assert file.read() == b"new"
+
+
+def test_no_temporary_files_left(tmp_path):
+    cacheutil.atomic_write(str(tmp_path / "a"), b"a")
+    cacheutil.atomic_write(str(tmp_path / "a"), b"b")
+    assert os.listdir(tmp_path) == ["a"]
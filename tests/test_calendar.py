@@ -0,0 +1,93 @@
+"""Schedule calendar lookups across year boundaries and request threads"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import schedule_preroll as sp
+
+SCHEDULE = """---
+default:
+  enabled: true
+  path: /default.mp4
+weekly:
+  enabled: true
+  "1": /w1.mp4
+  "52": /w52.mp4
+"""
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    schedule_file = tmp_path / "preroll_schedules.yaml"
+    schedule_file.write_text(SCHEDULE, encoding="utf8")
+    return sp.preroll_calendar(str(schedule_file), use_cache=False)
+
+
+def expected_listing(at: datetime) -> str:
+    # the week 1/52 whose range holds the datetime, whatever year it is numbered in
+    for year in (at.year - 1, at.year, at.year + 1):
+        for week, path in ((1, "/w1.mp4"), (52, "/w52.mp4")):
+            start, end = sp.week_range(year, week)
+            if start <= at <= end:
+                return path
+    return "/default.mp4"
+
+
+def test_week_52_runs_into_january(calendar):
+    # week 52 of 2026: 2026-12-27 - 2027-01-02
+    assert sp.preroll_listing(calendar, datetime(2027, 1, 1, 12)) == "/w52.mp4"
+    assert sp.preroll_listing(calendar, datetime(2027, 1, 2, 12)) == "/w52.mp4"
+    assert sp.preroll_listing(calendar, datetime(2027, 1, 3, 12)) == "/w1.mp4"
+
+
+@pytest.mark.parametrize("year", range(2020, 2036))
+def test_new_year_listings(calendar, year):
+    day = date(year, 12, 20)
+    while day <= date(year + 1, 1, 12):
+        for hour in (0, 12, 23):
+            at = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+            assert sp.preroll_listing(calendar, at) == expected_listing(at), at
+        day += timedelta(days=1)
+
+
+@pytest.mark.parametrize("year", range(2020, 2036))
+def test_new_year_simulation(calendar, year):
+    start = datetime(year, 12, 20)
+    changes = sp.simulate_listings(calendar, start, datetime(year + 1, 1, 12), timedelta(hours=1))
+    at = start
+    listing = None
+    for change in changes:
+        while at < change.at:
+            assert listing == expected_listing(at), at
+            at += timedelta(hours=1)
+        listing = change.listing
+    assert listing == expected_listing(at)
+
+
+class YieldingDatetime(datetime):
+    # lets other threads run while the cached day is checked, as a busy server would
+    def date(self):
+        time.sleep(0)
+        return super().date()
+
+
+def test_concurrent_day_entries(calendar):
+    # query service threads share one calendar and its cached day entries
+    days = [YieldingDatetime(2026, 6, 1, 12), YieldingDatetime(2026, 6, 2, 12)]
+    wrong = []
+
+    def query(at):
+        for _ in range(500):
+            entries = calendar.day_entries(at)
+            if any(e.startdate.date() != at.date() for _, e in entries):
+                wrong.append(at)
+
+    threads = [threading.Thread(target=query, args=(days[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not wrong
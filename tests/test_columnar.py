@@ -0,0 +1,83 @@
+"""Columnar schedules give the same listings as the interval index (See: util/columnar.py)"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from bench_schedule import make_schedule
+
+import schedule_preroll as sp
+from util import columnar
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+@pytest.fixture(scope="module")
+def schedule(tmp_path_factory):
+    schedule_file = tmp_path_factory.mktemp("columnar") / "preroll_schedules.yaml"
+    schedule_file.write_text(make_schedule(300, 0.3, 2, random.Random(1)), encoding="utf8")
+    return sp.preroll_schedule(str(schedule_file))
+
+
+@pytest.fixture(params=[False, True], ids=["array", "numpy"])
+def columns(request, schedule):
+    if request.param:
+        pytest.importorskip("numpy")
+    return sp.compile_columnar(schedule, use_numpy=request.param)
+
+
+def instants(schedule, count, rng):
+    # entry boundaries, just around them and random instants of the schedule years
+    points = []
+    for entry in schedule:
+        points += [entry.startdate, entry.enddate, entry.enddate + MICROSECOND]
+        points.append(entry.startdate - MICROSECOND)
+    first = min(e.startdate for e in schedule)
+    seconds = int((max(e.enddate for e in schedule) - first).total_seconds())
+    points += [first + timedelta(seconds=rng.randint(0, seconds)) for _ in range(count)]
+    return points
+
+
+def test_sequence_view(schedule, columns):
+    assert len(columns) == len(schedule)
+    assert list(columns) == schedule
+    assert columns[-3:] == schedule[-3:]
+
+
+def test_listings_match_interval_index(schedule, columns):
+    compiled = sp.compile_schedule(schedule)
+    for at in instants(schedule, 500, random.Random(2)):
+        assert sp.active_entries(columns, at) == sp.active_entries(compiled, at), at
+        assert sp.preroll_listing(columns, at) == sp.preroll_listing(compiled, at), at
+
+
+def test_next_change_matches_interval_index(schedule, columns):
+    compiled = sp.compile_schedule(schedule)
+    for at in instants(schedule, 200, random.Random(3)):
+        assert sp.next_change(columns, at) == sp.next_change(compiled, at), at
+
+
+def test_simulation_matches_interval_index(schedule, columns):
+    compiled = sp.compile_schedule(schedule)
+    start = min(e.startdate for e in schedule)
+    end = start + timedelta(days=120)
+    step = timedelta(hours=5)
+    assert sp.simulate_listings(columns, start, end, step) == sp.simulate_listings(
+        compiled, start, end, step
+    )
+
+
+def test_micros_round_trip():
+    at = datetime(2026, 12, 31, 23, 59, 59, 999999)
+    assert columnar.from_micros(columnar.to_micros(at)) == at
+
+
+def test_end_before_start():
+    entry = sp.ScheduleEntry(
+        type="date_range",
+        startdate=datetime(2026, 1, 2),
+        enddate=datetime(2026, 1, 1),
+        force=False,
+        path="/a.mp4",
+    )
+    with pytest.raises(ValueError):
+        sp.compile_columnar([entry])
@@ -0,0 +1,181 @@
+"""Push retries with jittered backoff and the per server circuit breaker"""
+import random
+from unittest import mock
+
+import pytest
+import requests
+
+from util import pushretry
+from util.pushretry import CircuitBreaker, RetryError, RetryPolicy, call_with_retry
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MemoryStore(dict):
+    # JsonCache style get/set/pop
+    def set(self, key, value):
+        self[key] = value
+
+    def pop(self, key, default=None):
+        return super().pop(key, default)
+
+
+def failing(errors):
+    # raises each error in turn, then returns "saved"
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "saved"
+
+    return func, calls
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=300, clock=clock)
+    assert breaker.failure("main") is None
+    assert breaker.failure("main") is None
+    assert breaker.open_until("main") is None
+    assert breaker.failure("main") == clock.now + 300
+    assert breaker.open_until("main") == clock.now + 300
+
+    # other servers are not affected
+    assert breaker.open_until("other") is None
+
+
+def test_breaker_half_open_then_closed(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=60, clock=clock)
+    breaker.failure("main")
+    breaker.failure("main")
+
+    clock.now += 59
+    assert breaker.open_until("main") is not None
+    # cool-down over: the next push is tried
+    clock.now += 1
+    assert breaker.open_until("main") is None
+
+    breaker.success("main")
+    assert breaker.open_until("main") is None
+    # the failure count starts over once closed
+    assert breaker.failure("main") is None
+
+
+def test_breaker_half_open_failure_doubles_cooldown(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=60, max_cooldown=200, clock=clock)
+    breaker.failure("main")
+    assert breaker.failure("main") == clock.now + 60
+
+    clock.now += 60
+    assert breaker.failure("main") == clock.now + 120
+    clock.now += 120
+    # up to max_cooldown
+    assert breaker.failure("main") == clock.now + 200
+
+
+def test_breaker_disabled(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=0, clock=clock)
+    assert breaker.failure("main") is None
+    assert breaker.open_until("main") is None
+
+
+def test_breaker_state_in_store(clock):
+    # separate runs (cron) share the state through the pushed state cache
+    store = MemoryStore()
+    CircuitBreaker(store, threshold=1, cooldown=60, clock=clock).failure("main")
+    assert store["breaker|main"]["open_until"] == clock.now + 60
+    assert CircuitBreaker(store, threshold=1, cooldown=60, clock=clock).open_until("main")
+
+    CircuitBreaker(store, clock=clock).success("main")
+    assert "breaker|main" not in store
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.exceptions.ConnectTimeout("connect timed out"),
+        requests.exceptions.ReadTimeout("read timed out"),
+        requests.exceptions.ConnectionError("refused"),
+        TimeoutError("timed out"),
+        Exception("(503) service_unavailable; http://plex:32400/"),
+    ],
+)
+def test_retryable_errors(error):
+    assert pushretry.is_retryable(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [Exception("(401) unauthorized; http://plex:32400/"), ValueError("bad listing")],
+)
+def test_not_retryable_errors(error):
+    assert not pushretry.is_retryable(error)
+
+
+@pytest.mark.parametrize("attempts", [1, 2, 3, 5])
+def test_retry_count_on_timeouts(attempts):
+    timeout = requests.exceptions.ReadTimeout("read timed out")
+    func, calls = failing([timeout] * 10)
+    waits = []
+    with pytest.raises(RetryError) as raised:
+        call_with_retry(func, RetryPolicy(attempts=attempts), sleep=waits.append)
+
+    assert len(calls) == attempts
+    assert len(raised.value.attempts) == attempts
+    assert all(a.error == "read timed out" for a in raised.value.attempts)
+    # a backoff before each retry, none after the last attempt
+    assert len(waits) == attempts - 1
+    assert raised.value.error is timeout
+
+
+def test_retry_succeeds_after_timeouts():
+    timeout = requests.exceptions.ConnectTimeout("connect timed out")
+    func, calls = failing([timeout, timeout])
+    dropped = []
+    result, attempts = call_with_retry(
+        func, RetryPolicy(attempts=3), before_retry=dropped.append, sleep=lambda s: None
+    )
+
+    assert result == "saved"
+    assert len(calls) == 3
+    assert [a.error for a in attempts] == ["connect timed out", "connect timed out", None]
+    assert dropped == [timeout, timeout]
+
+
+def test_no_retry_of_client_errors():
+    func, calls = failing([Exception("(401) unauthorized; http://plex:32400/")])
+    with pytest.raises(RetryError):
+        call_with_retry(func, RetryPolicy(attempts=3), sleep=lambda s: None)
+    assert len(calls) == 1
+
+
+def test_full_jitter_backoff():
+    policy = RetryPolicy(backoff=0.5, max_backoff=3.0)
+    rng = random.Random(1)
+    for retry, ceiling in enumerate([0.5, 1.0, 2.0, 3.0, 3.0]):
+        delays = [policy.delay(retry, rng) for _ in range(200)]
+        assert all(0 <= d <= ceiling for d in delays)
+        # spread over the whole range, not a fixed wait
+        assert max(delays) - min(delays) > ceiling * 0.8
+
+
+def test_adapter_timeouts():
+    adapter = pushretry.pooled_adapter(pushretry.Timeouts(2, 7))
+    request = requests.Request("GET", "http://plex:32400/").prepare()
+    with mock.patch("requests.adapters.HTTPAdapter.send") as send:
+        adapter.send(request, timeout=99, verify=False)
+
+    assert send.call_args.kwargs["timeout"] == (2, 7)
+    assert send.call_args.kwargs["verify"] is False
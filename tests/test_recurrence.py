@@ -0,0 +1,110 @@
+"""Recurrence year bitmaps against the date by date rule (See: util/recurrence.py)"""
+import random
+from calendar import isleap
+from datetime import date, timedelta
+
+import pytest
+
+from util import recurrence
+from util.recurrence import MONTHS, WEEKDAYS, parse_rule, year_mask
+
+# non leap, leap, century non leap, century leap
+YEARS = [2023, 2024, 2100, 2000]
+
+
+def reference_matches(rule, day):
+    # the rule written out for a single day, without bitmaps
+    if rule.weekdays and day.weekday() not in rule.weekdays:
+        return False
+    if rule.months and day.month not in rule.months:
+        return False
+    if rule.nth_weekday is not None:
+        nth, weekday = rule.nth_weekday
+        month_days = [
+            d
+            for d in (day.replace(day=1) + timedelta(days=i) for i in range(31))
+            if d.month == day.month and d.weekday() == weekday
+        ]
+        if abs(nth) > len(month_days) or month_days[nth - 1 if nth > 0 else nth] != day:
+            return False
+    if rule.every_n_days is not None:
+        if day < rule.anchor or (day - rule.anchor).days % rule.every_n_days:
+            return False
+    for year, month, month_day in rule.exceptions:
+        if year in (None, day.year) and (month, month_day) == (day.month, day.day):
+            return False
+    return True
+
+
+def random_rule(rng):
+    rule = {"path": "/rule.mp4"}
+    if rng.random() < 0.5:
+        rule["weekdays"] = rng.sample(WEEKDAYS, rng.randint(1, 3))
+    if rng.random() < 0.5:
+        rule["months"] = rng.sample(MONTHS, rng.randint(1, 4))
+    if rng.random() < 0.4:
+        nth = rng.choice([1, 2, 3, 4, 5, -1, -2, -5])
+        rule["nth_weekday"] = {"nth": nth, "weekday": rng.choice(WEEKDAYS)}
+    if rng.random() < 0.4:
+        rule["every_n_days"] = rng.randint(1, 10)
+        rule["anchor"] = date(rng.choice(YEARS), rng.randint(1, 12), rng.randint(1, 28))
+    if rng.random() < 0.5:
+        rule["except"] = [
+            rng.choice(["xxxx-02-29", "xxxx-12-25", "xxxx-03-01", date(2024, 2, 29), "2023-01-01"])
+            for _ in range(rng.randint(1, 3))
+        ]
+    return parse_rule(rule)
+
+
+def days_of(year):
+    day = date(year, 1, 1)
+    while day.year == year:
+        yield day
+        day += timedelta(days=1)
+
+
+@pytest.mark.parametrize("year", YEARS)
+@pytest.mark.parametrize("seed", range(3))
+def test_masks_match_reference(year, seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        rule = random_rule(rng)
+        mask = year_mask(rule, year)
+        # no bits past the last day of the year
+        assert mask >> (366 if isleap(year) else 365) == 0
+        for day in days_of(year):
+            assert recurrence.matches(rule, day) == reference_matches(rule, day), (rule, day)
+
+
+@pytest.mark.parametrize("year", YEARS)
+def test_leap_day_exception(year):
+    # xxxx-02-29 only removes February 29th, never March 1st of non leap years
+    rule = parse_rule({"path": "/a.mp4", "months": ["feb", "mar"], "except": ["xxxx-02-29"]})
+    assert recurrence.matches(rule, date(year, 3, 1))
+    assert recurrence.matches(rule, date(year, 2, 28))
+    if isleap(year):
+        assert not recurrence.matches(rule, date(year, 2, 29))
+
+
+@pytest.mark.parametrize("year", YEARS)
+def test_last_weekday_of_month(year):
+    rule = parse_rule({"path": "/a.mp4", "nth_weekday": {"nth": -1, "weekday": "fri"}})
+    found = [d for d in days_of(year) if recurrence.matches(rule, d)]
+    assert len(found) == 12
+    assert all(d.weekday() == 4 and (d + timedelta(days=7)).month != d.month for d in found)
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"path": "/a.mp4", "nth_weekday": {"nth": 0, "weekday": "fri"}},
+        {"path": "/a.mp4", "nth_weekday": {"nth": 6, "weekday": "fri"}},
+        {"path": "/a.mp4", "weekdays": ["someday"]},
+        {"path": "/a.mp4", "every_n_days": 0},
+        {"path": "/a.mp4", "anchor": "yesterday"},
+        {"path": "/a.mp4", "except": ["12-25"]},
+    ],
+)
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
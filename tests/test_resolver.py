@@ -0,0 +1,53 @@
+"""Priority layer resolver properties, on random entry sets (See: benchmarks/bench_resolver.py)"""
+
+import random
+
+import pytest
+from bench_resolver import (
+    legacy_merge_entries,
+    listing_paths,
+    make_active,
+    make_ordered_active,
+    property_checks,
+    rotation_covers,
+)
+
+import schedule_preroll as sp
+
+SEEDS = range(5)
+CASES = 200
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_order_independent(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        active = make_active(rng.randint(0, 20), rng)
+        shuffled = rng.sample(active, len(active))
+        assert sp.merge_entries(active) == sp.merge_entries(shuffled), active
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matches_legacy(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        active = make_ordered_active(rng)
+        # forced entries may be listed in another order, the Plex choice is random (;)
+        assert listing_paths(sp.merge_entries(active)) == listing_paths(
+            legacy_merge_entries(active)
+        ), active
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_rotation_coverage(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES // 4):
+        assert rotation_covers(rng)
+
+
+def test_property_checks():
+    assert property_checks(100, random.Random(1)) == {
+        "order_independent": 0,
+        "matches_legacy": 0,
+        "rotation_coverage": 0,
+    }
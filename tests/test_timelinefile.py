@@ -0,0 +1,159 @@
+"""Timeline files: encode_timelines -> TimelineFile.listing round trips"""
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from util import timelinefile
+from util.timelinefile import DEFAULT_TIMELINE, HEADER, Timeline, TimelineFile, encode_timelines
+
+VALID_FROM = datetime(2026, 1, 1)
+VALID_UNTIL = datetime(2026, 12, 31, 23, 59, 59)
+
+DEFAULT = Timeline(
+    changes=[
+        (datetime(2026, 1, 1), "/default.mp4"),
+        (datetime(2026, 3, 1), "/march.mp4;/always.mp4"),
+        (datetime(2026, 4, 1), "/default.mp4"),
+    ]
+)
+MAIN = Timeline(
+    changes=[(datetime(2026, 1, 1), "/main.mp4"), (datetime(2026, 12, 24, 18), "/noël.mp4")],
+    play_all=True,
+    max_total_seconds=90.5,
+)
+
+
+def write(tmp_path, data, name="prerolls.timeline"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def timeline_path(tmp_path):
+    data = encode_timelines({DEFAULT_TIMELINE: DEFAULT, "main": MAIN}, VALID_FROM, VALID_UNTIL)
+    return write(tmp_path, data)
+
+
+def test_round_trip(timeline_path):
+    with TimelineFile(timeline_path) as timeline:
+        assert timeline.names() == [DEFAULT_TIMELINE, "main"]
+        assert (timeline.valid_from, timeline.valid_until) == (VALID_FROM, VALID_UNTIL)
+
+        found = timeline.listing(DEFAULT_TIMELINE, datetime(2026, 3, 15, 12))
+        assert found.listing == "/march.mp4;/always.mp4"
+        assert (found.since, found.until) == (datetime(2026, 3, 1), datetime(2026, 4, 1))
+        assert (found.play_all, found.max_total_seconds) == (False, None)
+
+        # a change applies from its instant on
+        assert timeline.listing(DEFAULT_TIMELINE, datetime(2026, 3, 1)).listing == (
+            "/march.mp4;/always.mp4"
+        )
+        assert timeline.listing(DEFAULT_TIMELINE, datetime(2026, 2, 28, 23, 59)).listing == (
+            "/default.mp4"
+        )
+
+        found = timeline.listing("main", datetime(2026, 12, 25))
+        assert found.listing == "/noël.mp4"
+        assert (found.since, found.until) == (datetime(2026, 12, 24, 18), None)
+        assert (found.play_all, found.max_total_seconds) == (True, 90.5)
+
+
+def test_default_timeline_fallback(timeline_path):
+    with TimelineFile(timeline_path) as timeline:
+        found = timeline.listing("other server", datetime(2026, 3, 15))
+        assert found.listing == "/march.mp4;/always.mp4"
+
+
+@pytest.mark.parametrize("order", [["main", DEFAULT_TIMELINE], [DEFAULT_TIMELINE, "main"]])
+def test_named_timeline_over_default(tmp_path, order):
+    timelines = {"main": MAIN, DEFAULT_TIMELINE: DEFAULT}
+    data = encode_timelines({n: timelines[n] for n in order}, VALID_FROM, VALID_UNTIL)
+    with TimelineFile(write(tmp_path, data)) as timeline:
+        assert timeline.listing("main", datetime(2026, 6, 1)).listing == "/main.mp4"
+
+
+def test_no_timeline(tmp_path):
+    data = encode_timelines({"main": MAIN}, VALID_FROM, VALID_UNTIL)
+    with TimelineFile(write(tmp_path, data)) as timeline:
+        with pytest.raises(KeyError):
+            timeline.listing("other server", datetime(2026, 6, 1))
+
+
+@pytest.mark.parametrize(
+    "at", [VALID_FROM - timedelta(microseconds=1), VALID_UNTIL + timedelta(seconds=1)]
+)
+def test_outside_compiled_range(timeline_path, at):
+    with TimelineFile(timeline_path) as timeline:
+        with pytest.raises(ValueError, match="compile it again"):
+            timeline.listing("main", at)
+
+
+def test_compiled_range_inclusive(timeline_path):
+    with TimelineFile(timeline_path) as timeline:
+        assert timeline.listing("main", VALID_FROM).listing == "/main.mp4"
+        assert timeline.listing("main", VALID_UNTIL).listing == "/noël.mp4"
+
+
+def test_before_first_change(tmp_path):
+    late = Timeline(changes=[(datetime(2026, 2, 1), "/late.mp4")])
+    data = encode_timelines({DEFAULT_TIMELINE: late}, VALID_FROM, VALID_UNTIL)
+    with TimelineFile(write(tmp_path, data)) as timeline:
+        with pytest.raises(ValueError, match="no listing"):
+            timeline.listing(DEFAULT_TIMELINE, datetime(2026, 1, 15))
+
+
+def test_checksum_mismatch(timeline_path, tmp_path):
+    data = bytearray(Path(timeline_path).read_bytes())
+    data[-1] ^= 0xFF
+    path = write(tmp_path, bytes(data), "corrupted.timeline")
+    with pytest.raises(ValueError, match="checksum"):
+        TimelineFile(path)
+    # unverified opens only check the header
+    TimelineFile(path, verify=False).close()
+
+
+@pytest.mark.parametrize("cut", [1, 100])
+def test_truncated(timeline_path, tmp_path, cut):
+    data = Path(timeline_path).read_bytes()[:-cut]
+    with pytest.raises(ValueError, match="truncated"):
+        TimelineFile(write(tmp_path, data, "truncated.timeline"))
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (b"", "too short"),
+        (b"PRETMLN\0", "too short"),
+        (b"NOTATMLN" + bytes(HEADER.size), "not a timeline file"),
+    ],
+)
+def test_not_a_timeline_file(tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        TimelineFile(write(tmp_path, data))
+
+
+def test_unsupported_version(timeline_path, tmp_path):
+    data = bytearray(Path(timeline_path).read_bytes())
+    struct.pack_into("<H", data, 8, timelinefile.FORMAT_VERSION + 1)
+    with pytest.raises(ValueError, match="version"):
+        TimelineFile(write(tmp_path, bytes(data), "newer.timeline"))
+
+
+def test_shared_records(tmp_path):
+    names = ["a", "b", "c"]
+    shared = encode_timelines({n: DEFAULT for n in names}, VALID_FROM, VALID_UNTIL)
+    copies = encode_timelines(
+        {n: Timeline(list(DEFAULT.changes)) for n in names}, VALID_FROM, VALID_UNTIL
+    )
+    # records stored once for names sharing a Timeline, listings are always stored once
+    record_size = timelinefile.RECORD.size * len(DEFAULT.changes)
+    assert len(copies) - len(shared) == record_size * (len(names) - 1)
+
+    with TimelineFile(write(tmp_path, shared)) as timeline:
+        assert timeline.names() == names
+        for name in names:
+            for at, listing in DEFAULT.changes:
+                assert timeline.listing(name, at + timedelta(hours=1)).listing == listing
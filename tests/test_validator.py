@@ -0,0 +1,126 @@
+"""Compiled schedule validator vs Cerberus (See: benchmarks/bench_validator.py)"""
+import json
+import random
+from datetime import date, datetime
+
+import pytest
+import yaml
+from bench_validator import differential_check, make_document, schema_filename
+from cerberus import Validator  # type: ignore
+
+from util.schedulevalidator import ScheduleValidator, locate_errors
+
+SEEDS = range(3)
+CASES = 300
+
+# document, compiled error paths (empty when valid)
+EDGE_CASES = [
+    ({}, []),
+    ({"default": {"enabled": True, "path": None}}, []),
+    ({"default": {"enabled": True}}, [("default", "path")]),
+    ({"default": {"enabled": "yes", "path": "/a.mp4"}}, [("default", "enabled")]),
+    ({"default": {"enabled": None, "path": "/a.mp4"}}, [("default", "enabled")]),
+    ({"default": {"enabled": True, "path": "/a.mp4", "mode": "other"}}, [("default", "mode")]),
+    ({"misc": {"enabled": True, "always_use": "/a.mp4", "max_paths": 0}}, [("misc", "max_paths")]),
+    ({"misc": {"enabled": True, "always_use": "/a.mp4", "max_paths": 1}}, []),
+    # week numbers left unquoted in the schedule file load as integers
+    ({"weekly": {"enabled": True, 3: "/a.mp4"}}, [("weekly", 3)]),
+    ({"weekly": {"enabled": True, "3": "/a.mp4"}}, []),
+    ({"extra": {"enabled": True}}, [("extra",)]),
+    ({"default": "/a.mp4"}, [("default",)]),
+    (
+        {"date_range": {"enabled": True, "ranges": [{"start_date": datetime(2024, 1, 1)}]}},
+        [("date_range", "ranges", 0, "end_date"), ("date_range", "ranges", 0, "path")],
+    ),
+    (
+        {
+            "date_range": {
+                "enabled": True,
+                "ranges": [
+                    {"start_date": date(2024, 1, 1), "end_date": "xxxx-01-02", "path": "/a.mp4"},
+                    "text",
+                ],
+            }
+        },
+        [("date_range", "ranges", 1)],
+    ),
+    (
+        {
+            "date_range": {
+                "enabled": True,
+                "rules": [
+                    {"path": "/a.mp4", "weekdays": ["mon", "xyz"]},
+                    {"path": "/b.mp4", "nth_weekday": {"nth": 0, "weekday": "fri"}},
+                    {"path": "/c.mp4", "every_n_days": 0, "except": [date(2024, 1, 1), 1]},
+                ],
+            }
+        },
+        [
+            ("date_range", "rules", 0, "weekdays"),
+            ("date_range", "rules", 1, "nth_weekday", "nth"),
+            ("date_range", "rules", 2, "every_n_days"),
+            ("date_range", "rules", 2, "except", 1),
+        ],
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def schema():
+    with open(schema_filename, "r", encoding="utf8") as schema_file:
+        return json.loads(schema_file.read())
+
+
+@pytest.fixture(scope="module")
+def validators(schema):
+    return Validator(schema), ScheduleValidator(schema)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_differential(validators, seed):
+    assert differential_check(*validators, CASES, random.Random(seed)) == 0
+
+
+@pytest.mark.parametrize("document, paths", EDGE_CASES)
+def test_edge_cases(validators, document, paths):
+    cerberus, compiled = validators
+    errors = compiled.validate(document)
+    assert sorted((e.path for e in errors), key=str) == sorted(paths, key=str)
+
+    cerberus_valid = cerberus.validate(document)
+    assert cerberus_valid == (not errors)
+    if not cerberus_valid:
+        assert set(cerberus.errors) == {p[0] for p in paths}
+
+
+@pytest.mark.parametrize("ranges", [0, 1, 50])
+def test_generated_documents_valid(validators, ranges):
+    document = make_document(ranges, random.Random(ranges))
+    cerberus, compiled = validators
+    assert cerberus.validate(document)
+    assert compiled.validate(document) == []
+
+
+def test_missing_document(validators):
+    errors = validators[1].validate(None)
+    assert [(e.path, e.message) for e in errors] == [((), "document is missing")]
+
+
+def test_validate_field(validators):
+    # streamed date_range ranges are validated one by one
+    compiled = validators[1]
+    path = ("date_range", "ranges", 5)
+    item = {"start_date": "xxxx-01-01", "end_date": "xxxx-01-02", "path": "/a.mp4"}
+    assert compiled.validate_field(item, path) == []
+    errors = compiled.validate_field(dict(item, start_date=1), path)
+    assert [e.path for e in errors] == [path + ("start_date",)]
+
+
+def test_locate_errors(validators):
+    text = "---\ndefault:\n  enabled: yes\n  path: /a.mp4\nmisc:\n  enabled: maybe\n"
+    errors = locate_errors(validators[1].validate(yaml.safe_load(text)), text)
+    assert {(e.path, e.line) for e in errors} == {
+        (("misc", "enabled"), 6),
+        # missing fields are reported where their parent mapping starts
+        (("misc", "always_use"), 6),
+    }
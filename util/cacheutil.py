@@ -0,0 +1,165 @@
+#!/usr/bin/python
+"""Local on-disk cache utilities
+
+Small persistent caches (JSON) stored in a per-user cache folder:
+* $XDG_CACHE_HOME/plex-schedule-prerolls
+* ~/.cache/plex-schedule-prerolls (default)
+
+Raises:
+    OSError: Problems creating the cache folder or writing cache files
+"""
+import hashlib
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+CACHE_FOLDER_NAME = "plex-schedule-prerolls"
+
+# read once at import, os.umask can only be read by setting it (not thread safe)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def cache_dir(path: Optional[str] = None) -> str:
+    """Return (and create if needed) the folder to store cache files in
+
+    Args:
+        path (str, optional): path/to/cache folder [Default: per-user cache folder]
+
+    Raises:
+        OSError: Unable to create the cache folder
+
+    Returns:
+        str: path to the cache folder
+    """
+    if not path:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        path = os.path.join(base, CACHE_FOLDER_NAME)
+
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        logger.error('Error creating cache folder "%s"', path, exc_info=e)
+        raise
+
+    return path
+
+
+def text_hash(value: str) -> str:
+    """Return a stable hex digest of a string
+
+    Args:
+        value (str): string to hash
+
+    Returns:
+        str: sha256 hex digest
+    """
+    return hashlib.sha256(value.encode("utf8")).hexdigest()
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write a file by replacing it, readers never see a partial file
+    Keeps the mode of the file replaced, new files get the usual 0666 & ~umask mode
+    (temporary files are created 0600, unreadable by other users)
+
+    Args:
+        path (str):     path/to/file to write
+        data (bytes):   contents to write
+
+    Raises:
+        OSError: Problems writing the file
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JsonCache:
+    """Thread safe key/value store persisted as a JSON file
+
+    A missing or unreadable file starts an empty cache, cache files are
+    never required for correct results.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data: Dict[str, Any] = {}
+
+        try:
+            with open(path, "r", encoding="utf8") as file:
+                data = json.load(file)
+            if isinstance(data, dict):
+                self._data = data
+        except FileNotFoundError:
+            logger.debug('Cache file "%s" not found, starting empty', path)
+        except (OSError, ValueError) as e:
+            logger.warning('Unable to read cache file "%s", starting empty: %s', path, e)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            if self._data.get(key) != value:
+                self._data[key] = value
+                self._dirty = True
+
+    def pop(self, key: str) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._dirty = True
+            return self._data.pop(key, None)
+
+    def save(self) -> None:
+        """Persist the cache, if anything changed
+
+        Raises:
+            OSError: Problems writing the cache file
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = json.dumps(self._data, indent=1, sort_keys=True).encode("utf8")
+            try:
+                atomic_write(self.path, data)
+            except OSError as e:
+                logger.error('Error writing cache file "%s"', self.path, exc_info=e)
+                raise
+            self._dirty = False
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"cache = {SCRIPT_NAME}.JsonCache(path)"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,326 @@
+#!/usr/bin/python
+"""Columnar (array backed) schedule storage for very large schedules
+
+Stores schedule entries as parallel typed arrays instead of one object per entry:
+* start/end: int64 microseconds since 1970-01-01 (naive, wall clock)
+* type: uint8 code into a table of schedule section names
+* force: bool flag
+* path: uint32 index into a table of distinct (interned) paths
+* priority: int32 entry priority
+
+Microseconds rather than seconds keep entry ends exact, entries end at
+23:59:59.999999 and stay inclusive of their last second.
+
+Lookups are vectorized with NumPy when it is installed (imported on first
+use only), and use the standard library "array" module with bisect otherwise.
+Entries are still available as a read-only sequence of entry tuples.
+
+Raises:
+    ValueError: Entry with an end before its start
+"""
+import logging
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Sequence, Union, overload
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# entries per block of the array (no numpy) lookups
+BLOCK_SIZE = 64
+
+
+class Entry(NamedTuple):
+    type: str
+    startdate: datetime
+    enddate: datetime
+    force: bool
+    path: str
+    priority: int = 0
+
+
+@lru_cache(maxsize=None)
+def numpy_module() -> Any:
+    """Return the numpy module, None if not installed
+    Imported on first use only, numpy is slow to import
+
+    Returns:
+        module: numpy, or None
+    """
+    try:
+        import numpy  # type: ignore
+
+        return numpy
+    except ImportError:
+        logger.debug("numpy not installed, using array columns")
+        return None
+
+
+def to_micros(value: Union[date, datetime], lowtime: bool = True) -> int:
+    """Return a datetime as microseconds since 1970-01-01, dates as their first/last instant
+
+    Args:
+        value (Union[date, datetime]):  naive date/datetime
+        lowtime (bool, optional):       dates start (True) or end (False) of the day
+                                        [Default: True]
+
+    Returns:
+        int: microseconds since 1970-01-01 00:00:00
+    """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time() if lowtime else datetime.max.time())
+
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """Return the datetime of microseconds since 1970-01-01 (See: to_micros)
+
+    Args:
+        value (int): microseconds since 1970-01-01 00:00:00
+
+    Returns:
+        datetime: naive datetime
+    """
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class ColumnarSchedule(Sequence[Any]):
+    """Schedule entries stored as typed arrays, with vectorized lookups
+
+    Indexing and iterating return entry tuples built by entry_factory,
+    positions returned by queries are ascending so schedule order is kept.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[Any],
+        type_names: Optional[Sequence[str]] = None,
+        entry_factory: Callable[..., Any] = Entry,
+        use_numpy: Optional[bool] = None,
+    ):
+        """Build the columns from entries with type, startdate, enddate, force, path
+        and optionally priority
+
+        Args:
+            entries (Iterable[Any]):                schedule entries, in schedule order
+            type_names (Sequence[str], optional):   known type names, unknown types are added
+                                                    [Default: None]
+            entry_factory (Callable, optional):     builds entries for the sequence view, called
+                                                    with (type, startdate, enddate, force, path,
+                                                    priority)
+                                                    [Default: Entry]
+            use_numpy (bool, optional):             use numpy columns, None to use them when
+                                                    installed [Default: None]
+
+        Raises:
+            ValueError: an entry ends before it starts
+        """
+        self.entry_factory = entry_factory
+        self.type_names: List[str] = list(type_names or [])
+        self.paths: List[str] = []
+
+        type_codes = {t: i for i, t in enumerate(self.type_names)}
+        path_ids: dict = {}
+
+        starts = array("q")
+        ends = array("q")
+        types = array("B")
+        force = array("B")
+        path_idx = array("I")
+        priority = array("i")
+
+        for pos, e in enumerate(entries):
+            start = to_micros(e.startdate, lowtime=True)
+            end = to_micros(e.enddate, lowtime=False)
+            if end < start:
+                msg = f'Entry #{pos} ends before it starts: "{e.startdate}" - "{e.enddate}"'
+                logger.error(msg)
+                raise ValueError(msg)
+
+            if e.type not in type_codes:
+                type_codes[e.type] = len(self.type_names)
+                self.type_names.append(e.type)
+            path = str(e.path)
+            if path not in path_ids:
+                path_ids[path] = len(self.paths)
+                self.paths.append(sys.intern(path))
+
+            starts.append(start)
+            ends.append(end)
+            types.append(type_codes[e.type])
+            force.append(1 if e.force else 0)
+            path_idx.append(path_ids[path])
+            priority.append(getattr(e, "priority", 0))
+
+        np = numpy_module() if use_numpy is not False else None
+        if use_numpy and np is None:
+            logger.warning("numpy not installed, using array columns")
+        self.numpy = np is not None
+
+        self._sorted_starts = array("q", sorted(starts))
+        self._sorted_ends = array("q", sorted(ends))
+        if np is not None:
+            self.starts: Any = np.frombuffer(starts, dtype=np.int64)
+            self.ends: Any = np.frombuffer(ends, dtype=np.int64)
+            self.types: Any = np.frombuffer(types, dtype=np.uint8)
+            self.force: Any = np.frombuffer(force, dtype=np.uint8).astype(np.bool_)
+            self.path_idx: Any = np.frombuffer(path_idx, dtype=np.uint32)
+            self.priority: Any = np.frombuffer(priority, dtype=np.int32)
+            self._order: Any = None
+        else:
+            self.starts = starts
+            self.ends = ends
+            self.types = types
+            self.force = force
+            self.path_idx = path_idx
+            self.priority = priority
+            # positions sorted by start, to only check entries started by a point,
+            # in blocks with their latest end, to skip blocks of ended entries
+            self._order = array("I", sorted(range(len(starts)), key=starts.__getitem__))
+            self._block_ends = array(
+                "q",
+                [
+                    max(ends[i] for i in self._order[b : b + BLOCK_SIZE])
+                    for b in range(0, len(self._order), BLOCK_SIZE)
+                ],
+            )
+
+        logger.debug(
+            "Columnar schedule of %s entries, %s distinct paths (%s)",
+            len(starts),
+            len(self.paths),
+            "numpy" if self.numpy else "array",
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def entry(self, pos: int) -> Any:
+        """Return the entry at a position, built by entry_factory
+
+        Args:
+            pos (int): entry position
+
+        Returns:
+            Any: entry tuple
+        """
+        return self.entry_factory(
+            self.type_names[self.types[pos]],
+            from_micros(self.starts[pos]),
+            from_micros(self.ends[pos]),
+            bool(self.force[pos]),
+            self.paths[self.path_idx[pos]],
+            int(self.priority[pos]),
+        )
+
+    @overload
+    def __getitem__(self, pos: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, pos: slice) -> List[Any]: ...
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self.entry(i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("ColumnarSchedule index out of range")
+        return self.entry(pos)
+
+    def query(self, point: Union[date, datetime]) -> List[int]:
+        """Return the positions of the entries containing a point, ascending
+
+        Args:
+            point (Union[date, datetime]): datetime to check entries against
+
+        Returns:
+            List[int]: positions of matching entries
+        """
+        t = to_micros(point)
+        if self.numpy:
+            np = numpy_module()
+            return np.flatnonzero((self.starts <= t) & (self.ends >= t)).tolist()
+
+        started = bisect_right(self._sorted_starts, t)
+        order = self._order
+        ends = self.ends
+        found: List[int] = []
+        for b, block_end in enumerate(self._block_ends[: -(-started // BLOCK_SIZE)]):
+            if block_end >= t:
+                lo = b * BLOCK_SIZE
+                found.extend(i for i in order[lo : min(lo + BLOCK_SIZE, started)] if ends[i] >= t)
+
+        return sorted(found)
+
+    def next_start(self, point: Union[date, datetime]) -> Optional[datetime]:
+        """Return the first entry start after a point (See: IntervalIndex.next_start)
+
+        Args:
+            point (Union[date, datetime]): datetime to search from
+
+        Returns:
+            datetime: next start, None if no entry starts after the point
+        """
+        pos = bisect_right(self._sorted_starts, to_micros(point))
+        if pos < len(self._sorted_starts):
+            return from_micros(self._sorted_starts[pos])
+
+        return None
+
+    def next_end(self, point: Union[date, datetime]) -> Optional[datetime]:
+        """Return the first entry end at or after a point (See: IntervalIndex.next_end)
+
+        Args:
+            point (Union[date, datetime]): datetime to search from
+
+        Returns:
+            datetime: next end, None if all entries ended before the point
+        """
+        pos = bisect_left(self._sorted_ends, to_micros(point))
+        if pos < len(self._sorted_ends):
+            return from_micros(self._sorted_ends[pos])
+
+        return None
+
+    def intervals(self) -> List[tuple]:
+        """Return (start, end) microsecond pairs of all entries, in schedule order
+
+        Returns:
+            List[tuple]: (start, end) pairs (See: to_micros)
+        """
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns and the path table, in bytes"""
+        columns = (self.starts, self.ends, self.types, self.force, self.path_idx, self.priority)
+        size = sum(c.nbytes if self.numpy else c.itemsize * len(c) for c in columns)
+        size += 2 * 8 * len(self._sorted_starts)
+        if self._order is not None:
+            size += self._order.itemsize * len(self._order) + 8 * len(self._block_ends)
+
+        return size + sum(sys.getsizeof(p) for p in self.paths)
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"schedule = {SCRIPT_NAME}.ColumnarSchedule(entries)"
+        + "\n"
+        + "positions = schedule.query(datetime.now())"
+        + "\n"
+    )
+    logger.error(msg)
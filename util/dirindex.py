@@ -0,0 +1,220 @@
+#!/usr/bin/python
+"""Directory and glob pre-roll path expansion
+
+Expands pre-roll listing paths into concrete files:
+* folders, ex: /prerolls/halloween/ (video files directly in the folder)
+* glob patterns, ex: /prerolls/halloween/*.mp4 or /prerolls/*/intro.mkv
+
+Folder contents come from a persistent index (JsonCache) holding the
+files and sub folders of each folder with its mtime. A folder is only
+listed again when its mtime changes, so large folders on network storage
+cost a single stat per run.
+
+Raises:
+    OSError: Problems reading or writing the cache file
+"""
+import fnmatch
+import glob
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from util.cacheutil import JsonCache
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+# files used when expanding a folder, glob patterns match any file
+VIDEO_EXTENSIONS = {
+    ".avi",
+    ".m2ts",
+    ".m4v",
+    ".mkv",
+    ".mov",
+    ".mp4",
+    ".mpeg",
+    ".mpg",
+    ".ts",
+    ".webm",
+    ".wmv",
+}
+
+
+class FolderListing(NamedTuple):
+    files: List[str]
+    folders: List[str]
+
+
+class DirIndex:
+    """Folder listings, reused while the folder mtime is unchanged"""
+
+    def __init__(self, cache: Optional["JsonCache"] = None):
+        """
+        Args:
+            cache (JsonCache, optional): persistent index [Default: None, in memory only]
+        """
+        self.cache = cache
+        self._listings: Dict[str, Optional[FolderListing]] = {}
+        self.scanned = 0
+
+    def listing(self, folder: str) -> Optional[FolderListing]:
+        """Return the files and sub folders of a folder, sorted by name
+
+        Args:
+            folder (str): path/to/folder
+
+        Returns:
+            FolderListing: folder contents, None if not a readable folder
+        """
+        if folder in self._listings:
+            return self._listings[folder]
+
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            self._listings[folder] = None
+            if self.cache is not None:
+                self.cache.pop(folder)
+            return None
+
+        cached = self.cache.get(folder) if self.cache is not None else None
+        if cached and cached.get("mtime") == mtime:
+            found: Optional[FolderListing] = FolderListing(cached["files"], cached["folders"])
+        else:
+            found = self._scan(folder)
+            if self.cache is not None:
+                if found is None:
+                    self.cache.pop(folder)
+                else:
+                    self.cache.set(
+                        folder, {"mtime": mtime, "files": found.files, "folders": found.folders}
+                    )
+
+        self._listings[folder] = found
+        return found
+
+    def _scan(self, folder: str) -> Optional[FolderListing]:
+        logger.debug('Scanning folder "%s"', folder)
+        self.scanned += 1
+        files: List[str] = []
+        folders: List[str] = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            folders.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning('Unable to list folder "%s": %s', folder, e)
+            return None
+
+        return FolderListing(sorted(files), sorted(folders))
+
+    def _glob(self, pattern: str) -> List[str]:
+        # walk the pattern one path component at a time, listing folders from the index
+        absolute = pattern.startswith(os.sep)
+        parts = [p for p in pattern.split(os.sep) if p]
+        bases = [os.sep if absolute else ""]
+
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            next_bases: List[str] = []
+            for base in bases:
+                if not glob.has_magic(part) and not last:
+                    next_bases.append(os.path.join(base, part))
+                    continue
+
+                found = self.listing(base or os.curdir)
+                if found is None:
+                    continue
+                names = found.files if last else found.folders
+                if not glob.has_magic(part):
+                    matched = [part] if part in names else []
+                else:
+                    # hidden entries only match patterns asking for them, as with glob
+                    matched = [
+                        n
+                        for n in fnmatch.filter(names, part)
+                        if part.startswith(".") or not n.startswith(".")
+                    ]
+                next_bases.extend(os.path.join(base, n) for n in matched)
+            bases = next_bases
+
+        return bases
+
+    def expand(self, path: str) -> List[str]:
+        """Return the files of a listing path: folder contents, glob matches or the path itself
+        Paths matching nothing are returned untouched
+
+        Args:
+            path (str): pre-roll path, folder or glob pattern
+
+        Returns:
+            List[str]: concrete file paths, sorted
+        """
+        if glob.has_magic(path):
+            folder, name = os.path.split(path)
+            found = self.listing(folder) if not glob.has_magic(folder) else None
+            # a file with glob characters in its name, ex: "Trailer [2020].mp4"
+            if found is not None and name in found.files:
+                return [path]
+
+            matches = self._glob(path)
+            if matches:
+                return matches
+            logger.warning('Pre-Roll pattern "%s" matches no files', path)
+            return [path]
+
+        # only paths that look like folders cost a stat
+        if path.endswith(os.sep) or not os.path.splitext(path)[1]:
+            found = self.listing(path.rstrip(os.sep) or os.sep)
+            if found is not None:
+                files = [
+                    os.path.join(path, f)
+                    for f in found.files
+                    if os.path.splitext(f)[1].lower() in VIDEO_EXTENSIONS and not f.startswith(".")
+                ]
+                if files:
+                    return files
+                logger.warning('Pre-Roll folder "%s" has no video files', path)
+
+        return [path]
+
+    def expand_listing(self, listing: str) -> str:
+        """Return a Plex listing with its folders and glob patterns expanded
+        Expanded files keep the separator of the path they replace, ";" (random) or "," (play all)
+
+        Args:
+            listing (str): Plex listing, paths separated by ";" and/or ","
+
+        Returns:
+            str: listing of concrete file paths
+        """
+        groups: List[str] = []
+        for group in listing.split(";"):
+            paths = [p.strip() for p in group.split(",")]
+            if len(paths) == 1:
+                groups.extend(self.expand(paths[0]) if paths[0] else [group])
+            else:
+                groups.append(",".join(f for p in paths if p for f in self.expand(p)))
+
+        return ";".join(groups)
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"listing = {SCRIPT_NAME}.DirIndex(cache).expand_listing(listing)"
+        + "\n"
+    )
+    logger.error(msg)
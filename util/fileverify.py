@@ -0,0 +1,181 @@
+#!/usr/bin/python
+"""Pre-roll file verification utilities
+
+Checks that the files of a pre-roll listing exist and are readable.
+Files are stat-ed concurrently (media often lives on slow NFS/SMB mounts),
+and results are cached with the mtime of their folder: while a folder is
+unchanged (no files added, removed or renamed), the cached result of every
+file in it is reused with a single folder stat.
+
+Raises:
+    OSError: Problems reading or writing the cache file
+"""
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from util.cacheutil import JsonCache
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+POLICIES = ["ignore", "warn", "drop", "abort"]
+
+
+class FileStatus(NamedTuple):
+    path: str
+    exists: bool
+    readable: bool
+    size: int = 0
+    mtime: float = 0.0
+    error: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.exists and self.readable
+
+
+def listing_paths(listing: str) -> List[str]:
+    """Return the distinct file paths of a Plex listing, in listing order
+
+    Args:
+        listing (str): Plex listing, paths separated by ";" (random) and/or "," (play all)
+
+    Returns:
+        List[str]: file paths
+    """
+    paths = [p.strip() for group in listing.split(";") for p in group.split(",")]
+
+    return list(dict.fromkeys(p for p in paths if p))
+
+
+def _stat_file(path: str) -> FileStatus:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return FileStatus(path, exists=False, readable=False, error="not found")
+    except OSError as e:
+        return FileStatus(path, exists=False, readable=False, error=str(e))
+
+    readable = os.access(path, os.R_OK)
+    return FileStatus(
+        path,
+        exists=True,
+        readable=readable,
+        size=st.st_size,
+        mtime=st.st_mtime,
+        error=None if readable else "not readable",
+    )
+
+
+def _stat_folder(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def verify_files(
+    paths: Iterable[str], max_workers: int = 16, cache: Optional["JsonCache"] = None
+) -> Dict[str, FileStatus]:
+    """Return the status of every file, stat-ing them concurrently
+
+    Args:
+        paths (Iterable[str]):          files to verify
+        max_workers (int, optional):    max concurrent stats [Default: 16]
+        cache (JsonCache, optional):    cache of earlier results [Default: None]
+
+    Returns:
+        Dict[str, FileStatus]: status per path
+    """
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        return {}
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, min(max_workers, len(paths)))
+    folders = list(dict.fromkeys(os.path.dirname(p) or "." for p in paths))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        folder_mtimes = dict(zip(folders, executor.map(_stat_folder, folders)))
+
+        results: Dict[str, FileStatus] = {}
+        to_stat: List[str] = []
+        for path in paths:
+            folder_mtime = folder_mtimes[os.path.dirname(path) or "."]
+            cached = cache.get(path) if cache is not None else None
+            if folder_mtime is not None and cached and cached.get("folder_mtime") == folder_mtime:
+                results[path] = FileStatus(path, **cached["status"], cached=True)
+            else:
+                to_stat.append(path)
+
+        for status in executor.map(_stat_file, to_stat):
+            results[status.path] = status
+
+    if cache is not None:
+        for path in to_stat:
+            folder_mtime = folder_mtimes[os.path.dirname(path) or "."]
+            if folder_mtime is None:
+                cache.pop(path)
+                continue
+
+            status = results[path]
+            cache.set(
+                path,
+                {
+                    "folder_mtime": folder_mtime,
+                    "status": {
+                        "exists": status.exists,
+                        "readable": status.readable,
+                        "size": status.size,
+                        "mtime": status.mtime,
+                        "error": status.error,
+                    },
+                },
+            )
+
+    logger.debug(
+        "Verified %s files, %s stat-ed (%s cached)",
+        len(paths),
+        len(to_stat),
+        len(paths) - len(to_stat),
+    )
+
+    return results
+
+
+def drop_paths(listing: str, paths: Iterable[str]) -> str:
+    """Return a listing without the given paths, keeping its ";" and "," structure
+
+    Args:
+        listing (str):          Plex listing, paths separated by ";" and/or ","
+        paths (Iterable[str]):  paths to remove
+
+    Returns:
+        str: listing without the paths, ";" if none are left
+    """
+    drop = set(paths)
+    groups = []
+    for group in listing.split(";"):
+        kept = [p for p in group.split(",") if p.strip() and p.strip() not in drop]
+        if kept:
+            groups.append(",".join(kept))
+
+    return ";".join(groups) if groups else ";"
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"status = {SCRIPT_NAME}.verify_files({SCRIPT_NAME}.listing_paths(listing))"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,305 @@
+#!/usr/bin/python
+"""Watch files for changes, with inotify on Linux and stat polling elsewhere
+
+The folders of the watched files are watched with inotify (through ctypes,
+no extra dependency), so editors saving through a temporary file and a
+rename are noticed as well as in place writes. Files whose folder can't be
+watched (no inotify, folder missing, watch limit reached) are polled for
+changes of their modification time, size or inode instead.
+
+Changes are reported once writes settle, editors often save in several steps.
+
+Raises:
+    OSError: Unable to read inotify events
+"""
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+# inotify event masks (See: man 7 inotify)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_ONLYDIR
+)
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+EVENT_HEADER = struct.Struct("iIII")
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+@lru_cache(maxsize=None)
+def inotify_libc() -> Any:
+    """Return the C library with inotify functions, None if inotify is not available
+
+    Returns:
+        ctypes.CDLL: C library, or None
+    """
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError, ImportError):
+        logger.debug("inotify not available, polling for file changes")
+        return None
+
+
+def signature(path: str) -> Signature:
+    """Return what identifies the current version of a file
+
+    Args:
+        path (str): path/to/file
+
+    Returns:
+        Tuple[int, int, int]: (modification time ns, size, inode), None if missing
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class FileWatcher:
+    """Reports changes of a set of files (See: wait)"""
+
+    def __init__(
+        self,
+        paths: Iterable[str] = (),
+        poll_interval: float = 1.0,
+        settle_seconds: float = 0.2,
+        use_inotify: Optional[bool] = None,
+    ):
+        """
+        Args:
+            paths (Iterable[str], optional):    files to watch, need not exist yet [Default: none]
+            poll_interval (float, optional):    seconds between checks of polled files
+                                                [Default: 1.0]
+            settle_seconds (float, optional):   quiet time after a change before reporting it
+                                                [Default: 0.2]
+            use_inotify (bool, optional):       use inotify, None to use it when available
+                                                [Default: None]
+        """
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+
+        # inotify watch descriptor -> folder, folder -> file name -> watched paths
+        self._fd: Optional[int] = None
+        self._folders: Dict[int, str] = {}
+        self._watched: Dict[str, Dict[str, Set[str]]] = {}
+        # polled path -> last signature
+        self._polled: Dict[str, Signature] = {}
+
+        libc = inotify_libc() if use_inotify is not False else None
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                import ctypes
+
+                logger.warning(
+                    "Unable to use inotify (%s), polling for file changes",
+                    os.strerror(ctypes.get_errno()),
+                )
+            else:
+                self._fd = fd
+        self._libc = libc if self._fd is not None else None
+
+        self.watch(paths)
+
+    @property
+    def mode(self) -> str:
+        """inotify when any file is watched with inotify, poll otherwise"""
+        return "inotify" if self._folders else "poll"
+
+    def watch(self, paths: Iterable[str]) -> None:
+        """Add files to watch, already watched files are ignored
+
+        Args:
+            paths (Iterable[str]): files to watch, need not exist yet
+        """
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in self._polled or any(
+                path in names.get(os.path.basename(path), ()) for names in self._watched.values()
+            ):
+                continue
+
+            # symbolic links: changes of the link and of the file it points to
+            targets = {os.path.abspath(path), os.path.realpath(path)}
+            if not all(self._add_watch(target, path) for target in targets):
+                self._polled[path] = signature(path)
+                logger.debug('Polling "%s" for changes', path)
+
+    def _add_watch(self, target: str, path: str) -> bool:
+        if self._libc is None:
+            return False
+
+        folder, name = os.path.split(target)
+        if folder not in self._watched:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                import ctypes
+
+                logger.debug('Unable to watch "%s" (%s)', folder, os.strerror(ctypes.get_errno()))
+                return False
+            self._folders[wd] = folder
+            self._watched[folder] = {}
+
+        self._watched[folder].setdefault(name, set()).add(path)
+        logger.debug('Watching "%s" for changes with inotify', path)
+        return True
+
+    def _read_events(self) -> Set[str]:
+        changed: Set[str] = set()
+        try:
+            data = os.read(self._fd, 65536)  # type: ignore
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(
+                data[offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            )
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, anything may have changed
+                logger.debug("inotify queue overflow")
+                for names in self._watched.values():
+                    for paths in names.values():
+                        changed.update(paths)
+                continue
+
+            folder = self._folders.get(wd)
+            if folder is None:
+                continue
+
+            if mask & IN_IGNORED:
+                # the folder is gone, poll its files from now on
+                del self._folders[wd]
+                for paths in self._watched.pop(folder, {}).values():
+                    for path in paths:
+                        self._polled[path] = None
+                        changed.add(path)
+                continue
+
+            changed.update(self._watched[folder].get(name, ()))
+
+        return changed
+
+    def _poll(self) -> Set[str]:
+        changed: Set[str] = set()
+        for path, last in self._polled.items():
+            current = signature(path)
+            if current != last:
+                self._polled[path] = current
+                changed.add(path)
+
+        return changed
+
+    def _collect(self, timeout: float) -> Set[str]:
+        # wait up to timeout (or the poll interval) for changes
+        wait = min(timeout, self.poll_interval) if self._polled else timeout
+        changed: Set[str] = set()
+        if self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], max(0.0, wait))
+            if ready:
+                changed.update(self._read_events())
+        elif wait > 0:
+            time.sleep(wait)
+
+        changed.update(self._poll())
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Wait for watched files to change
+
+        Args:
+            timeout (float, optional): longest wait in seconds, None to wait until a change
+                                       [Default: None]
+
+        Raises:
+            OSError: Unable to read inotify events
+
+        Returns:
+            Set[str]: absolute paths of the changed files, empty if none changed before timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: Set[str] = set()
+        while not changed:
+            remaining = 3600.0 if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            changed = self._collect(remaining)
+
+        # editors save in several steps, report once the writes settle
+        while True:
+            more = self._collect(self.settle_seconds)
+            if not more:
+                break
+            changed.update(more)
+
+        logger.debug("Changed files: %s", sorted(changed))
+        return changed
+
+    def close(self) -> None:
+        """Stop watching, release the inotify file descriptor"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._libc = None
+            self._folders.clear()
+            self._watched.clear()
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f'watcher = {SCRIPT_NAME}.FileWatcher(["preroll_schedules.yaml", "config.ini"])'
+        + "\n"
+        + "changed = watcher.wait(timeout=300)"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,329 @@
+#!/usr/bin/python
+"""Header only media duration probing
+
+Reads video durations without ffprobe, and without reading files in full:
+* MP4/MOV/M4V: moov -> mvhd box (top level boxes are skipped by seeking,
+  a moov at the end of the file never reads the media data before it)
+* Matroska/WebM: Segment -> Info (TimestampScale, Duration) elements
+
+Only a few small ranged reads are done per file, which keeps probing
+cheap on network storage. Durations are cached by path, mtime and size.
+
+Raises:
+    OSError: Problems reading or writing the cache file
+"""
+import logging
+import os
+import struct
+import sys
+from typing import IO, TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from util.cacheutil import JsonCache
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+EBML_HEADER_ID = 0x1A45DFA3
+MKV_SEGMENT_ID = 0x18538067
+MKV_INFO_ID = 0x1549A966
+MKV_CLUSTER_ID = 0x1F43B675
+MKV_TIMESTAMP_SCALE_ID = 0x2AD7B1
+MKV_DURATION_ID = 0x4489
+
+# top level elements/boxes to look through before giving up
+MAX_ELEMENTS = 64
+
+
+def _mp4_box(file: IO[bytes], pos: int, end: int) -> Optional[Tuple[bytes, int, int]]:
+    # return the type, payload start and box end of the box at pos
+    file.seek(pos)
+    header = file.read(16)
+    if len(header) < 8:
+        return None
+
+    size, kind = struct.unpack(">I4s", header[:8])
+    header_size = 8
+    if size == 1:
+        if len(header) < 16:
+            return None
+        size = struct.unpack(">Q", header[8:16])[0]
+        header_size = 16
+    elif size == 0:
+        size = end - pos
+
+    if size < header_size or pos + size > end:
+        return None
+
+    return kind, pos + header_size, pos + size
+
+
+def _mp4_find(file: IO[bytes], start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    pos = start
+    for _ in range(MAX_ELEMENTS):
+        if pos + 8 > end:
+            return None
+        box = _mp4_box(file, pos, end)
+        if box is None:
+            return None
+        if box[0] == kind:
+            return box[1], box[2]
+        pos = box[2]
+
+    return None
+
+
+def mp4_duration(file: IO[bytes], size: int) -> Optional[float]:
+    """Return the duration of an MP4 (ISO BMFF) file from its mvhd box
+
+    Args:
+        file (IO[bytes]):   file opened in binary mode
+        size (int):         file size
+
+    Returns:
+        float: duration in seconds, None if not found
+    """
+    moov = _mp4_find(file, 0, size, b"moov")
+    if moov is None:
+        return None
+
+    mvhd = _mp4_find(file, moov[0], moov[1], b"mvhd")
+    if mvhd is None:
+        return None
+
+    file.seek(mvhd[0])
+    payload = file.read(32)
+    if len(payload) < 20:
+        return None
+
+    if payload[0] == 1:
+        if len(payload) < 32:
+            return None
+        timescale, duration = struct.unpack(">IQ", payload[20:32])
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = struct.unpack(">II", payload[12:20])
+        unknown = 0xFFFFFFFF
+
+    if not timescale or not duration or duration == unknown:
+        return None
+
+    return duration / timescale
+
+
+def _ebml_vint(file: IO[bytes], keep_marker: bool) -> Optional[Tuple[int, int, bool]]:
+    # return the value, its length in bytes and if it is the "unknown" (all ones) value
+    first = file.read(1)
+    if not first:
+        return None
+
+    b = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not b & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        return None
+
+    rest = file.read(length - 1)
+    if len(rest) < length - 1:
+        return None
+
+    value = b if keep_marker else b & (mask - 1)
+    all_ones = (b & (mask - 1)) == mask - 1
+    for r in rest:
+        value = (value << 8) | r
+        all_ones = all_ones and r == 0xFF
+
+    return value, length, all_ones and not keep_marker
+
+
+def _ebml_element(file: IO[bytes]) -> Optional[Tuple[int, int, bool]]:
+    # return the element id, data size and if the size is unknown, at the current position
+    element_id = _ebml_vint(file, keep_marker=True)
+    data_size = _ebml_vint(file, keep_marker=False)
+    if element_id is None or data_size is None:
+        return None
+
+    return element_id[0], data_size[0], data_size[2]
+
+
+def mkv_duration(file: IO[bytes], size: int) -> Optional[float]:
+    """Return the duration of a Matroska/WebM file from its Segment Info
+
+    Args:
+        file (IO[bytes]):   file opened in binary mode
+        size (int):         file size
+
+    Returns:
+        float: duration in seconds, None if not found
+    """
+    file.seek(0)
+    header = _ebml_element(file)
+    if header is None or header[0] != EBML_HEADER_ID:
+        return None
+    file.seek(file.tell() + header[1])
+
+    segment = _ebml_element(file)
+    if segment is None or segment[0] != MKV_SEGMENT_ID:
+        return None
+    segment_end = size if segment[2] else min(size, file.tell() + segment[1])
+
+    for _ in range(MAX_ELEMENTS):
+        pos = file.tell()
+        if pos >= segment_end:
+            return None
+        element = _ebml_element(file)
+        if element is None:
+            return None
+        element_id, data_size, unknown_size = element
+
+        if element_id == MKV_INFO_ID:
+            return _mkv_info_duration(file, file.tell() + data_size)
+        if unknown_size or element_id == MKV_CLUSTER_ID:
+            # media data starts, Info comes before it
+            return None
+        file.seek(file.tell() + data_size)
+
+    return None
+
+
+def _mkv_info_duration(file: IO[bytes], end: int) -> Optional[float]:
+    scale = 1000000  # nanoseconds per timestamp unit (Matroska default)
+    duration: Optional[float] = None
+
+    while file.tell() < end:
+        element = _ebml_element(file)
+        if element is None:
+            return None
+        element_id, data_size, _ = element
+        data = file.read(data_size) if data_size <= 8 else None
+        if data is None:
+            file.seek(file.tell() + data_size)
+            continue
+
+        if element_id == MKV_TIMESTAMP_SCALE_ID and data:
+            scale = int.from_bytes(data, "big")
+        elif element_id == MKV_DURATION_ID and len(data) in (4, 8):
+            duration = struct.unpack(">f" if len(data) == 4 else ">d", data)[0]
+
+    if duration is None or duration <= 0:
+        return None
+
+    return duration * scale / 1e9
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Return the duration of an MP4 or Matroska file, reading only its headers
+
+    Args:
+        path (str): path/to/media file
+
+    Returns:
+        float: duration in seconds, None if unknown/unsupported/unreadable
+    """
+    try:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            magic = file.read(12)
+            if magic[:4] == b"\x1a\x45\xdf\xa3":
+                return mkv_duration(file, size)
+            if magic[4:8] in (b"ftyp", b"moov", b"free", b"mdat", b"wide", b"skip"):
+                return mp4_duration(file, size)
+    except (OSError, struct.error) as e:
+        logger.debug('Unable to probe "%s": %s', path, e)
+
+    return None
+
+
+class MediaProbe:
+    """Media durations, cached by path, mtime and size"""
+
+    def __init__(self, cache: Optional["JsonCache"] = None, max_workers: int = 16):
+        """
+        Args:
+            cache (JsonCache, optional):    persistent duration cache [Default: None]
+            max_workers (int, optional):    max files probed concurrently [Default: 16]
+        """
+        self.cache = cache
+        self.max_workers = max_workers
+        self.probed = 0
+
+    def _duration(self, path: str) -> Optional[float]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        cached = self.cache.get(path) if self.cache is not None else None
+        if cached and cached.get("mtime") == st.st_mtime and cached.get("size") == st.st_size:
+            return cached.get("duration")
+
+        duration = probe_duration(path)
+        self.probed += 1
+        if duration is None:
+            logger.warning('Unable to read the duration of "%s"', path)
+        if self.cache is not None:
+            self.cache.set(path, {"mtime": st.st_mtime, "size": st.st_size, "duration": duration})
+
+        return duration
+
+    def durations(self, paths: Iterable[str]) -> Dict[str, Optional[float]]:
+        """Return the duration of every file, probing them concurrently
+
+        Args:
+            paths (Iterable[str]): media files
+
+        Returns:
+            Dict[str, Optional[float]]: duration in seconds per path, None if unknown
+        """
+        paths = list(dict.fromkeys(paths))
+        if not paths:
+            return {}
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = max(1, min(self.max_workers, len(paths)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(paths, executor.map(self._duration, paths)))
+
+
+def fit_budget(
+    paths: List[str], durations: Dict[str, Optional[float]], max_total_seconds: float
+) -> List[str]:
+    """Return the largest set of files playing within a time budget, in their original order
+    Shortest files are picked first, which maximizes the number of files that fit.
+    Files of unknown duration never fit
+
+    Args:
+        paths (List[str]):                          candidate files
+        durations (Dict[str, Optional[float]]):     duration per file (See: MediaProbe)
+        max_total_seconds (float):                  time budget
+
+    Returns:
+        List[str]: selected files
+    """
+    known = [p for p in paths if durations.get(p) is not None]
+    selected = set()
+    total = 0.0
+    for path in sorted(known, key=lambda p: durations[p]):  # type: ignore
+        if total + durations[path] > max_total_seconds:  # type: ignore
+            break
+        total += durations[path]  # type: ignore
+        selected.add(path)
+
+    return [p for p in paths if p in selected]
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"seconds = {SCRIPT_NAME}.probe_duration(path)"
+        + "\n"
+    )
+    logger.error(msg)
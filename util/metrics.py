@@ -0,0 +1,276 @@
+#!/usr/bin/python
+"""Run instrumentation utilities
+
+Named timing spans and counters, collected in a process wide registry
+(METRICS) and reported as:
+* a per phase breakdown table (profile)
+* a Prometheus textfile (node exporter textfile collector)
+* JSON
+
+Spans and counters take optional labels, ex: span("push", server="main")
+
+Raises:
+    ValueError: Invalid metric or label name
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+PROMETHEUS_PREFIX = "plex_prerolls"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_NAME_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+
+class SpanStats(NamedTuple):
+    calls: int
+    seconds: float
+    max_seconds: float
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Labels]:
+    if not _NAME_RE.match(name) or not all(_NAME_RE.match(k) for k in labels):
+        msg = f'Invalid metric name "{name}" or label names {sorted(labels)}'
+        logger.error(msg)
+        raise ValueError(msg)
+
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels: Labels) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def _prometheus_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = [
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _prometheus_value(value: float) -> str:
+    # full precision, "{:g}" would round large counters to 6 digits
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """Thread safe registry of timing spans and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[Tuple[str, Labels], SpanStats] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self.started = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def add_span(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record a finished span
+
+        Args:
+            name (str):         span name
+            seconds (float):    span duration
+            labels (Any):       optional labels, ex: server="main"
+        """
+        key = _key(name, labels)
+        with self._lock:
+            stats = self._spans.get(key, SpanStats(0, 0.0, 0.0))
+            self._spans[key] = SpanStats(
+                stats.calls + 1, stats.seconds + seconds, max(stats.max_seconds, seconds)
+            )
+
+    @contextmanager
+    def span(self, name: str, **labels: Any) -> Iterator[None]:
+        """Time the enclosed block as a named span, also when it raises
+
+        Args:
+            name (str):     span name
+            labels (Any):   optional labels, ex: server="main"
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - started, **labels)
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Increase a counter
+
+        Args:
+            name (str):             counter name
+            value (float, optional): amount to add [Default: 1]
+            labels (Any):           optional labels, ex: server="main"
+        """
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def spans(self) -> Dict[Tuple[str, Labels], SpanStats]:
+        with self._lock:
+            return dict(self._spans)
+
+    def counters(self) -> Dict[Tuple[str, Labels], float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def profile(self, total_seconds: float) -> str:
+        """Return a per span breakdown table
+
+        Args:
+            total_seconds (float): run duration, spans are shown as a share of it
+
+        Returns:
+            str: breakdown of spans and counters
+        """
+        lines: List[str] = [
+            f"{'span':<40} {'count':>7} {'total':>10} {'mean':>10} {'max':>10} {'run':>6}"
+        ]
+        spans = sorted(self.spans().items(), key=lambda i: i[1].seconds, reverse=True)
+        for (name, labels), s in spans:
+            label = f"{name}[{_label_text(labels)}]" if labels else name
+            share = 100 * s.seconds / total_seconds if total_seconds > 0 else 0.0
+            lines.append(
+                f"{label:<40} {s.calls:>7} {s.seconds:>9.4f}s {s.seconds / s.calls:>9.4f}s "
+                + f"{s.max_seconds:>9.4f}s {share:>5.1f}%"
+            )
+
+        counters = sorted(self.counters().items())
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<40} {'value':>7}")
+            for (name, labels), value in counters:
+                label = f"{name}[{_label_text(labels)}]" if labels else name
+                lines.append(f"{label:<40} {value:>7g}")
+
+        lines.append("")
+        lines.append(f"{'run':<40} {'':>7} {total_seconds:>9.4f}s")
+
+        return "\n".join(lines)
+
+    def as_dict(self, total_seconds: float) -> Dict[str, Any]:
+        """Return all metrics as JSON serializable data
+
+        Args:
+            total_seconds (float): run duration
+
+        Returns:
+            Dict[str, Any]: run info, spans and counters
+        """
+        return {
+            "started": self.started,
+            "run_seconds": total_seconds,
+            "spans": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": s.calls,
+                    "seconds": s.seconds,
+                    "max_seconds": s.max_seconds,
+                }
+                for (name, labels), s in sorted(self.spans().items())
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters().items())
+            ],
+        }
+
+    def prometheus_text(self, total_seconds: float) -> str:
+        """Return all metrics in the Prometheus text exposition format
+
+        Args:
+            total_seconds (float): run duration
+
+        Returns:
+            str: Prometheus textfile contents
+        """
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_run_seconds Duration of the last run",
+            f"# TYPE {p}_run_seconds gauge",
+            f"{p}_run_seconds {total_seconds:.6f}",
+            f"# HELP {p}_last_run_timestamp_seconds Start time of the last run",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {self.started:.3f}",
+        ]
+
+        spans = sorted(self.spans().items())
+        if spans:
+            lines += [
+                f"# HELP {p}_span_seconds Time spent per phase",
+                f"# TYPE {p}_span_seconds summary",
+            ]
+            for (name, labels), s in spans:
+                label = _prometheus_labels((("span", name),) + labels)
+                lines.append(f"{p}_span_seconds_sum{label} {s.seconds:.6f}")
+                lines.append(f"{p}_span_seconds_count{label} {s.calls}")
+            lines += [
+                f"# HELP {p}_span_max_seconds Longest single run of a phase",
+                f"# TYPE {p}_span_max_seconds gauge",
+            ]
+            for (name, labels), s in spans:
+                label = _prometheus_labels((("span", name),) + labels)
+                lines.append(f"{p}_span_max_seconds{label} {s.max_seconds:.6f}")
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters().items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total{_prometheus_labels(labels)} {_prometheus_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def dumps(self, path: str, total_seconds: float) -> bytes:
+        """Return the metrics file contents for a path, by extension
+        ".prom" files use the Prometheus format, anything else JSON
+
+        Args:
+            path (str):             path/to/metrics file
+            total_seconds (float):  run duration
+
+        Returns:
+            bytes: metrics file contents
+        """
+        if path.endswith(".prom"):
+            return self.prometheus_text(total_seconds).encode("utf8")
+
+        return json.dumps(self.as_dict(total_seconds), indent=2).encode("utf8")
+
+
+# process wide registry
+METRICS = Metrics()
+
+span = METRICS.span
+count = METRICS.count
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f'with {SCRIPT_NAME}.span("phase"): ...'
+        + "\n"
+    )
+    logger.error(msg)
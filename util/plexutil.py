@@ -6,19 +6,35 @@ Raises:
     KeyError: [description]
 """
 import logging
-import logging.config
 import os
 import sys
 from configparser import ConfigParser
-from typing import Dict, Optional
-
-from plexapi.server import CONFIG  # type: ignore
+from typing import Dict, List, NamedTuple, Optional
 
 logger = logging.getLogger(__name__)
 
 filename = os.path.basename(sys.argv[0])
 SCRIPT_NAME = os.path.splitext(filename)[0]
 
+SERVER_SECTION_PREFIX = "server:"
+
+
+class PlexServerConfig(NamedTuple):
+    name: str
+    url: str
+    token: str
+    schedule_file: Optional[str] = None
+
+
+def plexapi_config_path() -> str:
+    """Return the path of the PlexAPI config file (See: plexapi.CONFIG_PATH)
+
+    Returns:
+        str: $PLEXAPI_CONFIG_PATH or ~/.config/plexapi/config.ini
+    """
+    default_path = os.path.expanduser("~/.config/plexapi/config.ini")
+    return os.environ.get("PLEXAPI_CONFIG_PATH", default_path)
+
 
 def plex_config(config_file: Optional[str] = "") -> Dict[str, str]:
     """Return Plex Config paramaters for connection info {PLEX_URL, PLEX_TOKEN}\n
@@ -74,7 +90,14 @@ def plex_config(config_file: Optional[str] = "") -> Dict[str, str]:
             logger.error(msg)
             raise KeyError(msg)
 
-    if not use_local_config and len(CONFIG.sections()) > 0:  # type: ignore
+    # importing plexapi is slow (it reads its config and loads requests),
+    # skip it when there is no PlexAPI config file to read
+    if not use_local_config and os.path.exists(plexapi_config_path()):
+        from plexapi import CONFIG  # type: ignore
+    else:
+        CONFIG = None
+
+    if CONFIG is not None and len(CONFIG.sections()) > 0:  # type: ignore
         # use PlexAPI Default ~/.config/plexapi/config.ini OR from PLEXAPI_CONFIG_PATH
         # IF not manually set locally in local Config.ini above
         # See https://python-plexapi.readthedocs.io/en/latest/configuration.html
@@ -105,6 +128,67 @@ def plex_config(config_file: Optional[str] = "") -> Dict[str, str]:
     return cfg
 
 
+def plex_servers(config_file: Optional[str] = "") -> List[PlexServerConfig]:
+    """Return connection info for all Plex servers to update\n
+    Uses every [server:<name>] section of the config file, each with:\n
+    * server_baseurl, server_token (required)
+    * schedule_file (optional) path/to/schedule file used for that server only
+
+    Falls back to the single server of plex_config() if no [server:*] sections exist
+
+    Args:
+        config_file (str): path/to/config.ini style config file (INI Format)
+
+    Raises:
+        KeyError: Config Params not found in config file(s)
+        FileNotFoundError: Cannot find a config file
+
+    Returns:
+        list: List of PlexServerConfig {name, url, token, schedule_file}
+    """
+    servers: List[PlexServerConfig] = []
+
+    if config_file == None or config_file == "":
+        filename = "config.ini"
+    else:
+        filename = str(config_file)
+
+    local_config = ConfigParser()
+    local_config.read(filename)
+
+    for section in local_config.sections():
+        if not section.startswith(SERVER_SECTION_PREFIX):
+            continue
+
+        name = section[len(SERVER_SECTION_PREFIX) :].strip()
+        try:
+            server = local_config[section]
+            plex_url = server["server_baseurl"]
+            plex_token = server["server_token"]
+        except KeyError as e:
+            logger.error('Key Value not found in "[%s]" section', section, exc_info=e)
+            raise e
+
+        servers.append(
+            PlexServerConfig(
+                name=name,
+                url=plex_url,
+                token=plex_token,
+                schedule_file=server.get("schedule_file") or None,
+            )
+        )
+
+    if not servers:
+        cfg = plex_config(config_file)
+        servers.append(
+            PlexServerConfig(name="default", url=cfg["PLEX_URL"], token=cfg["PLEX_TOKEN"])
+        )
+
+    logger.debug("Using Plex servers: %s", [s.name for s in servers])
+
+    return servers
+
+
 def init_logger(log_config: str) -> None:
     """load and configure a program logger using a supplier logging configuration file \n
     if possible the program will attempt to create log folders if not already existing
@@ -118,6 +202,8 @@ def init_logger(log_config: str) -> None:
     """
 
     if os.path.exists(log_config):
+        import logging.config
+
         try:
             logging.config.fileConfig(log_config, disable_existing_loggers=False)
         except FileNotFoundError as e_fnf:
@@ -0,0 +1,350 @@
+#!/usr/bin/python
+"""Resilient Plex pushes: timeouts, retries with jittered backoff, circuit breaker
+
+* Timeouts: connect and read timeouts applied to every request of a session,
+  whatever timeout the caller (plexapi) passes (See: pooled_adapter)
+* RetryPolicy: attempts of an idempotent call, failed attempts retried after
+  an exponential backoff with full jitter (random 0 to backoff * 2^n seconds),
+  so servers restarting together are not hit in lockstep
+* CircuitBreaker: servers failing push after push are skipped for a cool-down,
+  doubling while they keep failing, its state kept in a key/value store (the
+  pushed state cache) so separate runs (cron) share it
+
+requests is only imported when a session adapter is built.
+
+Raises:
+    ValueError: Invalid timeouts
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limited, server errors and unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# plexapi errors start with the HTTP status, ex: "(503) service_unavailable; http://..."
+STATUS_PATTERN = re.compile(r"^\((\d{3})\)")
+
+
+class Timeouts(NamedTuple):
+    connect: float = 5.0
+    read: float = 30.0
+
+
+class RetryPolicy(NamedTuple):
+    # attempts in total, 1 for no retries
+    attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 10.0
+
+    def delay(self, retry: int, rng: Any = random) -> float:
+        """Return the wait before a retry, full jitter
+
+        Args:
+            retry (int):                retry number, 0 for the first retry
+            rng (Random, optional):     random source [Default: random module]
+
+        Returns:
+            float: seconds, random between 0 and min(max_backoff, backoff * 2^retry)
+        """
+        return rng.uniform(0, min(self.max_backoff, self.backoff * 2**retry))
+
+
+class Attempt(NamedTuple):
+    seconds: float
+    error: Optional[str] = None
+
+
+def parse_timeouts(value: str) -> Timeouts:
+    """Return the timeouts of a SECONDS or CONNECT,READ value
+
+    Args:
+        value (str): ex: 30 (read, default connect) or 5,30
+
+    Raises:
+        ValueError: Invalid timeouts
+
+    Returns:
+        Timeouts: connect and read timeouts
+    """
+    parts = [p.strip() for p in str(value).split(",")]
+    try:
+        numbers = [float(p) for p in parts]
+        if len(numbers) not in (1, 2) or min(numbers) <= 0:
+            raise ValueError(value)
+    except ValueError as e:
+        msg = f'Invalid timeout "{value}", expected SECONDS or CONNECT,READ seconds over 0'
+        logger.error(msg)
+        raise ValueError(msg) from e
+
+    if len(numbers) == 1:
+        return Timeouts(read=numbers[0])
+    return Timeouts(numbers[0], numbers[1])
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether a failed request may succeed if sent again
+    Connection errors, timeouts and HTTP 429/5xx are, other HTTP errors are not
+
+    Args:
+        error (BaseException): request error
+
+    Returns:
+        bool: retry the request
+    """
+    match = STATUS_PATTERN.match(str(error))
+    if match:
+        return int(match.group(1)) in RETRY_STATUSES
+
+    if "requests" in sys.modules:
+        import requests
+
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code in RETRY_STATUSES
+        if isinstance(error, requests.RequestException):
+            return True
+
+    # socket level errors, also raised outside of requests
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class RetryError(Exception):
+    """Last error of a call, with every attempt made"""
+
+    def __init__(self, error: BaseException, attempts: List[Attempt]):
+        super().__init__(str(error))
+        self.error = error
+        self.attempts = attempts
+
+
+def call_with_retry(
+    func: Callable[[], T],
+    policy: RetryPolicy,
+    retryable: Callable[[BaseException], bool] = is_retryable,
+    before_retry: Optional[Callable[[BaseException], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+    rng: Any = random,
+) -> Tuple[T, List[Attempt]]:
+    """Call an idempotent function, retrying retryable errors with jittered backoff
+
+    Args:
+        func (Callable[[], T]):                 call to make
+        policy (RetryPolicy):                   attempts and backoff
+        retryable (Callable, optional):         error -> retry it [Default: is_retryable]
+        before_retry (Callable, optional):      called with the error before each retry,
+                                                ex: to drop a connection [Default: None]
+        sleep (Callable, optional):             waits the backoff [Default: time.sleep]
+        rng (Random, optional):                 backoff jitter source [Default: random module]
+
+    Raises:
+        RetryError: Every attempt failed, or a non retryable error
+
+    Returns:
+        Tuple[T, List[Attempt]]: result and every attempt made
+    """
+    attempts: List[Attempt] = []
+    while True:
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            attempts.append(Attempt(time.perf_counter() - started, str(e)))
+            if len(attempts) >= policy.attempts or not retryable(e):
+                raise RetryError(e, attempts) from e
+            wait = policy.delay(len(attempts) - 1, rng)
+            logger.debug("Attempt %s failed (%s), retrying in %.2fs", len(attempts), e, wait)
+            if before_retry is not None:
+                before_retry(e)
+            sleep(wait)
+            continue
+
+        attempts.append(Attempt(time.perf_counter() - started))
+        return result, attempts
+
+
+class CircuitBreaker:
+    """Skips servers after consecutive failed pushes, until a cool-down passes
+
+    After threshold failures in a row, the circuit of a server opens for
+    cooldown seconds. Once they pass, one push is tried again: success
+    closes the circuit, failure opens it again for twice as long (up to
+    max_cooldown). Failures are counted per push, retries included.
+
+    The state is kept in a store with get/set/pop (ex: cacheutil.JsonCache),
+    under "breaker|" + the server key, or in memory without a store.
+    """
+
+    def __init__(
+        self,
+        store: Any = None,
+        threshold: int = 3,
+        cooldown: float = 300.0,
+        max_cooldown: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            store (Any, optional):          key/value store, None for memory [Default: None]
+            threshold (int, optional):      failures in a row opening the circuit [Default: 3]
+            cooldown (float, optional):     seconds skipped once open, 0 to disable
+                                            [Default: 300]
+            max_cooldown (float, optional): longest cool-down [Default: 3600]
+            clock (Callable, optional):     current time in seconds [Default: time.time]
+        """
+        self.store = store
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self._memory: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Dict[str, Any]:
+        key = f"breaker|{key}"
+        found = self.store.get(key) if self.store is not None else self._memory.get(key)
+        return found if isinstance(found, dict) else {}
+
+    def _set(self, key: str, value: Dict[str, Any]) -> None:
+        key = f"breaker|{key}"
+        if self.store is not None:
+            self.store.set(key, value)
+        else:
+            self._memory[key] = value
+
+    def _pop(self, key: str) -> None:
+        key = f"breaker|{key}"
+        if self.store is not None:
+            self.store.pop(key)
+        else:
+            self._memory.pop(key, None)
+
+    def open_until(self, key: str) -> Optional[float]:
+        """Return until when a server is skipped
+
+        Args:
+            key (str): server key
+
+        Returns:
+            float: time in seconds (See: clock), None if the circuit is closed
+        """
+        if self.cooldown <= 0:
+            return None
+        with self._lock:
+            until = self._get(key).get("open_until")
+        if until is None or until <= self.clock():
+            return None
+        return float(until)
+
+    def success(self, key: str) -> None:
+        """Record a successful push, closing the circuit
+
+        Args:
+            key (str): server key
+        """
+        with self._lock:
+            found = self._get(key)
+            if found.get("open_until") is not None:
+                logger.info('Circuit closed: "%s" is answering again', key)
+            if found:
+                self._pop(key)
+
+    def failure(self, key: str) -> Optional[float]:
+        """Record a failed push, opening the circuit after threshold failures in a row
+
+        Args:
+            key (str): server key
+
+        Returns:
+            float: until when the server is skipped, None if the circuit stays closed
+        """
+        if self.cooldown <= 0:
+            return None
+        with self._lock:
+            failures = int(self._get(key).get("failures", 0)) + 1
+            state: Dict[str, Any] = {"failures": failures}
+            if failures >= self.threshold:
+                cooldown = min(self.max_cooldown, self.cooldown * 2 ** (failures - self.threshold))
+                state["open_until"] = self.clock() + cooldown
+                logger.warning(
+                    'Circuit open: "%s" failed %s pushes in a row, skipping it for %.0fs',
+                    key,
+                    failures,
+                    cooldown,
+                )
+            self._set(key, state)
+
+        return state.get("open_until")
+
+
+@lru_cache(maxsize=None)
+def _adapter_class() -> Any:
+    from requests.adapters import HTTPAdapter
+
+    class TimeoutHTTPAdapter(HTTPAdapter):
+        # connect/read timeouts of every request, over the timeout passed by the caller
+        def __init__(self, timeouts: Timeouts, **kwargs: Any):
+            self.timeouts = timeouts
+            super().__init__(**kwargs)
+
+        def send(
+            self,
+            request: Any,
+            stream: bool = False,
+            timeout: Any = None,
+            verify: Any = True,
+            cert: Any = None,
+            proxies: Any = None,
+        ) -> Any:
+            return super().send(
+                request,
+                stream=stream,
+                timeout=(self.timeouts.connect, self.timeouts.read),
+                verify=verify,
+                cert=cert,
+                proxies=proxies,
+            )
+
+    return TimeoutHTTPAdapter
+
+
+def pooled_adapter(
+    timeouts: Timeouts = Timeouts(), pool_connections: int = 64, pool_maxsize: int = 4
+) -> Any:
+    """Return a requests adapter with timeouts and a connection pool per server
+
+    Args:
+        timeouts (Timeouts, optional):      connect/read timeouts [Default: 5s, 30s]
+        pool_connections (int, optional):   servers (host:port) whose connections are kept
+                                            [Default: 64]
+        pool_maxsize (int, optional):       connections kept per server [Default: 4]
+
+    Returns:
+        requests.adapters.HTTPAdapter: adapter, to mount on http:// and https://
+    """
+    # retries are made by call_with_retry, over whole idempotent pushes
+    return _adapter_class()(
+        timeouts, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0
+    )
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"result, attempts = {SCRIPT_NAME}.call_with_retry(push, {SCRIPT_NAME}.RetryPolicy())"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,341 @@
+#!/usr/bin/python
+"""Local HTTP query service: which Pre-Rolls a server uses at a given time
+
+Answers JSON over HTTP, from schedules kept compiled in memory by a backend
+(See: schedule_preroll.ScheduleQueries):
+* GET /listing?server=NAME&at=DATETIME : listing at a point in time [Default: now]
+* GET /timeline?server=NAME&from=DATETIME&to=DATETIME&step=1h : listing changes in a range
+* GET /validate?server=NAME : validation errors of the server's schedule file
+* POST /validate : validation errors of the schedule file (YAML) in the request body
+* GET / : servers, schedule files and cache statistics
+
+Datetimes are ISO 8601 (YYYY-MM-DD, YYYY-MM-DDTHH:MM[:SS]), dates meaning
+midnight. Without a server, the default schedule file is used.
+
+Answers are kept in an LRU cache, keyed by the request and the version of
+the schedule (its file signature), so edits are picked up on the next
+request without clearing the cache.
+
+Raises:
+    ValueError: Invalid service address
+    OSError: Unable to listen on the address
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+DEFAULT_HOST = "127.0.0.1"
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread safe least recently used cache of encoded answers"""
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        Args:
+            maxsize (int, optional): most answers kept, 0 to disable [Default: 4096]
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return a cached answer, None if not cached
+
+        Args:
+            key (Hashable): request key
+
+        Returns:
+            bytes: cached answer, or None
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        """Cache an answer, dropping the least recently used ones over maxsize
+
+        Args:
+            key (Hashable): request key
+            value (bytes):  answer
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache size, hits and misses
+
+        Returns:
+            Dict[str, int]: size, maxsize, hits, misses
+        """
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """Return the host and port of a [HOST:]PORT service address
+
+    Args:
+        value (str): address, ex: 8080, 0.0.0.0:8080
+
+    Raises:
+        ValueError: Invalid address
+
+    Returns:
+        Tuple[str, int]: (host, port), host defaulting to 127.0.0.1
+    """
+    host, _, port = str(value).rpartition(":")
+    try:
+        number = int(port)
+        if not 0 <= number <= 65535:
+            raise ValueError(port)
+    except ValueError as e:
+        msg = f'Invalid service address "{value}", expected [HOST:]PORT'
+        logger.error(msg)
+        raise ValueError(msg) from e
+
+    return host.strip("[]") or DEFAULT_HOST, number
+
+
+def parse_datetime(value: str, name: str) -> datetime:
+    """Return the datetime of an ISO 8601 query parameter
+
+    Args:
+        value (str):    YYYY-MM-DD or YYYY-MM-DDTHH:MM[:SS] (a space may replace the T)
+        name (str):     parameter name, for the error message
+
+    Raises:
+        ValueError: Invalid datetime
+
+    Returns:
+        datetime: parsed datetime, midnight for dates
+    """
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError as e:
+        raise ValueError(
+            f'Invalid "{name}" datetime "{value}", expected YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS'
+        ) from e
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server: "QueryService"
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, dont wait for the ACK of the headers
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        status, body = self.server.answer("GET", url.path, dict(parse_qsl(url.query)))
+        self.respond(status, body)
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.respond(413, error_body(f"Request body over {MAX_BODY_BYTES} bytes"))
+            return
+
+        data = self.rfile.read(length) if length else b""
+        status, body = self.server.answer("POST", url.path, dict(parse_qsl(url.query)), data)
+        self.respond(status, body)
+
+    def respond(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def error_body(message: str) -> bytes:
+    return json.dumps({"error": message}).encode("utf8")
+
+
+class QueryService(ThreadingHTTPServer):
+    """HTTP service answering listing, timeline and validation queries from a backend
+
+    The backend provides:
+    * servers() -> Dict[str, str]: server name -> schedule file
+    * version(server) -> Hashable: current version of the server's schedule, reloading
+      it if its file changed
+    * listing(server, at: datetime) -> Dict[str, Any]
+    * timeline(server, start: datetime, end: datetime, step: str) -> Dict[str, Any]
+    * validate(server) -> Dict[str, Any]
+    * validate_document(data: bytes) -> Dict[str, Any]
+
+    with server None for the default schedule file. Backends raise KeyError for
+    unknown servers (404) and ValueError for invalid parameters (400).
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        backend: Any,
+        host: str = DEFAULT_HOST,
+        port: int = 0,
+        cache_size: int = 4096,
+        max_timeline_days: int = 3660,
+    ):
+        """Create the service, listening but not serving yet (See: start, serve_forever)
+
+        Args:
+            backend (Any):                      answers the queries (See: QueryService)
+            host (str, optional):               address to listen on [Default: 127.0.0.1]
+            port (int, optional):               port to listen on, 0 for any free port
+                                                [Default: 0]
+            cache_size (int, optional):         answers kept in the LRU cache [Default: 4096]
+            max_timeline_days (int, optional):  longest timeline range [Default: 3660]
+
+        Raises:
+            OSError: Unable to listen on the address
+        """
+        super().__init__((host, port), QueryHandler)
+        self.backend = backend
+        self.cache = LRUCache(cache_size)
+        self.max_timeline = timedelta(days=max_timeline_days)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode("utf8")
+        return f"http://{host}:{port}"
+
+    def answer(
+        self, method: str, path: str, params: Dict[str, str], data: bytes = b""
+    ) -> Tuple[int, bytes]:
+        """Return the answer to a request, from the cache when possible
+
+        Args:
+            method (str):               HTTP method
+            path (str):                 request path, ex: /listing
+            params (Dict[str, str]):    query parameters
+            data (bytes, optional):     request body [Default: none]
+
+        Returns:
+            Tuple[int, bytes]: HTTP status and JSON body
+        """
+        route = path.rstrip("/") or "/"
+        server = params.get("server") or None
+        try:
+            if method == "POST" and route == "/validate":
+                return 200, self.encode(self.backend.validate_document(data))
+            if method != "GET":
+                return 405, error_body(f"Method {method} not allowed on {route}")
+
+            if route == "/":
+                return 200, self.encode(
+                    {"servers": self.backend.servers(), "cache": self.cache.stats()}
+                )
+            if route == "/listing":
+                at = params.get("at")
+                # now, to the second, so repeated "now" queries are cached
+                query: Tuple[Any, ...] = (
+                    parse_datetime(at, "at") if at else datetime.now().replace(microsecond=0),
+                )
+                answer = self.backend.listing
+            elif route == "/timeline":
+                if not params.get("from") or not params.get("to"):
+                    raise ValueError('"from" and "to" datetimes are required')
+                start = parse_datetime(params["from"], "from")
+                end = parse_datetime(params["to"], "to")
+                if end - start > self.max_timeline:
+                    raise ValueError(
+                        f"Timeline ranges are limited to {self.max_timeline.days} days"
+                    )
+                query = (start, end, params.get("step") or "1h")
+                answer = self.backend.timeline
+            elif route == "/validate":
+                query = ()
+                answer = self.backend.validate
+            else:
+                return 404, error_body(f"Unknown path {route}")
+
+            key = (route, server, query, self.backend.version(server))
+            body = self.cache.get(key)
+            if body is None:
+                body = self.encode(answer(server, *query))
+                self.cache.put(key, body)
+            return 200, body
+        except KeyError as e:
+            return 404, error_body(str(e.args[0]) if e.args else "Not found")
+        except ValueError as e:
+            return 400, error_body(str(e))
+        except Exception as e:
+            logger.error("Unable to answer %s %s", method, path, exc_info=e)
+            return 500, error_body(str(e))
+
+    @staticmethod
+    def encode(answer: Dict[str, Any]) -> bytes:
+        return json.dumps(answer, default=str).encode("utf8")
+
+    def start(self) -> "QueryService":
+        """Serve requests from a background thread
+
+        Returns:
+            QueryService: self
+        """
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="query-service", daemon=True
+        )
+        self._thread.start()
+        logger.info("Query service listening on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket"""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"service = {SCRIPT_NAME}.QueryService(backend, port=8080)"
+        + "\n"
+        + "service.serve_forever()"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,203 @@
+#!/usr/bin/python
+"""Recurrence rules for schedule date ranges, compiled to per-year day bitmaps
+
+A rule selects whole days, with all of its conditions having to match:
+* weekdays: days of the week, ex: [fri, sat]
+* months: months of the year, ex: [oct]
+* nth_weekday: nth weekday of the month, ex: {nth: 4, weekday: thu}
+  (negative nth counts from the end of the month, -1 being the last)
+* every_n_days: every N days, counted from an anchor date (default 1970-01-01),
+  days before the anchor never match
+* except: dates never matching, YYYY-MM-DD or xxxx-MM-DD (every year)
+
+Each rule is compiled once per year into a 366 bit integer (bit 0 being
+January 1st), checking if a day matches is a single bit test.
+
+Raises:
+    ValueError: Invalid rule values
+"""
+import logging
+import os
+import sys
+from calendar import isleap, monthrange
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+DEFAULT_ANCHOR = date(1970, 1, 1)
+
+
+class RecurrenceRule(NamedTuple):
+    path: str
+    force: bool = False
+    priority: int = 0
+    # 0 = Monday (date.weekday)
+    weekdays: Tuple[int, ...] = ()
+    months: Tuple[int, ...] = ()
+    # (nth, weekday)
+    nth_weekday: Optional[Tuple[int, int]] = None
+    every_n_days: Optional[int] = None
+    anchor: date = DEFAULT_ANCHOR
+    # (year, month, day), year None for every year
+    exceptions: Tuple[Tuple[Optional[int], int, int], ...] = ()
+
+
+def _name_index(value: Any, names: list, field: str) -> int:
+    try:
+        return names.index(str(value).lower()[:3])
+    except ValueError as e:
+        msg = f'Unknown {field} "{value}", expected one of: {", ".join(names)}'
+        logger.error(msg)
+        raise ValueError(msg) from e
+
+
+def _exception_date(value: Any) -> Tuple[Optional[int], int, int]:
+    if isinstance(value, date):
+        return (value.year, value.month, value.day)
+
+    try:
+        year, month, day = str(value).lower().split("-")
+        return (None if year == "xxxx" else int(year), int(month), int(day))
+    except ValueError as e:
+        msg = f'Invalid except date "{value}", expected YYYY-MM-DD or xxxx-MM-DD'
+        logger.error(msg)
+        raise ValueError(msg) from e
+
+
+def parse_rule(rule: Dict[str, Any]) -> RecurrenceRule:
+    """Return the RecurrenceRule of a schedule file rule
+
+    Args:
+        rule (Dict[str, Any]): rule {path, force, priority, weekdays, months, nth_weekday,
+                               every_n_days, anchor, except}
+
+    Raises:
+        KeyError: rule without a path
+        ValueError: invalid rule values
+
+    Returns:
+        RecurrenceRule: parsed rule
+    """
+    nth_weekday = None
+    if rule.get("nth_weekday"):
+        nth = int(rule["nth_weekday"]["nth"])
+        if nth == 0 or not -5 <= nth <= 5:
+            msg = f'nth_weekday "nth" must be 1 to 5 or -1 to -5, not {nth}'
+            logger.error(msg)
+            raise ValueError(msg)
+        nth_weekday = (nth, _name_index(rule["nth_weekday"]["weekday"], WEEKDAYS, "weekday"))
+
+    every_n_days = rule.get("every_n_days")
+    if every_n_days is not None and int(every_n_days) < 1:
+        msg = f"every_n_days must be 1 or more, not {every_n_days}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    anchor = rule.get("anchor") or DEFAULT_ANCHOR
+    if isinstance(anchor, datetime):
+        anchor = anchor.date()
+    elif not isinstance(anchor, date):
+        try:
+            anchor = date.fromisoformat(str(anchor))
+        except ValueError as e:
+            msg = f'Invalid anchor date "{anchor}", expected YYYY-MM-DD'
+            logger.error(msg)
+            raise ValueError(msg) from e
+
+    return RecurrenceRule(
+        path=str(rule["path"]),
+        force=bool(rule.get("force") or False),
+        priority=int(rule.get("priority") or 0),
+        weekdays=tuple(
+            sorted({_name_index(d, WEEKDAYS, "weekday") for d in rule.get("weekdays") or []})
+        ),
+        months=tuple(
+            sorted({_name_index(m, MONTHS, "month") + 1 for m in rule.get("months") or []})
+        ),
+        nth_weekday=nth_weekday,
+        every_n_days=int(every_n_days) if every_n_days is not None else None,
+        anchor=anchor,
+        exceptions=tuple(_exception_date(d) for d in rule.get("except") or []),
+    )
+
+
+@lru_cache(maxsize=4096)
+def year_mask(rule: RecurrenceRule, year: int) -> int:
+    """Return the days of a year matching a rule, as a bitmap (cached per rule and year)
+
+    Args:
+        rule (RecurrenceRule):  rule to compile
+        year (int):             year to compile for
+
+    Returns:
+        int: bit n set when day n + 1 of the year matches (bit 0 = January 1st)
+    """
+    mask = 0
+    first = date(year, 1, 1).toordinal()
+    anchor = rule.anchor.toordinal()
+    months = rule.months or range(1, 13)
+
+    for month in months:
+        first_weekday, days = monthrange(year, month)
+        month_start = date(year, month, 1).toordinal()
+        for day in range(1, days + 1):
+            weekday = (first_weekday + day - 1) % 7
+            if rule.weekdays and weekday not in rule.weekdays:
+                continue
+            if rule.nth_weekday is not None:
+                nth, nth_day = rule.nth_weekday
+                if weekday != nth_day:
+                    continue
+                # 1st: days 1-7, 2nd: 8-14 ... last (-1): the final 7 days
+                week = (day - 1) // 7 + 1 if nth > 0 else -((days - day) // 7 + 1)
+                if week != nth:
+                    continue
+            ordinal = month_start + day - 1
+            if rule.every_n_days is not None:
+                if ordinal < anchor or (ordinal - anchor) % rule.every_n_days:
+                    continue
+            mask |= 1 << (ordinal - first)
+
+    for except_year, month, day in rule.exceptions:
+        if except_year not in (None, year) or (month == 2 and day == 29 and not isleap(year)):
+            continue
+        try:
+            mask &= ~(1 << (date(year, month, day).toordinal() - first))
+        except ValueError:
+            logger.debug("Ignoring invalid except date %s-%s-%s", except_year, month, day)
+
+    return mask
+
+
+def matches(rule: RecurrenceRule, day: date) -> bool:
+    """Return if a rule selects a day
+
+    Args:
+        rule (RecurrenceRule):  rule to check
+        day (date):             day to check
+
+    Returns:
+        bool: True if the day matches
+    """
+    return bool(year_mask(rule, day.year) >> (day.timetuple().tm_yday - 1) & 1)
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f'rule = {SCRIPT_NAME}.parse_rule({{"path": path, "weekdays": ["fri"], "months": ["oct"]}})'
+        + "\n"
+        + f"{SCRIPT_NAME}.matches(rule, date.today())"
+        + "\n"
+    )
+    logger.error(msg)
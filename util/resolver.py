@@ -0,0 +1,358 @@
+#!/usr/bin/python
+"""Priority layer resolution of active schedule entries
+
+Active entries are grouped into layers by their type (schedule section).
+Layers are walked by priority, highest first:
+* additive layers always contribute their entries
+* the first exclusive layer with entries contributes them, and suppresses
+  every lower priority exclusive layer
+
+Within a layer, forced entries are always kept, and the best non-forced
+entry is kept unless a forced entry beats it. Entries compare by:
+1. entry priority, highest first
+2. duration, narrowest first
+3. start, most recent first
+4. path
+which makes the result independent of the order of the active entries.
+
+The default layers match the fixed precedence of the schedule sections:
+misc (additive), then date_range > weekly > monthly > default (exclusive)
+
+A layer may cap the paths it contributes (max_paths). Its pool, the paths
+of its resolved entries (folders and glob patterns expanded when an expand
+function is given), is put in a fixed order by hash of each path, and every
+period (day, week or month) takes the next window of max_paths paths, so the
+whole pool is pushed over ceil(pool / max_paths) periods. Groups played
+together ("a,b") count as one path.
+
+Raises:
+    ValueError: Unknown layer mode or rotation, invalid max_paths
+"""
+import hashlib
+import logging
+import os
+import sys
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+EXCLUSIVE = "exclusive"
+ADDITIVE = "additive"
+MODES = [EXCLUSIVE, ADDITIVE]
+
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+ROTATIONS = [DAILY, WEEKLY, MONTHLY]
+
+
+class Layer(NamedTuple):
+    name: str
+    priority: int
+    mode: str = EXCLUSIVE
+    # most paths contributed per rotation period, None for all of them
+    max_paths: Optional[int] = None
+    rotate: str = DAILY
+
+
+DEFAULT_LAYERS: Tuple[Layer, ...] = (
+    Layer("misc", 50, ADDITIVE),
+    Layer("date_range", 40),
+    Layer("weekly", 30),
+    Layer("monthly", 20),
+    Layer("default", 10),
+)
+
+
+def layers_from_config(config: Dict[str, Dict[str, Any]]) -> Tuple[Layer, ...]:
+    """Return the default layers with the priority/mode/max_paths/rotate of sections overridden
+
+    Args:
+        config (Dict[str, Dict[str, Any]]): section name -> {priority, mode, max_paths, rotate},
+                                            all optional
+
+    Raises:
+        ValueError: Unknown layer mode or rotation, invalid max_paths
+
+    Returns:
+        Tuple[Layer, ...]: layers, highest priority first
+    """
+    layers = []
+    for layer in DEFAULT_LAYERS:
+        section = config.get(layer.name) or {}
+        priority = section.get("priority")
+        mode = section.get("mode") or layer.mode
+        if mode not in MODES:
+            msg = f'Unknown mode "{mode}" for "{layer.name}", expected one of: {", ".join(MODES)}'
+            logger.error(msg)
+            raise ValueError(msg)
+        max_paths = section.get("max_paths")
+        if max_paths is not None and (not isinstance(max_paths, int) or max_paths < 1):
+            msg = f'Invalid max_paths "{max_paths}" for "{layer.name}", expected a number over 0'
+            logger.error(msg)
+            raise ValueError(msg)
+        rotate = section.get("rotate") or layer.rotate
+        if rotate not in ROTATIONS:
+            msg = (
+                f'Unknown rotate "{rotate}" for "{layer.name}", '
+                + f'expected one of: {", ".join(ROTATIONS)}'
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+        layers.append(
+            Layer(
+                layer.name,
+                layer.priority if priority is None else priority,
+                mode,
+                max_paths,
+                rotate,
+            )
+        )
+
+    return sort_layers(layers)
+
+
+def sort_layers(layers: Iterable[Layer]) -> Tuple[Layer, ...]:
+    """Return layers highest priority first, ties in default precedence order
+
+    Args:
+        layers (Iterable[Layer]): layers to sort
+
+    Returns:
+        Tuple[Layer, ...]: sorted layers
+    """
+    default_order = {layer.name: i for i, layer in enumerate(DEFAULT_LAYERS)}
+    return tuple(
+        sorted(
+            layers,
+            key=lambda layer: (-layer.priority, default_order.get(layer.name, 0), layer.name),
+        )
+    )
+
+
+def _datetime(value: Any, lowtime: bool) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time() if lowtime else datetime.max.time())
+    return value
+
+
+def entry_key(entry: Any) -> Tuple[Any, ...]:
+    """Return the sort key of an entry within its layer, best first
+
+    Args:
+        entry (Any): schedule entry (type, startdate, enddate, force, path, priority)
+
+    Returns:
+        Tuple[Any, ...]: (-priority, duration, -start, path)
+    """
+    start = _datetime(entry.startdate, lowtime=True)
+    end = _datetime(entry.enddate, lowtime=False)
+    return (
+        -getattr(entry, "priority", 0),
+        end - start,
+        datetime.max - start,
+        str(entry.path),
+    )
+
+
+def layer_entries(entries: Sequence[Any]) -> List[Any]:
+    """Return the entries of a layer that apply, best first
+    Forced entries are kept, the best non-forced entry unless a forced entry beats it
+
+    Args:
+        entries (Sequence[Any]): active entries of one layer
+
+    Returns:
+        List[Any]: kept entries
+    """
+    keyed = sorted(((entry_key(e), i) for i, e in enumerate(entries)))
+
+    kept: List[Any] = []
+    winner_found = False
+    for _, i in keyed:
+        entry = entries[i]
+        if entry.force:
+            kept.append(entry)
+        elif not winner_found:
+            winner_found = True
+            if not kept:
+                kept.append(entry)
+
+    return kept
+
+
+def resolve(active: Iterable[Any], layers: Optional[Sequence[Layer]] = None) -> List[Any]:
+    """Return the entries making up the listing, in listing order
+
+    Args:
+        active (Iterable[Any]):             active schedule entries, in any order
+        layers (Sequence[Layer], optional): layer precedence [Default: DEFAULT_LAYERS]
+
+    Returns:
+        List[Any]: resolved entries, by layer priority then best first within a layer
+    """
+    by_layer: Dict[str, List[Any]] = {}
+    for entry in active:
+        by_layer.setdefault(entry.type, []).append(entry)
+
+    resolved: List[Any] = []
+    exclusive_found = False
+    for layer in sort_layers(layers or DEFAULT_LAYERS):
+        entries = by_layer.get(layer.name)
+        if not entries:
+            continue
+        if layer.mode == EXCLUSIVE:
+            if exclusive_found:
+                continue
+            exclusive_found = True
+        resolved.extend(layer_entries(entries))
+
+    return resolved
+
+
+def rotation_period(day: date, rotate: str) -> int:
+    """Return the number of the rotation period of a day, consecutive periods differ by one
+
+    Args:
+        day (date): day (or datetime)
+        rotate (str): daily, weekly (Monday to Sunday) or monthly
+
+    Returns:
+        int: period number
+    """
+    if rotate == MONTHLY:
+        return day.year * 12 + day.month - 1
+    ordinal = day.toordinal()
+    # ordinal 1 (0001-01-01) is a Monday
+    return (ordinal - 1) // 7 if rotate == WEEKLY else ordinal
+
+
+def rotation_key(layers: Optional[Sequence[Layer]], day: date) -> Tuple[int, ...]:
+    """Return the rotation periods of the capped layers on a day
+    The listing of capped layers may only change when the key changes
+
+    Args:
+        layers (Sequence[Layer], optional): layers [Default: DEFAULT_LAYERS]
+        day (date): day (or datetime)
+
+    Returns:
+        Tuple[int, ...]: period numbers, empty without capped layers
+    """
+    return tuple(
+        rotation_period(day, layer.rotate) for layer in layers or DEFAULT_LAYERS if layer.max_paths
+    )
+
+
+def _path_order(path: str) -> bytes:
+    return hashlib.sha1(path.encode("utf8")).digest()
+
+
+def rotate_paths(paths: Sequence[str], max_paths: int, period: int) -> List[str]:
+    """Return the window of a pool of paths for a rotation period
+    The pool is ordered by hash of each path, so adding or removing a file only moves
+    the paths after it, and consecutive periods take consecutive windows (wrapping)
+
+    Args:
+        paths (Sequence[str]):  pool of paths, without duplicates
+        max_paths (int):        paths per period
+        period (int):           period number (See: rotation_period)
+
+    Returns:
+        List[str]: at most max_paths paths, in pool order
+    """
+    if len(paths) <= max_paths:
+        return list(paths)
+
+    pool = sorted(paths, key=_path_order)
+    first = (period * max_paths) % len(pool)
+    window = pool[first : first + max_paths]
+    return window + pool[: max_paths - len(window)]
+
+
+def path_units(path: str, expand: Optional[Callable[[str], List[str]]] = None) -> List[str]:
+    """Return the rotation units of an entry path: its ";" separated paths
+    Groups played together ("a,b") stay whole, other paths are expanded
+
+    Args:
+        path (str):                     entry path, Plex listing style (;|,)
+        expand (Callable, optional):    path -> files, ex: DirIndex.expand [Default: None]
+
+    Returns:
+        List[str]: units
+    """
+    units: List[str] = []
+    for item in path.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        if "," in item or expand is None:
+            units.append(item)
+        else:
+            units.extend(expand(item))
+
+    return units
+
+
+def layer_paths(
+    resolved: Iterable[Any],
+    layers: Optional[Sequence[Layer]],
+    day: date,
+    expand: Optional[Callable[[str], List[str]]] = None,
+) -> List[str]:
+    """Return the listing paths of resolved entries, capped layers rotated
+    A capped layer contributes its rotation window where its first entry was
+
+    Args:
+        resolved (Iterable[Any]):           resolved entries, in listing order (See: resolve)
+        layers (Sequence[Layer], optional): layers [Default: DEFAULT_LAYERS]
+        day (date):                         day (or datetime) selecting the rotation period
+        expand (Callable, optional):        path -> files, for the pools of capped layers
+                                            [Default: None, paths counted as written]
+
+    Returns:
+        List[str]: entry paths and rotation windows, in listing order
+    """
+    capped = {layer.name: layer for layer in layers or DEFAULT_LAYERS if layer.max_paths}
+
+    slots: List[Tuple[Optional[Layer], str]] = []
+    pools: Dict[str, Dict[str, None]] = {}
+    for entry in resolved:
+        layer = capped.get(entry.type)
+        if layer is None:
+            slots.append((None, entry.path))
+            continue
+        if layer.name not in pools:
+            pools[layer.name] = {}
+            slots.append((layer, ""))
+        pools[layer.name].update(dict.fromkeys(path_units(entry.path, expand)))
+
+    paths: List[str] = []
+    for layer, path in slots:
+        if layer is None:
+            paths.append(path)
+            continue
+        pool = list(pools[layer.name])
+        window = rotate_paths(
+            pool, layer.max_paths or len(pool), rotation_period(day, layer.rotate)
+        )
+        logger.debug('Rotating "%s": %s of %s paths', layer.name, len(window), len(pool))
+        paths.extend(window)
+
+    return paths
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"entries = {SCRIPT_NAME}.resolve(active_entries, {SCRIPT_NAME}.DEFAULT_LAYERS)"
+        + "\n"
+    )
+    logger.error(msg)
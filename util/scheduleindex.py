@@ -0,0 +1,215 @@
+#!/usr/bin/python
+"""Interval index utilities for fast schedule lookups
+
+A static centered interval tree built once over closed [start, end] ranges.
+Answers "which ranges contain point T" in O(log n + k)
+
+A sweep-line helper walks many ascending points across the sorted
+start/end boundaries in one pass, for batch (simulation) style queries
+
+Raises:
+    ValueError: Interval with an end before its start
+"""
+
+import logging
+import os
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+Interval = Tuple[Any, Any]
+
+
+class _Node(NamedTuple):
+    center: Any
+    left: Optional["_Node"]
+    right: Optional["_Node"]
+    # intervals overlapping center, sorted by start (asc) / end (asc)
+    starts: List[Any]
+    start_pos: List[int]
+    ends: List[Any]
+    end_pos: List[int]
+
+
+class IntervalIndex:
+    """Static interval tree over closed [start, end] intervals
+
+    Positions returned by queries refer to the index of the interval in the
+    sequence the index was built from, and are returned in ascending order
+    so callers can preserve their original ordering.
+    """
+
+    def __init__(self, intervals: Sequence[Interval]):
+        """Build the index
+
+        Args:
+            intervals (Sequence[Interval]): (start, end) pairs of any comparable type
+
+        Raises:
+            ValueError: an interval ends before it starts
+        """
+        for pos, (start, end) in enumerate(intervals):
+            if end < start:
+                msg = f'Interval #{pos} ends before it starts: "{start}" - "{end}"'
+                logger.error(msg)
+                raise ValueError(msg)
+
+        self._size = len(intervals)
+        self._root = self._build(list(enumerate(intervals)))
+        self._starts = sorted(iv[0] for iv in intervals)
+        self._ends = sorted(iv[1] for iv in intervals)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def _build(cls, items: List[Tuple[int, Interval]]) -> Optional[_Node]:
+        if not items:
+            return None
+
+        # median of all endpoints keeps the tree balanced
+        points = sorted([p for _, iv in items for p in iv])
+        center = points[len(points) // 2]
+
+        left: List[Tuple[int, Interval]] = []
+        right: List[Tuple[int, Interval]] = []
+        overlap: List[Tuple[int, Interval]] = []
+        for item in items:
+            start, end = item[1]
+            if end < center:
+                left.append(item)
+            elif start > center:
+                right.append(item)
+            else:
+                overlap.append(item)
+
+        by_start = sorted(overlap, key=lambda i: i[1][0])
+        by_end = sorted(overlap, key=lambda i: i[1][1])
+
+        return _Node(
+            center=center,
+            left=cls._build(left),
+            right=cls._build(right),
+            starts=[i[1][0] for i in by_start],
+            start_pos=[i[0] for i in by_start],
+            ends=[i[1][1] for i in by_end],
+            end_pos=[i[0] for i in by_end],
+        )
+
+    def query(self, point: Any) -> List[int]:
+        """Return positions of all intervals containing the point (inclusive)
+
+        Args:
+            point (Any): value comparable with the interval bounds
+
+        Returns:
+            List[int]: ascending positions of matching intervals
+        """
+        found: List[int] = []
+        node = self._root
+        while node is not None:
+            if point < node.center:
+                # every interval here ends at/after center, check starts only
+                found.extend(node.start_pos[: bisect_right(node.starts, point)])
+                node = node.left
+            elif point > node.center:
+                # every interval here starts at/before center, check ends only
+                found.extend(node.end_pos[bisect_left(node.ends, point) :])
+                node = node.right
+            else:
+                found.extend(node.start_pos)
+                break
+
+        found.sort()
+        return found
+
+    def next_start(self, point: Any) -> Optional[Any]:
+        """Return the first interval start strictly after the point
+
+        Args:
+            point (Any): value comparable with the interval bounds
+
+        Returns:
+            Any: next start, None if no interval starts after the point
+        """
+        idx = bisect_right(self._starts, point)
+        return self._starts[idx] if idx < len(self._starts) else None
+
+    def next_end(self, point: Any) -> Optional[Any]:
+        """Return the first interval end at or after the point
+
+        Args:
+            point (Any): value comparable with the interval bounds
+
+        Returns:
+            Any: next end, None if no interval ends at/after the point
+        """
+        idx = bisect_left(self._ends, point)
+        return self._ends[idx] if idx < len(self._ends) else None
+
+
+def sweep_active(
+    intervals: Sequence[Interval], points: Iterable[Any]
+) -> Iterator[Tuple[Any, List[int], bool]]:
+    """Sweep ascending points across the interval boundaries in a single pass
+
+    Args:
+        intervals (Sequence[Interval]): (start, end) pairs of any comparable type
+        points (Iterable[Any]):         ascending points to report active intervals for
+
+    Raises:
+        ValueError: points are not in ascending order
+
+    Yields:
+        Tuple[Any, List[int], bool]: point, ascending positions of intervals containing it,
+                                     and if the active set changed since the previous point
+    """
+    starts = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    ends = sorted(range(len(intervals)), key=lambda i: intervals[i][1])
+
+    active: Set[int] = set()
+    positions: List[int] = []
+    start_idx = 0
+    end_idx = 0
+    previous = None
+    first = True
+
+    for point in points:
+        if previous is not None and point < previous:
+            msg = f'Sweep points must be ascending: "{point}" after "{previous}"'
+            logger.error(msg)
+            raise ValueError(msg)
+        previous = point
+
+        changed = first
+        first = False
+
+        while start_idx < len(starts) and intervals[starts[start_idx]][0] <= point:
+            active.add(starts[start_idx])
+            start_idx += 1
+            changed = True
+        while end_idx < len(ends) and intervals[ends[end_idx]][1] < point:
+            active.discard(ends[end_idx])
+            end_idx += 1
+            changed = True
+
+        if changed:
+            positions = sorted(active)
+
+        yield point, positions, changed
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"index = {SCRIPT_NAME}.IntervalIndex(intervals)"
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,291 @@
+#!/usr/bin/python
+"""Compiled schedule file validation
+
+Compiles the schedule file schema (util/schedulefile_schema.json, Cerberus
+syntax) once into plain Python checks, then validates documents in a single
+pass, collecting every error. Only the rules the schedule schema uses are
+supported: type, required, nullable, allowed, min and schema (dict/list).
+Unknown fields are errors, as with Cerberus defaults.
+
+Raises:
+    ValueError: Unsupported rule or type in the schema
+"""
+import logging
+import os
+import sys
+from collections.abc import Mapping, Sequence
+from datetime import date
+from typing import IO, Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import yaml
+from yaml.nodes import MappingNode, Node, SequenceNode
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+Path = Tuple[Any, ...]
+
+
+class ValidationError(NamedTuple):
+    path: Path
+    message: str
+    line: Optional[int] = None
+
+    def __str__(self) -> str:
+        location = "->".join(str(p) for p in self.path) or "<document>"
+        if self.line is not None:
+            return f"{location}: {self.message} (line {self.line})"
+        return f"{location}: {self.message}"
+
+
+Errors = List[ValidationError]
+Check = Callable[[Any, Path, Errors], None]
+
+TYPES: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "date": lambda v: isinstance(v, date),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int),
+    "dict": lambda v: isinstance(v, Mapping),
+    "list": lambda v: isinstance(v, Sequence) and not isinstance(v, str),
+}
+
+RULES = {"type", "required", "nullable", "allowed", "min", "schema"}
+
+
+def _compile_type(types: Union[str, List[str]]) -> Tuple[Callable[[Any], bool], str]:
+    names = [types] if isinstance(types, str) else list(types)
+    for name in names:
+        if name not in TYPES:
+            msg = f'Unsupported schema type "{name}"'
+            logger.error(msg)
+            raise ValueError(msg)
+
+    checks = [TYPES[n] for n in names]
+    message = f"must be of {types} type"
+    if len(checks) == 1:
+        return checks[0], message
+
+    return (lambda v: any(c(v) for c in checks)), message
+
+
+def compile_rules(rules: Dict[str, Any]) -> Check:
+    """Compile the rules of a single field into a check
+
+    Args:
+        rules (Dict[str, Any]): field rules, ex: {"type": "string", "nullable": true}
+
+    Raises:
+        ValueError: Unsupported rule or type
+
+    Returns:
+        Check: check(value, path, errors) appending any ValidationError found
+    """
+    unknown = set(rules) - RULES
+    if unknown:
+        msg = f"Unsupported schema rules: {sorted(unknown)}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    nullable = bool(rules.get("nullable", False))
+    type_check, type_message = _compile_type(rules["type"]) if "type" in rules else (None, "")
+    allowed = rules.get("allowed")
+    minimum = rules.get("min")
+
+    schema_check: Optional[Check] = None
+    if "schema" in rules:
+        types = rules.get("type")
+        types = [types] if isinstance(types, str) else list(types or [])
+        if "list" in types:
+            schema_check = _compile_items(compile_rules(rules["schema"]))
+        else:
+            schema_check = compile_fields(rules["schema"])
+
+    def check(value: Any, path: Path, errors: Errors) -> None:
+        if value is None:
+            if not nullable:
+                errors.append(ValidationError(path, "null value not allowed"))
+            return
+
+        # a wrong type skips the remaining rules of the field
+        if type_check is not None and not type_check(value):
+            errors.append(ValidationError(path, type_message))
+            return
+
+        if allowed is not None:
+            if isinstance(value, Sequence) and not isinstance(value, str):
+                bad = [v for v in value if v not in allowed]
+                if bad:
+                    errors.append(ValidationError(path, f"unallowed values {tuple(bad)}"))
+            elif value not in allowed:
+                errors.append(ValidationError(path, f"unallowed value {value}"))
+
+        if minimum is not None and value < minimum:
+            errors.append(ValidationError(path, f"min value is {minimum}"))
+
+        if schema_check is not None:
+            schema_check(value, path, errors)
+
+    return check
+
+
+def _compile_items(item_check: Check) -> Check:
+    def check(value: Any, path: Path, errors: Errors) -> None:
+        for i, item in enumerate(value):
+            item_check(item, path + (i,), errors)
+
+    return check
+
+
+def compile_fields(schema: Dict[str, Dict[str, Any]]) -> Check:
+    """Compile a mapping schema (field name -> rules) into a check
+
+    Args:
+        schema (Dict[str, Dict[str, Any]]): mapping schema
+
+    Raises:
+        ValueError: Unsupported rule or type
+
+    Returns:
+        Check: check(document, path, errors) appending any ValidationError found
+    """
+    fields = {name: compile_rules(rules) for name, rules in schema.items()}
+    required = [name for name, rules in schema.items() if rules.get("required", False)]
+
+    def check(value: Any, path: Path, errors: Errors) -> None:
+        if not isinstance(value, Mapping):
+            errors.append(ValidationError(path, "must be of dict type"))
+            return
+
+        for key, item in value.items():
+            field_check = fields.get(key) if isinstance(key, str) else None
+            if field_check is None:
+                errors.append(ValidationError(path + (key,), "unknown field"))
+            else:
+                field_check(item, path + (key,), errors)
+
+        for name in required:
+            if name not in value:
+                errors.append(ValidationError(path + (name,), "required field"))
+
+    return check
+
+
+class ScheduleValidator:
+    """Schedule file validator, compiled once from a schema"""
+
+    def __init__(self, schema: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            schema (Dict[str, Dict[str, Any]]): schedule file schema (Cerberus syntax)
+
+        Raises:
+            ValueError: Unsupported rule or type
+        """
+        self._check = compile_fields(schema)
+        self._schema = schema
+        self._rule_checks: Dict[Path, Check] = {}
+
+    def validate(self, document: Any) -> Errors:
+        """Validate a whole document
+
+        Args:
+            document (Any): loaded schedule file contents
+
+        Returns:
+            List[ValidationError]: all errors found, empty if valid
+        """
+        errors: Errors = []
+        if document is None:
+            errors.append(ValidationError((), "document is missing"))
+        else:
+            self._check(document, (), errors)
+
+        return errors
+
+    def validate_field(self, value: Any, path: Path) -> Errors:
+        """Validate one value against the rules at a schema path
+        List indexes in the path are skipped to find the rules,
+        ex: ("date_range", "ranges", 5) uses the rules of a date_range range
+
+        Args:
+            value (Any):    value to validate
+            path (Path):    location of the value in the document
+
+        Raises:
+            KeyError: No rules at the path
+
+        Returns:
+            List[ValidationError]: all errors found, empty if valid
+        """
+        rule_path = tuple(p for p in path if not isinstance(p, int))
+        check = self._rule_checks.get(rule_path)
+        if check is None:
+            rules: Dict[str, Any] = {"type": "dict", "schema": self._schema}
+            for p in path:
+                rules = rules["schema"] if isinstance(p, int) else rules["schema"][p]
+            check = compile_rules(rules)
+            self._rule_checks[rule_path] = check
+
+        errors: Errors = []
+        check(value, path, errors)
+        return errors
+
+
+def _node_at(node: Optional[Node], path: Path) -> Optional[Node]:
+    for p in path:
+        if isinstance(node, MappingNode):
+            node = next(
+                (v for k, v in node.value if getattr(k, "value", None) == str(p)),
+                None,
+            )
+        elif isinstance(node, SequenceNode) and isinstance(p, int) and p < len(node.value):
+            node = node.value[p]
+        else:
+            return None
+
+    return node
+
+
+def locate_errors(errors: Errors, stream: Union[str, bytes, IO[Any]]) -> Errors:
+    """Return errors with the line numbers of their location in the YAML document
+    Missing fields are reported at the line of their parent
+
+    Args:
+        errors (List[ValidationError]): errors to locate
+        stream (str, bytes, IO):        YAML document the errors were found in
+
+    Returns:
+        List[ValidationError]: errors with line numbers, when found
+    """
+    try:
+        root = yaml.compose(stream, Loader=yaml.SafeLoader)  # type: ignore
+    except yaml.YAMLError as e:
+        logger.debug("Unable to locate validation errors: %s", e)
+        return errors
+
+    located: Errors = []
+    for error in errors:
+        path = error.path
+        node = _node_at(root, path)
+        while node is None and path:
+            path = path[:-1]
+            node = _node_at(root, path)
+
+        line = node.start_mark.line + 1 if node is not None else None
+        located.append(error._replace(line=line))
+
+    return located
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"errors = {SCRIPT_NAME}.ScheduleValidator(schema).validate(document)"
+        + "\n"
+    )
+    logger.error(msg)
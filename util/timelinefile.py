@@ -0,0 +1,309 @@
+#!/usr/bin/python
+"""Precomputed Pre-Roll timeline files: listing change points, read memory-mapped
+
+A timeline file holds, for each named timeline (a server, or the default
+schedule file), the sorted instants at which its listing changes and the
+new listing, over the range of time it was compiled for. Finding the listing
+of an instant is a binary search in the mapped file, nothing is parsed or
+resolved (See: schedule_preroll.py --compile / --apply).
+
+Layout (little endian):
+* header: magic, format version, counts, compiled range, string table offset,
+  payload length and CRC-32 of the payload
+* timelines: name, records offset and count, playback options
+* records: (int64 microseconds since 1970-01-01, uint32 listing) sorted by time,
+  timelines of the same schedule file share their records
+* strings: uint64 offsets, then the UTF-8 names and listings, each stored once
+
+Raises:
+    ValueError: Not a timeline file, unsupported version, corrupted or not covering an instant
+    KeyError: No timeline for a name
+    OSError: Unable to read the timeline file
+"""
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import zlib
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+MAGIC = b"PRETMLN\0"
+FORMAT_VERSION = 1
+# timeline used for names without their own timeline
+DEFAULT_TIMELINE = ""
+
+# magic, version, flags, timelines, strings, valid from, valid until,
+# strings offset, payload length, payload crc32
+HEADER = struct.Struct("<8sHHIIqqQQI")
+# name, records offset, record count, play_all, max_total_seconds (NaN for none)
+TIMELINE = struct.Struct("<IQIB3xd")
+# microseconds since 1970-01-01, listing
+RECORD = struct.Struct("<qI")
+OFFSET = struct.Struct("<Q")
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class Timeline(NamedTuple):
+    # (instant, listing from then on), sorted by instant
+    changes: List[Tuple[datetime, str]]
+    play_all: bool = False
+    max_total_seconds: Optional[float] = None
+
+
+class TimelineListing(NamedTuple):
+    listing: str
+    since: datetime
+    # next change, None when the listing lasts until the end of the timeline
+    until: Optional[datetime]
+    play_all: bool
+    max_total_seconds: Optional[float]
+
+
+def encode_timelines(
+    timelines: Dict[str, Timeline], valid_from: datetime, valid_until: datetime
+) -> bytes:
+    """Return the timeline file of named timelines
+
+    Args:
+        timelines (Dict[str, Timeline]):    name -> timeline, the same Timeline object for
+                                            names sharing a schedule (records stored once)
+        valid_from (datetime):              first instant compiled
+        valid_until (datetime):             last instant compiled (inclusive)
+
+    Returns:
+        bytes: timeline file contents
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    table = bytearray()
+    records = bytearray()
+    records_at: Dict[int, Tuple[int, int]] = {}
+    timelines_size = TIMELINE.size * len(timelines)
+
+    for name, timeline in timelines.items():
+        if id(timeline) not in records_at:
+            records_at[id(timeline)] = (timelines_size + len(records), len(timeline.changes))
+            for at, listing in sorted(timeline.changes, key=lambda c: c[0]):
+                records += RECORD.pack((at - EPOCH) // MICROSECOND, intern(listing))
+        offset, count = records_at[id(timeline)]
+        table += TIMELINE.pack(
+            intern(name),
+            offset,
+            count,
+            timeline.play_all,
+            float("nan") if timeline.max_total_seconds is None else timeline.max_total_seconds,
+        )
+
+    encoded = [s.encode("utf8") for s in strings]
+    offsets = bytearray()
+    position = 0
+    for value in encoded:
+        offsets += OFFSET.pack(position)
+        position += len(value)
+    offsets += OFFSET.pack(position)
+
+    payload = bytes(table + records + offsets) + b"".join(encoded)
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        len(timelines),
+        len(strings),
+        (valid_from - EPOCH) // MICROSECOND,
+        (valid_until - EPOCH) // MICROSECOND,
+        len(table) + len(records),
+        len(payload),
+        zlib.crc32(payload),
+    )
+
+    return header + payload
+
+
+class _Instants:
+    # record instants of a timeline as a sequence, for bisect on the mapped file
+    def __init__(self, data: Any, offset: int, count: int):
+        self.data = data
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> int:
+        return RECORD.unpack_from(self.data, self.offset + i * RECORD.size)[0]
+
+
+class TimelineFile:
+    """Memory-mapped timeline file (See: encode_timelines)"""
+
+    def __init__(self, path: str, verify: bool = True):
+        """Open and check a timeline file
+
+        Args:
+            path (str):             path/to/timeline file
+            verify (bool, optional): check the payload CRC-32 [Default: True]
+
+        Raises:
+            OSError: Unable to read the file
+            ValueError: Not a timeline file, unsupported version or corrupted
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            try:
+                self._data: Any = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                self._data = b""
+
+        try:
+            if len(self._data) < HEADER.size:
+                raise ValueError(f'"{path}" is not a timeline file (too short)')
+            (
+                magic,
+                version,
+                _,
+                self._timelines,
+                self._strings,
+                valid_from,
+                valid_until,
+                strings_offset,
+                payload_length,
+                crc,
+            ) = HEADER.unpack_from(self._data, 0)
+            if magic != MAGIC:
+                raise ValueError(f'"{path}" is not a timeline file')
+            if version != FORMAT_VERSION:
+                raise ValueError(
+                    f'"{path}" timeline format version {version} is not supported '
+                    + f"(expected {FORMAT_VERSION}), compile it again"
+                )
+            if len(self._data) != HEADER.size + payload_length:
+                raise ValueError(f'"{path}" timeline file is truncated')
+            if verify and zlib.crc32(memoryview(self._data)[HEADER.size :]) != crc:
+                raise ValueError(f'"{path}" timeline file is corrupted (checksum mismatch)')
+        except ValueError as e:
+            logger.error(e)
+            self.close()
+            raise
+
+        self.valid_from = EPOCH + valid_from * MICROSECOND
+        self.valid_until = EPOCH + valid_until * MICROSECOND
+        self._strings_offset = HEADER.size + strings_offset
+
+    def string(self, i: int) -> str:
+        """Return a string of the string table
+
+        Args:
+            i (int): string number
+
+        Returns:
+            str: name or listing
+        """
+        offsets = self._strings_offset
+        start = OFFSET.unpack_from(self._data, offsets + i * OFFSET.size)[0]
+        end = OFFSET.unpack_from(self._data, offsets + (i + 1) * OFFSET.size)[0]
+        base = offsets + (self._strings + 1) * OFFSET.size
+
+        return bytes(self._data[base + start : base + end]).decode("utf8")
+
+    def _timeline(self, i: int) -> Tuple[int, int, int, bool, float]:
+        return TIMELINE.unpack_from(self._data, HEADER.size + i * TIMELINE.size)
+
+    def names(self) -> List[str]:
+        """Return the names of the timelines
+
+        Returns:
+            List[str]: timeline names, DEFAULT_TIMELINE for the default schedule file
+        """
+        return [self.string(self._timeline(i)[0]) for i in range(self._timelines)]
+
+    def listing(self, name: str, at: datetime) -> TimelineListing:
+        """Return the listing of a timeline at an instant
+
+        Args:
+            name (str):     timeline name, the default timeline is used if it has none
+            at (datetime):  instant
+
+        Raises:
+            KeyError: No timeline for the name and no default timeline
+            ValueError: Instant outside of the compiled range
+
+        Returns:
+            TimelineListing: listing, since when and until when it applies, playback options
+        """
+        if not self.valid_from <= at <= self.valid_until:
+            msg = (
+                f'Timeline "{self.path}" covers {self.valid_from} - {self.valid_until}, '
+                + f"not {at}, compile it again"
+            )
+            logger.error(msg)
+            raise ValueError(msg)
+
+        found = None
+        for i in range(self._timelines):
+            timeline = self._timeline(i)
+            timeline_name = self.string(timeline[0])
+            if timeline_name == name:
+                found = timeline
+                break
+            if timeline_name == DEFAULT_TIMELINE:
+                found = timeline
+        if found is None:
+            raise KeyError(f'No timeline for "{name}" in "{self.path}"')
+
+        _, offset, count, play_all, max_total_seconds = found
+        offset += HEADER.size
+        instants = _Instants(self._data, offset, count)
+        position = bisect_right(instants, (at - EPOCH) // MICROSECOND) - 1
+        if position < 0:
+            raise ValueError(f'Timeline "{name}" of "{self.path}" has no listing at {at}')
+
+        since, listing = RECORD.unpack_from(self._data, offset + position * RECORD.size)
+        until = instants[position + 1] if position + 1 < count else None
+
+        return TimelineListing(
+            listing=self.string(listing),
+            since=EPOCH + since * MICROSECOND,
+            until=None if until is None else EPOCH + until * MICROSECOND,
+            play_all=bool(play_all),
+            max_total_seconds=None if math.isnan(max_total_seconds) else max_total_seconds,
+        )
+
+    def close(self) -> None:
+        """Unmap the file"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+
+    def __enter__(self) -> "TimelineFile":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f'with {SCRIPT_NAME}.TimelineFile("prerolls.timeline") as timeline:'
+        + "\n"
+        + '    timeline.listing("server name", datetime.now()).listing'
+        + "\n"
+    )
+    logger.error(msg)
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+"""YAML loading utilities
+
+* SafeLoader: libyaml based CSafeLoader when available, pure Python otherwise
+* StreamedDocument: event driven load of a document, handing out the items
+  of one (large) sequence as they are read instead of holding them all
+* split_sections: text of each top level key of a document, to only parse
+  the sections of an edited document that changed
+
+Raises:
+    yaml.YAMLError: Problems parsing the YAML document
+"""
+import logging
+import os
+import re
+import sys
+from typing import IO, Any, Dict, Generator, Iterator, List, Optional, Tuple, Union
+
+import yaml
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.events import (
+    MappingEndEvent,
+    MappingStartEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.resolver import Resolver
+
+try:
+    from yaml import CSafeLoader as SafeLoader  # type: ignore
+    from yaml.cyaml import CParser  # type: ignore
+
+    class StreamLoader(CParser, Composer, SafeConstructor, Resolver):  # type: ignore
+        """libyaml event parser, with Python node composition for item by item loading"""
+
+        def __init__(self, stream: Union[str, bytes, IO[Any]]):
+            CParser.__init__(self, stream)
+            Composer.__init__(self)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+
+        def dispose(self) -> None:
+            CParser.dispose(self)
+
+    WITH_LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader  # type: ignore
+
+    StreamLoader = SafeLoader  # type: ignore
+    WITH_LIBYAML = False
+
+logger = logging.getLogger(__name__)
+
+filename = os.path.basename(sys.argv[0])
+SCRIPT_NAME = os.path.splitext(filename)[0]
+
+# "key:" at the start of a line, plain or quoted
+TOP_LEVEL_KEY = re.compile(
+    rb"""^([A-Za-z0-9_][A-Za-z0-9_ -]*|"[^"]*"|'[^']*')[ \t]*:(?:[ \t]|\r?$)"""
+)
+# anchors (&name) and aliases (*name), which may refer across sections
+ANCHOR_OR_ALIAS = re.compile(rb"(?:^|[\s,\[{])[&*][^\s,\[\]{}]")
+
+
+class StreamedDocument:
+    """Load a YAML document, streaming the items of the sequence at item_path
+
+    Iterate items() to receive each item of the sequence as it is parsed.
+    Once exhausted, document holds everything else, with that sequence
+    left empty. Merge keys ("<<") are not supported on the mappings leading
+    to the streamed sequence, they are within the items themselves.
+    """
+
+    def __init__(self, stream: Union[str, bytes, IO[Any]], item_path: Tuple[str, ...]):
+        """
+        Args:
+            stream (str, bytes, IO):    YAML document
+            item_path (Tuple[str]):     mapping keys leading to the sequence to stream
+        """
+        self.item_path = item_path
+        self.document: Any = None
+        self._loader = StreamLoader(stream)
+
+    def items(self) -> Iterator[Any]:
+        """Yield the items of the streamed sequence, then set document
+
+        Raises:
+            yaml.YAMLError: Problems parsing the YAML document
+
+        Yields:
+            Any: each constructed item of the sequence at item_path
+        """
+        loader = self._loader
+        try:
+            loader.get_event()  # stream start
+            if loader.check_event(StreamEndEvent):
+                self.document = None
+                return
+
+            loader.get_event()  # document start
+            self.document = yield from self._walk(())
+
+            loader.get_event()  # document end
+            if not loader.check_event(StreamEndEvent):
+                event = loader.peek_event()
+                raise yaml.composer.ComposerError(
+                    "expected a single document in the stream",
+                    None,
+                    "but found another document",
+                    event.start_mark,
+                )
+        finally:
+            loader.dispose()
+
+    def _construct(self) -> Any:
+        loader = self._loader
+        node = loader.compose_node(None, None)
+        value = loader.construct_object(node, deep=True)
+        # constructed objects are only needed while building this value
+        loader.constructed_objects = {}
+        return value
+
+    def _walk(self, path: Tuple[Any, ...]) -> Generator[Any, None, Any]:
+        # yields the streamed items, returns the value built at path
+        loader = self._loader
+        depth = len(path)
+        on_path = path == self.item_path[:depth]
+
+        if on_path and depth < len(self.item_path) and loader.check_event(MappingStartEvent):
+            loader.get_event()
+            mapping: Dict[Any, Any] = {}
+            while not loader.check_event(MappingEndEvent):
+                key = self._construct()
+                mapping[key] = yield from self._walk(path + (key,))
+            loader.get_event()
+            return mapping
+
+        if on_path and depth == len(self.item_path) and loader.check_event(SequenceStartEvent):
+            loader.get_event()
+            count = 0
+            while not loader.check_event(SequenceEndEvent):
+                yield self._construct()
+                count += 1
+            loader.get_event()
+            logger.debug("Streamed %s items of %s", count, "->".join(self.item_path))
+            empty: List[Any] = []
+            return empty
+
+        return self._construct()
+
+
+def split_sections(data: bytes) -> Optional[Dict[str, bytes]]:
+    """Return the text of each top level key of a block style YAML mapping document
+    Each text loads on its own as a mapping of that one key. Documents that can't
+    be split safely return None: flow style, directives, several documents,
+    anchors/aliases, duplicate keys
+
+    Args:
+        data (bytes): YAML document
+
+    Returns:
+        Dict[str, bytes]: top level key -> its lines, None if the document can't be split
+    """
+    if ANCHOR_OR_ALIAS.search(data):
+        return None
+
+    sections: Dict[str, bytes] = {}
+    key: Optional[str] = None
+    lines: List[bytes] = []
+    for line in data.splitlines(keepends=True):
+        if not line.strip() or line[:1] in (b" ", b"\t", b"#"):
+            # indented lines, comments and blank lines belong to the current key
+            lines.append(line)
+            continue
+        if key is None and not sections and line.rstrip() == b"---":
+            continue
+
+        match = TOP_LEVEL_KEY.match(line)
+        if match is None:
+            return None
+
+        if key is not None:
+            sections[key] = b"".join(lines)
+        key = match.group(1).strip(b"\"'").decode("utf8")
+        if key in sections:
+            return None
+        lines = [line]
+
+    if key is not None:
+        sections[key] = b"".join(lines)
+
+    return sections
+
+
+def load(stream: Union[str, bytes, IO[Any]], loader: Optional[Any] = None) -> Any:
+    """Load a single YAML document, using libyaml when available
+
+    Args:
+        stream (str, bytes, IO):    YAML document
+        loader (Loader, optional):  yaml Loader class [Default: SafeLoader]
+
+    Raises:
+        yaml.YAMLError: Problems parsing the YAML document
+
+    Returns:
+        Any: loaded document
+    """
+    return yaml.load(stream, Loader=loader or SafeLoader)  # type: ignore
+
+
+if __name__ == "__main__":
+    msg = (
+        "Script not meant to be run directly, please import into other scripts.\n\n"
+        + f"usage:\nimport {SCRIPT_NAME}"
+        + "\n"
+        + f"doc = {SCRIPT_NAME}.StreamedDocument(file, ('section', 'items'))"
+        + "\n"
+    )
+    logger.error(msg)